@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""
+Backfill - Crawl lại bài viết cũ từ các trang danh sách phân trang
+
+Duyệt <chuyên mục>, <chuyên mục>-p2, -p3... của từng chuyên mục trong
+NEWS_SOURCES[...]['sections'], đưa bài viết qua pipeline fetch → parse → ghi DB
+(ghi theo batch lớn). Tiến độ được lưu vào checkpoint để chạy tiếp (--resume);
+bài lỗi được ghi vào work queue và thử lại khi chạy với --resume.
+
+Ví dụ:
+    python backfill.py --pages 1-200
+    python backfill.py --sections bong-da --since 2024-01-01 --until 2024-06-30
+    python backfill.py --resume
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from colorama import Fore, Style
+from crawler import NewsCrawler, logger
+from pipeline import Pipeline, Stage
+from work_queue import STORED, FINAL_STATES
+from config import NEWS_SOURCES, BACKFILL, PIPELINE_WORKERS, WORK_QUEUE
+
+
+class PageTracker:
+    """
+    Theo dõi các bài còn đang xử lý của từng trang danh sách
+
+    Checkpoint của một chuyên mục chỉ tiến tới trang mà nó và mọi trang trước
+    đã xử lý xong hẳn, nên chạy lại (--resume) không bỏ sót bài nào. Một bài
+    chỉ tính là xong khi đã lưu, đã tồn tại, bị lọc theo ngày, hoặc lỗi nhưng
+    đã được ghi vào work queue để thử lại; trang có bài lỗi mà không ghi lại
+    được (fail) thì không bao giờ tính là xong.
+    """
+
+    def __init__(self, path, checkpoint):
+        self.path = path
+        self.checkpoint = checkpoint
+        self._pending = {}      # (section, page) → số bài chưa xong
+        self._completed = {}    # section → các trang đã xong (chưa liền mạch)
+        self._stopped = set()   # Chuyên mục đã gặp bài cũ hơn --since
+        self.failed = set()     # (section, page) có bài lỗi không thử lại được
+        self._lock = threading.Lock()
+
+    def last_done(self, section):
+        return self.checkpoint['sections'].get(section, 0)
+
+    def add(self, section, page, count):
+        """Đăng ký một trang danh sách với `count` bài cần xử lý"""
+        with self._lock:
+            if count:
+                self._pending[(section, page)] = count
+            else:
+                self._complete(section, page)
+
+    def finish(self, section, page):
+        """Một bài của trang đã xử lý xong (bỏ qua trang không theo dõi, vd. bài thử lại)"""
+        with self._lock:
+            key = (section, page)
+            if key not in self._pending:
+                return
+            self._pending[key] -= 1
+            if not self._pending[key]:
+                del self._pending[key]
+                self._complete(section, page)
+
+    def fail(self, section, page):
+        """Một bài của trang lỗi và không thể thử lại sau: giữ checkpoint trước trang này"""
+        with self._lock:
+            key = (section, page)
+            if self._pending.pop(key, None) is not None:
+                self.failed.add(key)
+
+    def _complete(self, section, page):
+        done = self._completed.setdefault(section, set())
+        done.add(page)
+        last = self.checkpoint['sections'].get(section, 0)
+        advanced = False
+        while last + 1 in done:
+            last += 1
+            done.discard(last)
+            advanced = True
+        if advanced:
+            self.checkpoint['sections'][section] = last
+            self._save()
+
+    def stop_section(self, section):
+        with self._lock:
+            self._stopped.add(section)
+
+    def is_stopped(self, section):
+        with self._lock:
+            return section in self._stopped
+
+    def _save(self):
+        """Ghi checkpoint (ghi file tạm rồi đổi tên để không bao giờ hỏng file)"""
+        self.checkpoint['updated_at'] = datetime.now().isoformat(timespec='seconds')
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoint, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class BackfillCrawler(NewsCrawler):
+    """Crawler backfill: dùng chung database, parser, parse pool với NewsCrawler"""
+
+    def __init__(self, db=None):
+        super().__init__(db)
+        self.stats.update({
+            'listing_pages': 0,
+            'total_too_old': 0,
+        })
+
+    def backfill(self, source_name, sections=None, first_page=1, last_page=None,
+                 since=None, until=None, resume=False):
+        """
+        Backfill một nguồn
+
+        Args:
+            source_name: Key trong NEWS_SOURCES
+            sections: Danh sách chuyên mục (mặc định theo config của nguồn)
+            first_page, last_page: Khoảng trang danh sách của mỗi chuyên mục
+            since, until: Chỉ lưu bài có published_at trong khoảng này (datetime;
+                          bài không đọc được ngày đăng thì không lọc)
+            resume: Tiếp tục từ checkpoint của lần chạy trước
+        """
+        source_config = NEWS_SOURCES[source_name]
+        parser = self.parsers[source_config['parser']]
+        parser.configure(source_config)
+        sections = sections or source_config.get('sections') or ['']
+        last_page = last_page or BACKFILL['max_pages']
+
+        BACKFILL['checkpoint_dir'].mkdir(parents=True, exist_ok=True)
+        path = BACKFILL['checkpoint_dir'] / f"{source_name}.json"
+        checkpoint = {'source': source_name, 'sections': {}}
+        if resume and path.exists():
+            with open(path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            logger.info(f"✓ Tiếp tục từ checkpoint: {checkpoint['sections']}")
+        tracker = PageTracker(path, checkpoint)
+        queue_name = f"backfill:{source_name}"
+        if self.work_queue:
+            self.work_queue.clear(queue_name, FINAL_STATES, older_than=WORK_QUEUE['retention'])
+
+        print(f"\n{Fore.CYAN}▶ Backfill {source_config['name']}: {len(sections)} chuyên mục, "
+              f"trang {first_page}-{last_page}{Style.RESET_ALL}")
+        if since or until:
+            print(f"{Fore.CYAN}  Khoảng ngày: {since or '...'} → {until or '...'}{Style.RESET_ALL}")
+
+        workers = dict(PIPELINE_WORKERS)
+        workers.update(source_config.get('workers', {}))
+        pipeline = Pipeline([
+            Stage('fetch', lambda item: self._backfill_fetch(parser, tracker, queue_name, item),
+                  workers=workers['fetch'], queue_size=BACKFILL['frontier_size']),
+            Stage('parse', lambda item: self._backfill_parse(parser, tracker, queue_name, item, since, until),
+                  workers=max(workers['parse'], self.parse_pool.workers), queue_size=BACKFILL['frontier_size']),
+            Stage('write', lambda batch: self._backfill_write(tracker, queue_name, batch),
+                  workers=workers['write'], queue_size=BACKFILL['frontier_size'],
+                  batch_size=BACKFILL['write_batch_size']),
+        ])
+
+        self._started = time.time()
+        frontier = self._walk(parser, tracker, queue_name, sections, first_page, last_page, resume)
+        report = pipeline.run(frontier)
+        for stage_stats in report['stats'].values():
+            self._count('total_errors', stage_stats['errors'])
+        self._log_progress(final=True)
+        if tracker.failed:
+            logger.warning(f"⚠ {len(tracker.failed)} trang có bài lỗi, checkpoint dừng trước các trang này: "
+                           f"{sorted(tracker.failed)}")
+
+    def _walk(self, parser, tracker, queue_name, sections, first_page, last_page, resume):
+        """
+        Sinh các bài cần crawl: trước hết là bài lỗi của lần chạy trước (khi --resume),
+        sau đó lần lượt theo chuyên mục và trang
+
+        Pipeline.run đưa từng bài vào queue có giới hạn (frontier): khi queue đầy
+        thì generator dừng lại, nên trang danh sách tiếp theo chỉ được tải khi
+        các stage sau đã xử lý bớt.
+        """
+        if resume and self.work_queue:
+            retries = self.work_queue.due(queue_name)
+            if retries:
+                logger.info(f"↻ Thử lại {len(retries)} bài lỗi từ lần chạy trước")
+            for url, payload in retries:
+                # page None: bài thử lại không thuộc trang nào trong PageTracker
+                yield payload['section'], None, {'url': url}
+
+        last_progress = time.time()
+        for section in sections:
+            section_url = f"{parser.base_url.rstrip('/')}/{section}" if section else parser.base_url
+            start = max(first_page, tracker.last_done(section) + 1) if resume else first_page
+
+            for page in range(start, last_page + 1):
+                if tracker.is_stopped(section):
+                    logger.info(f"✓ {section or 'trang chính'}: đã tới bài cũ hơn --since, dừng ở trang {page}")
+                    break
+
+                listing = parser.fetch_page(parser.listing_url(section_url, page))
+                articles = parser.parse_listing_html(listing.text) if listing else []
+                if not articles:
+                    logger.info(f"✓ {section or 'trang chính'}: hết bài ở trang {page}")
+                    break
+                self._count('listing_pages')
+
+                for article_info in articles:
+                    article_info['url'] = parser.canonical_url(article_info['url'])
+                seen = self.db.filter_seen_urls(a['url'] for a in articles)
+                new_articles = [a for a in articles if a['url'] not in seen]
+                self._count('total_skipped', len(articles) - len(new_articles))
+
+                tracker.add(section, page, len(new_articles))
+                for article_info in new_articles:
+                    yield section, page, article_info
+
+                if time.time() - last_progress >= BACKFILL['progress_interval']:
+                    self._log_progress()
+                    last_progress = time.time()
+
+    def _backfill_failed(self, tracker, queue_name, section, page, url, error):
+        """Ghi bài lỗi vào work queue để --resume thử lại; không có work queue thì giữ trang chưa xong"""
+        if self.work_queue:
+            self.work_queue.add(queue_name, [(url, {'section': section})])
+            self.work_queue.fail(queue_name, url, error)
+            tracker.finish(section, page)
+        else:
+            tracker.fail(section, page)
+
+    def _backfill_done(self, tracker, queue_name, section, page, url):
+        """Bài đã xử lý xong (lưu, đã tồn tại hoặc bị lọc theo ngày)"""
+        self._queue_mark(queue_name, [url], STORED)
+        tracker.finish(section, page)
+
+    def _backfill_fetch(self, parser, tracker, queue_name, item):
+        section, page, article_info = item
+        self._count('total_crawled')
+        try:
+            html = parser.get_page(article_info['url'], stream=parser.stream)
+        except Exception:
+            self._backfill_failed(tracker, queue_name, section, page, article_info['url'], 'fetch')
+            raise
+        if not html:
+            self._count('total_errors')
+            self._backfill_failed(tracker, queue_name, section, page, article_info['url'], 'fetch')
+            return None
+        return section, page, article_info, html
+
+    def _backfill_parse(self, parser, tracker, queue_name, item, since, until):
+        section, page, article_info, html = item
+        url = article_info['url']
+        try:
+            article_data = self.parse_pool.call(parser, 'parse_article_html', url, html)
+        except Exception:
+            self._backfill_failed(tracker, queue_name, section, page, url, 'parse')
+            raise
+        if not article_data:
+            self._count('total_errors')
+            self._backfill_failed(tracker, queue_name, section, page, url, 'parse')
+            return None
+
+        published_at = article_data['published_at']
+        if published_at is None:
+            # Không đọc được ngày đăng: không lọc theo --since/--until
+            return section, page, article_data
+        if since and published_at < since:
+            # Danh sách xếp mới → cũ: các trang sau chỉ còn bài cũ hơn
+            self._count('total_too_old')
+            tracker.stop_section(section)
+            self._backfill_done(tracker, queue_name, section, page, url)
+            return None
+        if until and published_at > until:
+            self._count('total_skipped')
+            self._backfill_done(tracker, queue_name, section, page, url)
+            return None
+        return section, page, article_data
+
+    def _backfill_write(self, tracker, queue_name, batch):
+        urls = [article_data['source_url'] for _, _, article_data in batch]
+        try:
+            article_ids = self.db.insert_articles_bulk([article_data for _, _, article_data in batch])
+            stored = {url for url, article_id in zip(urls, article_ids) if article_id}
+            # None có thể là bài đã tồn tại hoặc lỗi DB: chỉ coi là xong khi URL đã được ghi nhận
+            stored |= self.db.filter_seen_urls(url for url in urls if url not in stored)
+        except Exception:
+            for (section, page, _), url in zip(batch, urls):
+                self._backfill_failed(tracker, queue_name, section, page, url, 'write')
+            raise
+
+        for (section, page, _), url, article_id in zip(batch, urls, article_ids):
+            if url not in stored:
+                self._count('total_errors')
+                self._backfill_failed(tracker, queue_name, section, page, url, 'write')
+                continue
+            self._count('total_saved' if article_id else 'total_skipped')
+            self._backfill_done(tracker, queue_name, section, page, url)
+        return article_ids
+
+    def _log_progress(self, final=False):
+        elapsed = max(time.time() - self._started, 1e-6)
+        with self._stats_lock:
+            stats = dict(self.stats)
+        message = (
+            f"{'✓ Backfill xong' if final else '⏱ Tiến độ'} sau {elapsed:.0f}s: "
+            f"{stats['listing_pages']} trang danh sách ({stats['listing_pages'] / elapsed:.2f} trang/giây), "
+            f"{stats['total_crawled']} bài đã tải, {stats['total_saved']} bài đã lưu "
+            f"({stats['total_saved'] / elapsed:.2f} bài/giây), "
+            f"{stats['total_skipped']} bỏ qua, {stats['total_too_old']} quá cũ, {stats['total_errors']} lỗi"
+        )
+        logger.info(message)
+
+
+def parse_page_range(value):
+    """'5' → (1, 5); '10-50' → (10, 50)"""
+    if '-' in value:
+        first, last = value.split('-', 1)
+        return int(first), int(last)
+    return 1, int(value)
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def main():
+    """Hàm main"""
+    arg_parser = argparse.ArgumentParser(description='Backfill bài viết cũ từ các trang danh sách')
+    arg_parser.add_argument('--source', default='vnexpress', choices=sorted(NEWS_SOURCES),
+                            help='Nguồn tin (key trong NEWS_SOURCES)')
+    arg_parser.add_argument('--sections', help='Danh sách chuyên mục, cách nhau bởi dấu phẩy')
+    arg_parser.add_argument('--pages', type=parse_page_range, default=(1, BACKFILL['max_pages']),
+                            help='Khoảng trang danh sách, vd. 200 hoặc 10-200')
+    arg_parser.add_argument('--since', type=parse_date, help='Bỏ bài đăng trước ngày (YYYY-MM-DD)')
+    arg_parser.add_argument('--until', type=parse_date, help='Bỏ bài đăng sau ngày (YYYY-MM-DD)')
+    arg_parser.add_argument('--resume', action='store_true', help='Tiếp tục từ checkpoint lần chạy trước')
+    args = arg_parser.parse_args()
+
+    if args.until:
+        # --until tính cả ngày cuối
+        args.until = args.until.replace(hour=23, minute=59, second=59)
+    sections = [s.strip() for s in args.sections.split(',')] if args.sections else None
+
+    crawler = None
+    try:
+        crawler = BackfillCrawler()
+        crawler.backfill(
+            args.source, sections=sections,
+            first_page=args.pages[0], last_page=args.pages[1],
+            since=args.since, until=args.until, resume=args.resume
+        )
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}⚠ Đã dừng backfill (chạy lại với --resume để tiếp tục){Style.RESET_ALL}")
+    except Exception as e:
+        logger.error(f"✗ Lỗi nghiêm trọng: {e}", exc_info=True)
+    finally:
+        if crawler:
+            crawler.close()
+
+
+if __name__ == '__main__':
+    main()
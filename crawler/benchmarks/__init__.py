@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks - Đo hiệu năng parser/crawler trên dữ liệu tổng hợp
+
+Chạy từ thư mục crawler/, ví dụ: python -m benchmarks.bench_parse
+Toàn bộ (micro + end-to-end, so với baseline): python -m benchmarks.bench_suite
+"""
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark trích xuất trận đấu từ text trang lịch thi đấu (VnExpressMatchParser)
+
+Chạy: python -m benchmarks.bench_match_text --pages 5 --rounds 20
+      python -m benchmarks.bench_match_text --file trang_da_luu.html ...
+"""
+
+import argparse
+import logging
+import time
+from benchmarks.corpus import generate_schedule_page
+from parsers import VnExpressMatchParser
+
+
+def bench_match_text(parser, texts, repeat=3):
+    """
+    Chạy extract_matches_from_text trên từng text `repeat` lần
+
+    Returns:
+        Dict cpu_ms_per_page, matches_per_page
+    """
+    started = time.process_time()
+    found = 0
+    for _ in range(repeat):
+        for text in texts:
+            found += len(parser.extract_matches_from_text(text, 'Ngoại Hạng Anh'))
+    cpu = time.process_time() - started
+    return {
+        'cpu_ms_per_page': cpu / (repeat * len(texts)) * 1000,
+        'matches_per_page': found / (repeat * len(texts)),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark regex trích xuất trận đấu')
+    arg_parser.add_argument('--file', nargs='*', default=[], help='Các trang HTML đã lưu')
+    arg_parser.add_argument('--pages', type=int, default=5, help='Số trang tổng hợp (khi không có --file)')
+    arg_parser.add_argument('--rounds', type=int, default=20, help='Số vòng đấu mỗi trang tổng hợp')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='Số lần chạy lại')
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    parser = VnExpressMatchParser()
+
+    if args.file:
+        pages = []
+        for path in args.file:
+            with open(path, encoding='utf-8') as f:
+                pages.append(f.read())
+    else:
+        pages = [generate_schedule_page(seed, rounds=args.rounds) for seed in range(args.pages)]
+    texts = [parser.parse_soup(html).get_text('\n') for html in pages]
+
+    result = bench_match_text(parser, texts, repeat=args.repeat)
+    size_kb = sum(len(text) for text in texts) / len(texts) / 1024
+    print(f"Trang:  {len(texts)}, trung bình {size_kb:.1f} KB text/trang")
+    print(f"CPU:    {result['cpu_ms_per_page']:.2f} ms/trang")
+    print(f"Trận:   {result['matches_per_page']:.1f} trận/trang")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark parse bài viết: CPU time và bộ nhớ đỉnh (tracemalloc) cho mỗi bài
+
+Chạy: python -m benchmarks.bench_parse --articles 50 --paragraphs 40 --images 8
+"""
+
+import argparse
+import logging
+import time
+import tracemalloc
+from benchmarks.corpus import generate_corpus
+from parsers import VnExpressParser
+
+
+def bench_parse(parser, corpus, repeat=3):
+    """
+    Parse toàn bộ corpus `repeat` lần
+
+    Returns:
+        Dict cpu_ms_per_article (trung bình), peak_kb_per_article (lớn nhất), parsed
+    """
+    # Lượt đầu để làm nóng (compile selector, import lười...)
+    parser.parse_article_html(*corpus[0])
+
+    started = time.process_time()
+    parsed = 0
+    for _ in range(repeat):
+        for url, html in corpus:
+            if parser.parse_article_html(url, html):
+                parsed += 1
+    cpu = time.process_time() - started
+
+    peak = 0
+    for url, html in corpus:
+        tracemalloc.start()
+        parser.parse_article_html(url, html)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        'cpu_ms_per_article': cpu / (repeat * len(corpus)) * 1000,
+        'peak_kb_per_article': peak / 1024,
+        'parsed': parsed,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark parse bài viết VnExpress')
+    arg_parser.add_argument('--articles', type=int, default=20, help='Số bài trong corpus')
+    arg_parser.add_argument('--paragraphs', type=int, default=30, help='Số đoạn văn mỗi bài')
+    arg_parser.add_argument('--images', type=int, default=6, help='Số ảnh mỗi bài')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='Số lần parse lại corpus')
+    args = arg_parser.parse_args()
+
+    # Log của parser làm sai lệch thời gian đo
+    logging.disable(logging.CRITICAL)
+
+    corpus = generate_corpus(args.articles, paragraphs=args.paragraphs, images=args.images)
+    size_kb = sum(len(html) for _, html in corpus) / len(corpus) / 1024
+    result = bench_parse(VnExpressParser(), corpus, repeat=args.repeat)
+
+    print(f"Corpus: {len(corpus)} bài, trung bình {size_kb:.1f} KB/bài")
+    print(f"CPU:    {result['cpu_ms_per_article']:.2f} ms/bài")
+    print(f"Peak:   {result['peak_kb_per_article']:.0f} KB/bài (tracemalloc)")
+    print(f"Parsed: {result['parsed']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Bộ benchmark crawler: micro-benchmark các hot path và throughput end-to-end,
+kết quả ghi ra JSON và so với baseline đã lưu
+
+- Micro (CPU ms mỗi lần gọi, corpus tổng hợp cố định): parse_article,
+  process_content_images, detect_category, extract_tags,
+  extract_matches_from_text, _parse_match_data
+- End-to-end (trang/giây, trận/giây): NewsCrawler và MatchCrawler chạy đủ
+  pipeline trên archive HTTP replay (network/replay.py), ghi vào MemoryDatabase
+
+Chạy: python -m benchmarks.bench_suite
+      python -m benchmarks.bench_suite --output results.json
+      python -m benchmarks.bench_suite --save-baseline
+      python -m benchmarks.bench_suite --archive cache/http_archive.sqlite --latency recorded
+
+Baseline (mặc định benchmarks/baseline.json) có thể khai báo thêm 'targets':
+{"e2e_news.pages_per_sec": 50, ...}. Chỉ số kém baseline quá --tolerance hoặc
+không đạt target thì thoát với mã 1.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from benchmarks.corpus import generate_corpus, generate_schedule_page, generate_robong_day, build_replay_archive
+from benchmarks.bench_parse import bench_parse
+from benchmarks.bench_match_text import bench_match_text
+from benchmarks.memory_db import MemoryDatabase
+from parsers import VnExpressParser, VnExpressMatchParser, RobongMatchParser
+from network import get_http_archive
+from config import NEWS_SOURCES, MATCH_SOURCES, HTTP_REPLAY
+
+BASELINE_FILE = Path(__file__).parent / 'baseline.json'
+
+NEWS_SOURCE = 'vnexpress'
+MATCH_SOURCE = 'robong_api'
+
+
+def _metric(value, unit, better='lower'):
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def cpu_ms_per_call(func, items, repeat=3):
+    """CPU time trung bình (ms) của func(item) trên các item"""
+    # Lượt đầu để làm nóng
+    func(items[0])
+    started = time.process_time()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    return (time.process_time() - started) / (repeat * len(items)) * 1000
+
+
+def run_micro(args):
+    """Micro-benchmark các hot path của parser"""
+    metrics = {}
+    parser = VnExpressParser()
+    corpus = generate_corpus(args.articles, paragraphs=args.paragraphs, images=args.images)
+
+    result = bench_parse(parser, corpus, repeat=args.repeat)
+    metrics['parse_article.cpu_ms'] = _metric(result['cpu_ms_per_article'], 'ms/bài')
+    metrics['parse_article.peak_kb'] = _metric(result['peak_kb_per_article'], 'KB/bài')
+
+    articles = []
+    for url, html in corpus:
+        content_tag = parser.parse_soup(html).select_one('article.fck_detail')
+        article_data = parser.parse_article_html(url, html)
+        articles.append((url, article_data['title'], article_data['slug'], str(content_tag), content_tag.get_text(' ')))
+
+    metrics['process_content_images.cpu_ms'] = _metric(cpu_ms_per_call(
+        lambda a: parser.process_content_images(a[3], a[2]), articles, args.repeat), 'ms/bài')
+    metrics['detect_category.cpu_ms'] = _metric(cpu_ms_per_call(
+        lambda a: parser.detect_category(a[1], a[4], a[0]), articles, args.repeat), 'ms/bài')
+    metrics['extract_tags.cpu_ms'] = _metric(cpu_ms_per_call(
+        lambda a: parser.extract_tags(a[1], a[4]), articles, args.repeat), 'ms/bài')
+
+    match_parser = VnExpressMatchParser()
+    texts = [
+        match_parser.parse_soup(generate_schedule_page(seed, rounds=args.rounds)).get_text('\n')
+        for seed in range(args.pages)
+    ]
+    result = bench_match_text(match_parser, texts, repeat=args.repeat)
+    metrics['extract_matches_from_text.cpu_ms'] = _metric(result['cpu_ms_per_page'], 'ms/trang')
+
+    robong = RobongMatchParser()
+    days = [datetime(2025, 5, day) for day in range(1, args.days_before + args.days_after + 2)]
+    match_items = [
+        (match_data, competition['name'])
+        for day in days
+        for competition in json.loads(generate_robong_day(day, competitions=args.competitions,
+                                                          matches=args.matches))['result']
+        for match_data in competition['matches']
+    ]
+    metrics['parse_match_data.cpu_ms'] = _metric(cpu_ms_per_call(
+        lambda item: robong._parse_match_data(*item), match_items, args.repeat), 'ms/trận')
+
+    for p in (parser, match_parser, robong):
+        p.close()
+    return metrics
+
+
+def _best_run(run, repeat):
+    """Chạy `run` nhiều lần, lấy lượt nhanh nhất: (số đơn vị đã xử lý, giây)"""
+    best = None
+    for _ in range(repeat):
+        count, elapsed = run()
+        if best is None or (elapsed and count / elapsed > best[0] / best[1]):
+            best = (count, elapsed)
+    return best
+
+
+def run_end_to_end(args):
+    """Throughput NewsCrawler/MatchCrawler trên archive replay (HTTP_REPLAY đã bật)"""
+    from crawler import NewsCrawler
+    from match_crawler import MatchCrawler
+
+    def crawl_news():
+        crawler = NewsCrawler(db=MemoryDatabase(latency=args.db_latency))
+        # Không dùng work queue trên đĩa: mỗi lượt đo bắt đầu từ trạng thái trống
+        crawler.work_queue = None
+        try:
+            started = time.perf_counter()
+            crawler.crawl_source(NEWS_SOURCE, dict(NEWS_SOURCES[NEWS_SOURCE], enabled=True), limit=args.articles)
+            elapsed = time.perf_counter() - started
+            if not crawler.stats['total_saved']:
+                raise RuntimeError("End-to-end tin tức không lưu được bài nào (archive thiếu trang?)")
+            # Trang danh sách + các trang bài viết
+            return crawler.stats['total_crawled'] + 1, elapsed
+        finally:
+            crawler.close()
+
+    def crawl_matches():
+        crawler = MatchCrawler(db=MemoryDatabase(latency=args.db_latency))
+        crawler.work_queue = None
+        try:
+            started = time.perf_counter()
+            crawler.crawl_matches(MATCH_SOURCE, dict(MATCH_SOURCES[MATCH_SOURCE], enabled=True),
+                                  limit=args.match_limit, days_range=(args.days_before, args.days_after))
+            elapsed = time.perf_counter() - started
+            if not crawler.stats['matches_saved']:
+                raise RuntimeError("End-to-end lịch thi đấu không lưu được trận nào (archive thiếu ngày?)")
+            return crawler.stats['matches_crawled'], elapsed
+        finally:
+            crawler.close()
+
+    metrics = {}
+    # Crawler in từng bài/trận ra stdout: bỏ đi để không tính thời gian ghi terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        pages, elapsed = _best_run(crawl_news, args.repeat)
+        metrics['e2e_news.pages_per_sec'] = _metric(pages / elapsed, 'trang/giây', 'higher')
+        matches, elapsed = _best_run(crawl_matches, args.repeat)
+        metrics['e2e_matches.matches_per_sec'] = _metric(matches / elapsed, 'trận/giây', 'higher')
+    return metrics
+
+
+def build_fixture_archive(path, args):
+    """Archive replay từ corpus tổng hợp: trang danh sách, bài viết, các ngày Robong trong days_range"""
+    robong = RobongMatchParser()
+    robong.configure(MATCH_SOURCES[MATCH_SOURCE])
+    api_days = {
+        robong._build_api_url(date_str): datetime.strptime(date_str, '%d-%m-%Y')
+        for date_str in robong.match_dates((args.days_before, args.days_after))
+    }
+    robong.close()
+    return build_replay_archive(
+        path, NEWS_SOURCES[NEWS_SOURCE]['base_url'], articles=args.articles, api_days=api_days,
+        paragraphs=args.paragraphs, images=args.images,
+        competitions=args.competitions, matches=args.matches
+    )
+
+
+def compare(results, baseline, tolerance):
+    """
+    So kết quả với baseline và target
+
+    Returns:
+        List (tên, giá trị, giá trị baseline hoặc None, trạng thái) và số chỉ số không đạt
+    """
+    rows = []
+    failures = 0
+    base_metrics = baseline.get('metrics', {})
+    targets = baseline.get('targets', {})
+    for name, metric in results['metrics'].items():
+        lower_is_better = metric['better'] == 'lower'
+        base = base_metrics.get(name)
+        status = 'mới'
+        if base and base['value']:
+            change = (metric['value'] - base['value']) / base['value']
+            worse = change > tolerance if lower_is_better else change < -tolerance
+            status = f"{'KÉM HƠN' if worse else 'ok'} ({change:+.0%})"
+            if worse:
+                failures += 1
+        target = targets.get(name)
+        if target is not None and (metric['value'] > target if lower_is_better else metric['value'] < target):
+            status += f", KHÔNG ĐẠT target {target}"
+            failures += 1
+        rows.append((name, metric, base['value'] if base else None, status))
+    return rows, failures
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Bộ benchmark crawler (micro + end-to-end)')
+    arg_parser.add_argument('--articles', type=int, default=20, help='Số bài trong corpus/trang danh sách')
+    arg_parser.add_argument('--paragraphs', type=int, default=30, help='Số đoạn văn mỗi bài')
+    arg_parser.add_argument('--images', type=int, default=6, help='Số ảnh mỗi bài')
+    arg_parser.add_argument('--pages', type=int, default=5, help='Số trang lịch thi đấu (extract_matches_from_text)')
+    arg_parser.add_argument('--rounds', type=int, default=20, help='Số vòng đấu mỗi trang lịch thi đấu')
+    arg_parser.add_argument('--competitions', type=int, default=4, help='Số giải mỗi ngày Robong')
+    arg_parser.add_argument('--matches', type=int, default=10, help='Số trận mỗi giải')
+    arg_parser.add_argument('--days-before', type=int, default=1, help='days_range của lịch thi đấu')
+    arg_parser.add_argument('--days-after', type=int, default=1, help='days_range của lịch thi đấu')
+    arg_parser.add_argument('--match-limit', type=int, default=1000, help='limit của crawl_matches')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='Số lần chạy lại mỗi benchmark')
+    arg_parser.add_argument('--archive', help='Archive đã record (CRAWLER_HTTP_MODE=record, ghi trong ngày) '
+                                              'thay cho corpus tổng hợp ở phần end-to-end')
+    arg_parser.add_argument('--latency', default='0', help="Độ trễ mạng giả lập khi replay (giây hoặc 'recorded')")
+    arg_parser.add_argument('--db-latency', type=float, default=0.0, help='Độ trễ giả lập mỗi lần gọi DB (giây)')
+    arg_parser.add_argument('--skip-e2e', action='store_true', help='Chỉ chạy micro-benchmark')
+    arg_parser.add_argument('--output', help='Ghi kết quả JSON ra file')
+    arg_parser.add_argument('--baseline', type=Path, default=BASELINE_FILE, help='File baseline để so sánh')
+    arg_parser.add_argument('--save-baseline', action='store_true', help='Ghi kết quả lần này làm baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=0.15,
+                            help='Mức kém hơn baseline chấp nhận được (0.15 = 15%%)')
+    args = arg_parser.parse_args()
+
+    # Log của parser/crawler làm sai lệch thời gian đo
+    logging.disable(logging.CRITICAL)
+
+    params = {key: value for key, value in vars(args).items()
+              if key not in ('output', 'baseline', 'save_baseline', 'tolerance')}
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': params,
+        'metrics': run_micro(args),
+    }
+
+    if not args.skip_e2e:
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = Path(args.archive) if args.archive else Path(tmp) / 'fixture_archive.sqlite'
+            if not args.archive:
+                build_fixture_archive(archive, args)
+            # Bật replay trước khi parser nào gọi get_http_archive() (archive dùng chung được tạo một lần)
+            HTTP_REPLAY.update(mode='replay', archive=archive, latency=args.latency, jitter=0)
+            try:
+                results['metrics'].update(run_end_to_end(args))
+            finally:
+                replay_archive = get_http_archive()
+                if replay_archive:
+                    replay_archive.close()
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        if baseline.get('params') != params:
+            print("⚠ Tham số khác với lúc ghi baseline, so sánh chỉ mang tính tham khảo")
+    rows, failures = compare(results, baseline, args.tolerance)
+
+    for name, metric, base, status in rows:
+        base_text = f"{base:.3f}" if base is not None else '-'
+        print(f"{name:<36} {metric['value']:>10.3f} {metric['unit']:<10} baseline {base_text:>10}  {status}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+    if args.save_baseline:
+        # Giữ nguyên targets đã khai báo trong baseline cũ
+        results['targets'] = baseline.get('targets', {})
+        args.baseline.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"✓ Đã lưu baseline: {args.baseline}")
+    elif failures:
+        print(f"✗ {failures} chỉ số kém hơn baseline/target")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Corpus - Sinh HTML giả lập trang VnExpress và JSON Robong API (cấu trúc giống dữ liệu thật)
+"""
+
+import json
+import random
+from network import HttpArchive
+from network.replay import RECORD
+
+WORDS = (
+    'bóng đá trận đấu cầu thủ huấn luyện viên bàn thắng hiệp một hiệp hai '
+    'sân cỏ khán giả đội tuyển chuyển nhượng hợp đồng mùa giải vòng đấu '
+    'Premier League La Liga Champions League Messi Ronaldo HLV V-League'
+).split()
+
+
+def _sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length)).capitalize() + '.'
+
+
+def _sidebar(rng, blocks):
+    """Khối tin liên quan/quảng cáo bao quanh bài (làm cây DOM lớn như trang thật)"""
+    html = []
+    for b in range(blocks):
+        links = ''.join(
+            f'<li><a href="/the-thao/tin-{b}-{i}.html">{_sentence(rng, 8)}</a></li>'
+            for i in range(20)
+        )
+        html.append(f'<div class="box-category"><ul class="list-news">{links}</ul></div>')
+    return ''.join(html)
+
+
+def generate_article(seed=0, paragraphs=30, images=6, sidebar_blocks=20):
+    """HTML một trang bài viết: tiêu đề, sapo, ngày đăng, nội dung .fck_detail có ảnh + caption"""
+    rng = random.Random(seed)
+    body = []
+    for i in range(paragraphs):
+        body.append(f'<p class="Normal">{_sentence(rng, rng.randint(20, 60))}</p>')
+        if images and i % max(1, paragraphs // images) == 0 and i // max(1, paragraphs // images) < images:
+            n = i // max(1, paragraphs // images)
+            body.append(
+                '<figure class="tplCaption"><div class="fig-picture"><picture>'
+                f'<source data-srcset="https://i1-thethao.vnecdn.net/2024/05/0{n % 9 + 1}/anh-{seed}-{n}.jpg 1x">'
+                f'<img itemprop="contentUrl" data-src="https://i1-thethao.vnecdn.net/2024/05/0{n % 9 + 1}/anh-{seed}-{n}.jpg" '
+                f'alt="{_sentence(rng, 6)}" src="data:image/gif;base64,R0lGODlhAQABAAAAACw=">'
+                '</picture></div>'
+                f'<figcaption itemprop="description"><p class="Image">{_sentence(rng, 12)}</p></figcaption>'
+                '</figure>'
+            )
+    title = _sentence(rng, 12)
+    return (
+        '<!DOCTYPE html><html lang="vi"><head><meta charset="utf-8">'
+        f'<title>{title}</title>'
+        '<meta name="pubdate" content="2024-05-01T10:00:00+07:00">'
+        '<script>window.dataLayer = window.dataLayer || [];</script>'
+        '</head><body>'
+        f'{_sidebar(rng, sidebar_blocks // 2)}'
+        '<section class="section page-detail top-detail"><div class="container">'
+        '<div class="header-content"><span class="date">Thứ tư, 1/5/2024, 10:00 (GMT+7)</span></div>'
+        f'<h1 class="title-detail">{title}</h1>'
+        f'<p class="description">{_sentence(rng, 30)}</p>'
+        f'<article class="fck_detail">{"".join(body)}</article>'
+        '</div></section>'
+        f'{_sidebar(rng, sidebar_blocks - sidebar_blocks // 2)}'
+        '</body></html>'
+    )
+
+
+def generate_listing(seed=0, items=30):
+    """HTML trang danh sách: các .item-news có tiêu đề, thumbnail, mô tả"""
+    rng = random.Random(seed)
+    html = []
+    for i in range(items):
+        html.append(
+            '<article class="item-news item-news-common">'
+            f'<h3 class="title-news"><a href="https://vnexpress.net/the-thao/bai-{seed}-{i}.html">{_sentence(rng, 10)}</a></h3>'
+            f'<div class="thumb-art"><picture><img data-src="https://i1-thethao.vnecdn.net/2024/05/01/thumb-{seed}-{i}.jpg" alt=""></picture></div>'
+            f'<p class="description">{_sentence(rng, 25)}</p>'
+            '</article>'
+        )
+    return f'<html><body><div class="width_common list-news-subfolder">{"".join(html)}</div></body></html>'
+
+
+def generate_corpus(count=20, seed=0, **kwargs):
+    """Danh sách (url, html) các bài viết"""
+    return [
+        (f'https://vnexpress.net/the-thao/bai-{seed}-{i}.html', generate_article(seed + i, **kwargs))
+        for i in range(count)
+    ]
+
+
+TEAMS = [
+    'Man City', 'Liverpool', 'Arsenal', 'Chelsea', 'Man Utd', 'Tottenham',
+    'Newcastle', 'Aston Villa', 'Brighton', 'West Ham', 'Crystal Palace',
+    'Fulham', 'Wolves', 'Everton', 'Brentford', 'Nottingham Forest',
+    'Bournemouth', 'Leicester', 'Southampton', 'Ipswich'
+]
+
+
+def generate_schedule_page(seed=0, rounds=10, filler_paragraphs=200):
+    """
+    HTML trang lịch thi đấu lớn: nhiều vòng đấu, mỗi trận có ngày giờ riêng,
+    xen lẫn nhiều đoạn văn không liên quan (giống trang tổng hợp thật)
+    """
+    rng = random.Random(seed)
+    html = []
+    for r in range(rounds):
+        html.append(f'<h2>Vòng {r + 1} Ngoại hạng Anh</h2><ul class="match-schedule">')
+        teams = TEAMS[:]
+        rng.shuffle(teams)
+        for i in range(0, len(teams), 2):
+            day = (r * 7 + i // 4) % 28 + 1
+            sep = rng.choice(['vs', '-', 'gặp'])
+            html.append(
+                f'<li>{day:02d}/{(r % 12) + 1:02d}/2025 {rng.choice(["18:30", "21:00", "23:30"])} '
+                f'{teams[i]} {sep} {teams[i + 1]}</li>'
+            )
+        html.append('</ul>')
+        for _ in range(filler_paragraphs // rounds):
+            html.append(f'<p>{_sentence(rng, rng.randint(30, 80))}</p>')
+    return f'<html><body><div class="container">{"".join(html)}</div></body></html>'
+
+
+COMPETITIONS = [
+    ('Ngoại Hạng Anh', 'EPL'), ('La Liga', 'LL'), ('Serie A', 'SA'),
+    ('Bundesliga', 'BL'), ('Champions League', 'C1'), ('V-League', 'VL'),
+]
+
+
+def generate_robong_day(day, seed=0, competitions=4, matches=10):
+    """
+    JSON một ngày của Robong API (cùng định dạng parser đọc): các giải đấu,
+    mỗi giải có trận đã đá/đang đá/chưa đá với giờ bắt đầu trong ngày `day`
+
+    Args:
+        day: datetime (chỉ dùng phần ngày)
+    """
+    rng = random.Random(f"{seed}-{day:%Y%m%d}")
+    start = int(day.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+    result = []
+    for c in range(competitions):
+        name, short_name = COMPETITIONS[c % len(COMPETITIONS)]
+        teams = TEAMS[:]
+        rng.shuffle(teams)
+        # Mỗi giải một bộ tên đội riêng (không trùng trận giữa các giải)
+        team_name = (lambda team: team) if c == 0 else (lambda team, s=short_name: f"{team} {s}")
+        items = []
+        for m in range(matches):
+            home, away = teams[(2 * m) % len(teams)], teams[(2 * m + 1) % len(teams)]
+            status = rng.choice(['pending', 'pending', 'live', 'finished'])
+            score = {} if status == 'pending' else {'home_score': rng.randint(0, 4), 'away_score': rng.randint(0, 4)}
+            items.append(dict({
+                'id': f"{day:%Y%m%d}{c:02d}{m:03d}",
+                'match_time': start + rng.randint(10, 23) * 3600 + rng.choice([0, 30]) * 60,
+                'status_text': status,
+                'home_team': {'name': team_name(home),
+                              'short_name': home[:3].upper(),
+                              'logo': f"https://cdn.robong.net/logo/{home.lower().replace(' ', '-')}.png"},
+                'away_team': {'name': team_name(away),
+                              'short_name': away[:3].upper(),
+                              'logo': f"https://cdn.robong.net/logo/{away.lower().replace(' ', '-')}.png"},
+            }, **score))
+        result.append({'name': name, 'short_name': short_name, 'matches': items})
+    return json.dumps({'status': True, 'result': result}, ensure_ascii=False)
+
+
+def build_replay_archive(path, listing_url, articles=20, api_days=None, paragraphs=30, images=6,
+                         competitions=4, matches=10):
+    """
+    Dựng archive HTTP replay (network/replay.py) từ corpus tổng hợp, để chạy
+    NewsCrawler/MatchCrawler end-to-end không cần mạng
+
+    Args:
+        path: File archive (ghi thêm nếu đã có)
+        listing_url: URL trang danh sách (base_url của nguồn tin)
+        articles: Số bài trong trang danh sách (mỗi bài có trang chi tiết)
+        api_days: Dict URL API → datetime của ngày (Robong)
+
+    Returns:
+        Số response đã ghi
+    """
+    archive = HttpArchive(path, RECORD)
+    headers = {'Content-Type': 'text/html; charset=utf-8'}
+    try:
+        archive.add(listing_url, generate_listing(items=articles), headers=headers)
+        for url, html in generate_corpus(articles, paragraphs=paragraphs, images=images):
+            archive.add(url, html, headers=headers)
+        for url, day in (api_days or {}).items():
+            archive.add(url, generate_robong_day(day, competitions=competitions, matches=matches),
+                        headers={'Content-Type': 'application/json'})
+    finally:
+        archive.close()
+    return 1 + articles + len(api_days or {})
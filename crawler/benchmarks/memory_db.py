@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Memory DB - Thay DatabaseHandler khi benchmark end-to-end (không cần MySQL)
+
+Chỉ cài các method NewsCrawler/MatchCrawler gọi, cùng định dạng trả về;
+`latency` giả lập thời gian một round trip tới DB cho mỗi lần gọi.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+
+class MemoryDatabase:
+    """Lưu bài viết/đội/trận đấu trong bộ nhớ"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.articles = {}      # slug → article_data
+        self.seen_urls = set()
+        self.teams = {}         # team_name → team_id
+        self.matches = []       # match_data (có match_id)
+        self.notifications = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def filter_seen_urls(self, urls):
+        self._round_trip()
+        with self._lock:
+            return {url for url in urls if url in self.seen_urls}
+
+    def insert_articles_bulk(self, articles):
+        self._round_trip()
+        article_ids = []
+        with self._lock:
+            for article in articles:
+                if article['slug'] in self.articles:
+                    article_ids.append(None)
+                    continue
+                self.articles[article['slug']] = article
+                self.seen_urls.add(article.get('source_url'))
+                article_ids.append(len(self.articles))
+        return article_ids
+
+    def preload_teams(self):
+        self._round_trip()
+        return len(self.teams)
+
+    def resolve_teams(self, teams):
+        self._round_trip()
+        with self._lock:
+            for team in teams:
+                if team.get('name') and team['name'] not in self.teams:
+                    self.teams[team['name']] = len(self.teams) + 1
+            return {team['name']: self.teams[team['name']] for team in teams if team.get('name')}
+
+    def upsert_matches(self, batch):
+        """Trùng khi cùng hai đội và lệch dưới 12 giờ (giống DatabaseHandler.upsert_matches)"""
+        self._round_trip()
+        summary = {'results': [], 'changes': [], 'inserted': 0, 'updated': 0, 'unchanged': 0}
+        window = timedelta(hours=12)
+        with self._lock:
+            for match_data in batch:
+                existing = next((
+                    row for row in self.matches
+                    if row['home_team_id'] == match_data['home_team_id']
+                    and row['away_team_id'] == match_data['away_team_id']
+                    and abs(row['match_date'] - match_data['match_date']) < window
+                ), None)
+                if existing is None:
+                    self.matches.append(dict(match_data, match_id=len(self.matches) + 1))
+                    summary['results'].append('inserted')
+                    summary['inserted'] += 1
+                    continue
+
+                new = {column: match_data.get(column) for column in ('home_score', 'away_score', 'status')}
+                old = {column: existing.get(column) for column in new}
+                if new == old:
+                    summary['results'].append('unchanged')
+                    summary['unchanged'] += 1
+                    continue
+                existing.update(new)
+                summary['results'].append('updated')
+                summary['updated'] += 1
+                summary['changes'].append({
+                    'match_id': existing['match_id'],
+                    'home_team_id': existing['home_team_id'],
+                    'away_team_id': existing['away_team_id'],
+                    'home_team_name': match_data['home_team_name'],
+                    'away_team_name': match_data['away_team_name'],
+                    'old': old,
+                    'new': new,
+                })
+        return summary
+
+    def notify_team_followers(self, events):
+        self._round_trip()
+        with self._lock:
+            self.notifications += len(events)
+        return len(events)
+
+    def get_statistics(self):
+        return {
+            'total_articles': len(self.articles),
+            'total_categories': len({article['category_id'] for article in self.articles.values()}),
+            'total_tags': len({tag for article in self.articles.values() for tag in article.get('tags', ())}),
+            'total_matches': len(self.matches),
+        }
+
+    def close(self):
+        pass
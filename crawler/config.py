@@ -15,6 +15,14 @@ DB_CONFIG = {
     'charset': 'utf8mb4'
 }
 
+# Pool kết nối database (dùng chung giữa các worker của crawler)
+DB_POOL = {
+    'size': 5,                  # Số kết nối tối đa
+    'idle_check_seconds': 30,   # Kết nối nằm yên lâu hơn thì ping trước khi dùng
+    'checkout_timeout': 30,     # Số giây chờ khi mọi kết nối đều bận
+    'connect_retries': 3        # Số lần thử khi tạo kết nối (backoff 1s, 2s, 4s...)
+}
+
 # Base Directory
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -26,6 +34,13 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # API_BASE_URL = 'http://localhost/com.nhd.news/api'  # Development
 API_BASE_URL = 'https://nhd6.site/api'  # Production
 
+# Số tag (tag_name → tag_id) giữ trong bộ nhớ để không phải query lại
+TAG_CACHE_SIZE = 5000
+# Số khóa (tên/mã đội → team_id) giữ trong bộ nhớ
+TEAM_CACHE_SIZE = 10000
+# Số trang danh sách giữ kết quả parse gần nhất (dùng lại khi trang không đổi)
+LISTING_MEMO_SIZE = 256
+
 # Default Author ID (user crawler_bot - ID từ setup_database.sql)
 DEFAULT_AUTHOR_ID = 1  # ID của user crawler_bot (kiểm tra trong database)
 
@@ -36,9 +51,120 @@ DEFAULT_AUTHOR_ID = 1  # ID của user crawler_bot (kiểm tra trong database)
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 REQUEST_TIMEOUT = 30
 RETRY_TIMES = 3
-DELAY_BETWEEN_REQUESTS = 2  # seconds
+# Chính sách retry mặc định cho get_page
+# Mỗi nguồn trong NEWS_SOURCES/MATCH_SOURCES có thể khai báo 'retry' để ghi đè
+RETRY_POLICY = {
+    'max_attempts': RETRY_TIMES,
+    'backoff_base': 1.0,        # seconds - Thời gian chờ cơ sở, nhân đôi sau mỗi lần thử
+    'backoff_max': 30.0,        # seconds - Thời gian chờ tối đa giữa 2 lần thử
+    'max_total_time': 60.0,     # seconds - Tổng thời gian tối đa dành cho một URL
+    'retry_statuses': (408, 425, 429, 500, 502, 503, 504),  # Các status khác (404, 403...) dừng ngay
+    'jitter': True,
+}
+# DELAY_BETWEEN_REQUESTS (DEPRECATED - Đã thay bằng rate limit token bucket theo host, xem DEFAULT_RATE_LIMIT)
+# DELAY_BETWEEN_REQUESTS = 2  # seconds
+MAX_CONCURRENT_REQUESTS = 8  # Số request tối đa chạy song song (fetch_many)
+MAX_CONCURRENT_PER_HOST = 4  # Số request đồng thời tối đa tới cùng một host
+# Pipeline crawl bài viết: số worker cho từng giai đoạn (fetch → parse → ghi DB)
+# Có thể override theo nguồn bằng key 'workers' trong NEWS_SOURCES
+PIPELINE_WORKERS = {
+    'fetch': 4,   # Request mạng (bị giới hạn thêm bởi MAX_CONCURRENT_PER_HOST)
+    'parse': 2,   # Parse HTML bằng lxml/BeautifulSoup
+    'write': 1,   # Ghi MySQL (mỗi worker một kết nối riêng)
+}
+PIPELINE_QUEUE_SIZE = 20  # Kích thước tối đa queue giữa các giai đoạn
+PIPELINE_WRITE_BATCH_SIZE = 10  # Số bài viết ghi DB trong một transaction
+# Số process parse HTML song song (lxml/BeautifulSoup/regex tốn CPU, bị GIL giới hạn một core)
+# 0 = parse ngay trong process chính; không tạo được process pool thì tự quay về 0
+PARSE_PROCESS_WORKERS = 0
+
+# Backfill: crawl lại các trang danh sách cũ (-p2, -p3...) của từng chuyên mục
+BACKFILL = {
+    'max_pages': 30,           # Số trang danh sách tối đa mỗi chuyên mục (mặc định của --pages)
+    'frontier_size': 200,      # Số bài tối đa chờ tải (trang danh sách chỉ đọc tiếp khi còn chỗ)
+    'write_batch_size': 50,    # Số bài ghi DB trong một transaction
+    'checkpoint_dir': BASE_DIR / 'crawler' / 'cache' / 'backfill',
+    'progress_interval': 30,   # Số giây giữa hai lần log tiến độ
+}
+
+# Work queue bền vững (SQLite): lưu URL bài viết/ngày lịch thi đấu đã phát hiện và trạng thái
+# (pending → fetched → parsed → stored), crawler bị dừng giữa chừng thì lần sau chạy tiếp
+WORK_QUEUE = {
+    'enabled': True,
+    'path': BASE_DIR / 'crawler' / 'cache' / 'work_queue.sqlite',
+    'max_attempts': 5,          # Lỗi quá số lần này thì bỏ hẳn item (dead)
+    'backoff_base': 60.0,       # seconds - Chờ trước lần thử lại đầu tiên, nhân đôi sau mỗi lần lỗi
+    'backoff_max': 6 * 3600.0,  # seconds - Thời gian chờ tối đa giữa hai lần thử
+    'retention': 7 * 86400.0,   # seconds - Item đã xong (stored/dead) cũ hơn thì xóa khỏi queue
+}
+
+# Chế độ daemon (daemon.py): chạy thường trực, giữ pool DB, HTTP session và cache luôn "nóng"
+# Nguồn LIVE_SCORES['source'] còn có thêm job poll tỉ số trực tiếp theo LIVE_SCORES['interval']
+# Mỗi nguồn trong NEWS_SOURCES/MATCH_SOURCES có thể khai báo 'interval' (giây) riêng
+DAEMON = {
+    'news_interval': 300,        # seconds - Mặc định cho nguồn tin tức
+    'match_interval': 600,       # seconds - Mặc định cho nguồn lịch thi đấu
+    'news_limit': 10,            # Số bài mỗi lần crawl một nguồn
+    'match_limit': 50,           # Số trận mỗi lần crawl một nguồn
+    'match_days_range': (1, 1),  # Hôm qua, hôm nay, hôm sau
+    'stats_interval': 600,       # seconds - Khoảng thời gian giữa hai lần log thống kê
+}
+
+# Chế độ live (live_scores.py): chỉ theo dõi trận đang đá hoặc sắp đá, poll tỉ số theo chu kỳ ngắn
+LIVE_SCORES = {
+    'source': 'robong_api',      # Key trong MATCH_SOURCES
+    'interval': 15,              # seconds - Chu kỳ poll
+    'soon_minutes': 15,          # Trận scheduled bắt đầu trong vòng N phút tới thì theo dõi
+    'started_window_hours': 3,   # Trận scheduled đã tới giờ đá trong N giờ qua vẫn theo dõi
+    'refresh_interval': 60,      # seconds - Chu kỳ nạp lại danh sách trận cần theo dõi từ DB
+    'max_matches_per_day': 1000,
+}
+
+# Thông báo cho người theo dõi đội (bảng favorites) khi trận đấu có sự kiện
+NOTIFICATIONS = {
+    'enabled': True,
+    'events': ('kickoff', 'goal', 'full_time'),  # Bắt đầu, bàn thắng, kết thúc
+}
+
+# Rate limit mặc định cho mỗi host (token bucket)
+# - requests_per_second: số request trung bình mỗi giây
+# - burst: số request được gửi dồn khi bucket đầy
+# Mỗi nguồn trong NEWS_SOURCES/MATCH_SOURCES có thể khai báo 'rate_limit' riêng
+DEFAULT_RATE_LIMIT = {
+    'requests_per_second': 0.5,
+    'burst': 1,
+}
 PAGE_LOAD_DELAY = 3  # seconds - Delay để chờ JavaScript render xong
 
+# HTTP Cache (conditional GET với ETag/Last-Modified)
+# Mỗi nguồn có thể khai báo 'cache_ttl' (giây): trong thời gian này dùng luôn bản cache,
+# hết hạn thì hỏi lại server (304 nếu không đổi). 0 = luôn hỏi lại server
+HTTP_CACHE = {
+    'enabled': True,
+    'directory': BASE_DIR / 'crawler' / 'cache',
+    'max_bytes': 200 * 1024 * 1024,  # 200MB, vượt quá thì xóa entry ít dùng nhất (LRU)
+    'default_ttl': 0,
+}
+
+# Ghi/phát lại HTTP (network/replay.py) để chạy crawler offline, kết quả lặp lại được:
+#   CRAWLER_HTTP_MODE=record  → lưu mọi response của get_page vào archive
+#   CRAWLER_HTTP_MODE=replay  → không gửi request, trả response đã ghi
+# Khi bật record/replay thì HTTP_CACHE không được dùng (record luôn lấy body đầy đủ,
+# replay không phụ thuộc trạng thái cache)
+HTTP_REPLAY = {
+    'mode': os.environ.get('CRAWLER_HTTP_MODE') or None,  # None | 'record' | 'replay'
+    'archive': Path(os.environ.get('CRAWLER_HTTP_ARCHIVE', BASE_DIR / 'crawler' / 'cache' / 'http_archive.sqlite')),
+    'latency': os.environ.get('CRAWLER_HTTP_LATENCY', 0),  # seconds khi replay, hoặc 'recorded' (thời gian tải lúc ghi)
+    'jitter': float(os.environ.get('CRAWLER_HTTP_JITTER', 0)),  # seconds - cộng thêm ngẫu nhiên 0..jitter
+}
+
+# Chế độ stream cho trang bài viết (nguồn có 'stream': True):
+# đọc response theo chunk, chỉ giữ tiêu đề/sapo/nội dung/meta, bỏ phần còn lại ngay
+STREAM_PARSE = {
+    'chunk_size': 16 * 1024,
+    'max_bytes': 3 * 1024 * 1024,  # Đọc tối đa 3MB mỗi trang, vượt quá thì parse phần đã có
+}
+
 # Category Mapping (Vietnamese keywords to category_id)
 CATEGORY_MAPPING = {
     'bóng đá': 1,
@@ -71,13 +197,41 @@ CATEGORY_MAPPING = {
     'motogp': 5,
 }
 
+# Trọng số khi chấm điểm category: từ khóa xuất hiện ở tiêu đề quan trọng hơn ở nội dung
+CATEGORY_WEIGHTS = {
+    'title': 3,
+    'url': 2,
+    'content': 1,
+}
+
+# Từ vựng để gắn tag cho bài viết (khớp nguyên từ, không phân biệt hoa thường)
+# Có thể thêm hàng nghìn tên đội/cầu thủ mà không làm chậm việc parse
+TAG_KEYWORDS = [
+    'Premier League', 'La Liga', 'Serie A', 'Bundesliga',
+    'Champions League', 'Europa League', 'World Cup',
+    'Manchester United', 'Liverpool', 'Real Madrid', 'Barcelona',
+    'Arsenal', 'Chelsea', 'Man City', 'PSG', 'Bayern Munich',
+    'Messi', 'Ronaldo', 'Neymar', 'Mbappe',
+    'V-League', 'AFF Cup', 'SEA Games',
+    'Chuyển nhượng', 'Transfer', 'HLV', 'Coach'
+]
+
+# Số tag tối đa cho mỗi bài viết
+MAX_TAGS_PER_ARTICLE = 10
+
 # News Sources Configuration
 NEWS_SOURCES = {
     'vnexpress': {
         'name': 'VnExpress Thể Thao',
         'base_url': 'https://vnexpress.net/the-thao',
         'enabled': True,
-        'parser': 'VnExpressParser'
+        'parser': 'VnExpressParser',
+        'rate_limit': {'requests_per_second': 1, 'burst': 3},
+        'cache_ttl': 120,
+        'stream': True,  # Tải bài viết theo chunk, chỉ giữ tiêu đề/sapo/nội dung
+        'interval': 300,  # seconds - Chu kỳ crawl ở chế độ daemon
+        # Chuyên mục con (base_url/<section>), dùng cho backfill
+        'sections': ['bong-da', 'tennis', 'marathon', 'cac-mon-khac', 'hau-truong']
     }
 }
 
@@ -87,13 +241,18 @@ MATCH_SOURCES = {
         'name': 'VnExpress Lịch Thi Đấu Ngoại Hạng Anh',
         'base_url': 'https://vnexpress.net/the-thao/ngoai-hang-anh/lich-thi-dau',
         'enabled': False,
-        'parser': 'VnExpressMatchParser'
+        'parser': 'VnExpressMatchParser',
+        'rate_limit': {'requests_per_second': 1, 'burst': 3}
     },
     'robong_api': {
         'name': 'Robong API Lịch Thi Đấu',
         'base_url': 'https://api.robong.net/match/list',
         'enabled': True,
-        'parser': 'RobongMatchParser'
+        'parser': 'RobongMatchParser',
+        'rate_limit': {'requests_per_second': 2, 'burst': 7},
+        'retry': {'max_attempts': 4, 'max_total_time': 30.0},
+        'cache_ttl': 0,  # Lịch/tỉ số thay đổi liên tục, luôn revalidate
+        'interval': 120  # seconds - Chu kỳ crawl ở chế độ daemon
     }
 }
 
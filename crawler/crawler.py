@@ -8,7 +8,11 @@ from logging.handlers import RotatingFileHandler
 from colorama import init, Fore, Style
 from database import DatabaseHandler
 from parsers import VnExpressParser
-from config import NEWS_SOURCES, LOG_FILE
+from pipeline import Pipeline, Stage
+from parse_pool import ParsePool
+from work_queue import get_work_queue, FETCHED, PARSED, STORED, FINAL_STATES
+from config import WORK_QUEUE, NEWS_SOURCES, LOG_FILE, PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE, PIPELINE_WRITE_BATCH_SIZE
+import threading
 import time
 from datetime import datetime
 
@@ -51,8 +55,9 @@ logger = setup_logging()
 class NewsCrawler:
     """Crawler chính cho tin tức thể thao"""
     
-    def __init__(self):
-        self.db = DatabaseHandler()
+    def __init__(self, db=None):
+        # db: DatabaseHandler dùng chung (vd. với MatchCrawler), mặc định tạo mới
+        self.db = db or DatabaseHandler()
         self.parsers = {
             'VnExpressParser': VnExpressParser(),
         }
@@ -62,6 +67,11 @@ class NewsCrawler:
             'total_skipped': 0,
             'total_errors': 0
         }
+        self._stats_lock = threading.Lock()
+        # Parse HTML trong process riêng (PARSE_PROCESS_WORKERS = 0 thì parse tại chỗ)
+        self.parse_pool = ParsePool()
+        # Hàng đợi bền vững: bài chưa lưu xong của lần chạy trước được xử lý tiếp
+        self.work_queue = get_work_queue()
     
     def print_header(self):
         """In header đẹp"""
@@ -97,55 +107,149 @@ class NewsCrawler:
             return
         
         parser = self.parsers[parser_name]
+        parser.configure(source_config)
         
         try:
             # Lấy danh sách bài viết
-            articles = parser.get_article_list(limit=limit)
+            articles = parser.get_article_list(limit=limit) or []
             
-            if not articles:
+            if articles:
+                print(f"{Fore.GREEN}  ✓ Tìm thấy {len(articles)} bài viết")
+            else:
                 logger.warning(f"⚠ Không tìm thấy bài viết nào từ {source_name}")
+                # Vẫn xử lý tiếp các bài còn trong work queue
+                if not self.work_queue:
+                    return
+            
+            for article_info in articles:
+                article_info['url'] = parser.canonical_url(article_info['url'])
+            
+            queue_name = f"news:{source_name}"
+            if self.work_queue:
+                # URL đã xong từ lâu: crawled_urls đã chống trùng, không cần giữ trong queue
+                self.work_queue.clear(queue_name, FINAL_STATES, older_than=WORK_QUEUE['retention'])
+                # Đưa bài mới vào hàng đợi, lấy thêm các bài lần trước chưa lưu xong
+                added = self.work_queue.add(queue_name, ((a['url'], a) for a in articles))
+                articles = [payload for _, payload in self.work_queue.due(queue_name)]
+                resumed = len(articles) - added
+                if resumed > 0:
+                    print(f"{Fore.YELLOW}  ↻ Tiếp tục {resumed} bài chưa xong từ lần chạy trước")
+            
+            # Bỏ qua các URL đã crawl trước khi tải/parse
+            seen_urls = self.db.filter_seen_urls(article_info['url'] for article_info in articles)
+            if seen_urls:
+                articles = [a for a in articles if a['url'] not in seen_urls]
+                self._count('total_skipped', len(seen_urls))
+                self._queue_mark(queue_name, seen_urls, STORED)
+                print(f"{Fore.YELLOW}  ⚠ Bỏ qua {len(seen_urls)} bài đã crawl trước đó")
+            print()
+            
+            if not articles:
+                logger.info(f"✓ Không có bài viết mới từ {source_name}")
                 return
             
-            print(f"{Fore.GREEN}  ✓ Tìm thấy {len(articles)} bài viết\n")
+            workers = dict(PIPELINE_WORKERS)
+            workers.update(source_config.get('workers', {}))
             
-            # Parse và lưu từng bài viết
-            for idx, article_info in enumerate(articles, 1):
-                print(f"{Fore.CYAN}  [{idx}/{len(articles)}] {article_info['title'][:60]}...")
-                
-                self.stats['total_crawled'] += 1
-                
-                # Parse chi tiết bài viết
-                article_data = parser.parse_article(article_info['url'])
-                
-                if not article_data:
-                    logger.error(f"  {Fore.RED}✗ Không thể parse bài viết")
-                    self.stats['total_errors'] += 1
-                    continue
-                
-                # Lưu vào database
-                article_id = self.db.insert_article(article_data)
-                
-                if article_id:
-                    print(f"  {Fore.GREEN}✓ Đã lưu (ID: {article_id})")
-                    self.stats['total_saved'] += 1
-                    
-                    # Thêm tags
-                    if article_data.get('tags'):
-                        self.db.insert_article_tags(article_id, article_data['tags'])
-                    
-                    # Thêm images
-                    if article_data.get('images'):
-                        self.db.insert_article_images(article_id, article_data['images'])
-                else:
-                    print(f"  {Fore.YELLOW}⚠ Bỏ qua (đã tồn tại)")
-                    self.stats['total_skipped'] += 1
-                
-                # Delay giữa các bài viết
-                time.sleep(2)
+            pipeline = Pipeline([
+                Stage('fetch', lambda item: self._fetch_stage(parser, item, queue_name),
+                      workers=workers['fetch'], queue_size=PIPELINE_QUEUE_SIZE),
+                # Mỗi thread parse chờ một process: cần ít nhất bằng số process
+                Stage('parse', lambda item: self._parse_stage(parser, item, queue_name),
+                      workers=max(workers['parse'], self.parse_pool.workers), queue_size=PIPELINE_QUEUE_SIZE),
+                Stage('write', lambda batch: self._write_stage(batch, queue_name),
+                      workers=workers['write'], queue_size=PIPELINE_QUEUE_SIZE,
+                      batch_size=PIPELINE_WRITE_BATCH_SIZE),
+            ])
+            
+            total = len(articles)
+            report = pipeline.run(
+                (idx, total, article_info) for idx, article_info in enumerate(articles, 1)
+            )
+            
+            # Lỗi ngoài dự kiến (exception) trong các stage
+            for stage_stats in report['stats'].values():
+                self._count('total_errors', stage_stats['errors'])
+            
+            elapsed = report['elapsed']
+            rate = total / elapsed if elapsed else 0
+            logger.info(f"✓ Pipeline {source_name}: {total} bài trong {elapsed:.2f}s ({rate:.2f} bài/giây)")
+            
+            unused = parser.selectors.unused_selectors()
+            if unused:
+                logger.debug(f"Selector chưa khớp lần nào ({source_name}): {unused}")
             
         except Exception as e:
             logger.error(f"✗ Lỗi crawl nguồn {source_name}: {e}")
-            self.stats['total_errors'] += 1
+            self._count('total_errors')
+    
+    def _count(self, key, value=1):
+        """Cập nhật thống kê (an toàn khi nhiều thread)"""
+        with self._stats_lock:
+            self.stats[key] += value
+    
+    def _queue_mark(self, queue_name, urls, state):
+        """Cập nhật trạng thái các URL trong work queue (nếu bật)"""
+        if self.work_queue and urls:
+            self.work_queue.mark(queue_name, list(urls), state)
+    
+    def _queue_fail(self, queue_name, url, error):
+        """Ghi nhận URL xử lý lỗi, work queue hẹn thử lại ở lần chạy sau"""
+        if self.work_queue:
+            self.work_queue.fail(queue_name, url, error)
+    
+    def _fetch_stage(self, parser, item, queue_name=None):
+        """Stage 1: tải HTML bài viết"""
+        idx, total, article_info = item
+        self._count('total_crawled')
+        
+        html = parser.get_page(article_info['url'], stream=parser.stream)
+        if not html:
+            logger.error(f"  {Fore.RED}✗ Không thể tải bài viết: {article_info['url']}")
+            self._count('total_errors')
+            self._queue_fail(queue_name, article_info['url'], 'fetch')
+            return None
+        self._queue_mark(queue_name, [article_info['url']], FETCHED)
+        return idx, total, article_info, html
+    
+    def _parse_stage(self, parser, item, queue_name=None):
+        """Stage 2: parse HTML (CPU)"""
+        idx, total, article_info, html = item
+        
+        article_data = self.parse_pool.call(parser, 'parse_article_html', article_info['url'], html)
+        if not article_data:
+            logger.error(f"  {Fore.RED}✗ Không thể parse bài viết: {article_info['url']}")
+            self._count('total_errors')
+            self._queue_fail(queue_name, article_info['url'], 'parse')
+            return None
+        self._queue_mark(queue_name, [article_info['url']], PARSED)
+        return idx, total, article_data
+    
+    def _write_stage(self, batch, queue_name=None):
+        """Stage 3: ghi một batch bài viết (kèm tags, images) vào database"""
+        # Mỗi write worker mượn kết nối riêng từ pool của self.db
+        article_ids = self.db.insert_articles_bulk([article_data for _, _, article_data in batch])
+        
+        for (idx, total, article_data), article_id in zip(batch, article_ids):
+            print(f"{Fore.CYAN}  [{idx}/{total}] {article_data['title'][:60]}...")
+            if article_id:
+                print(f"  {Fore.GREEN}✓ Đã lưu (ID: {article_id})")
+                self._count('total_saved')
+            else:
+                print(f"  {Fore.YELLOW}⚠ Bỏ qua (đã tồn tại)")
+                self._count('total_skipped')
+        
+        if self.work_queue:
+            urls = [article_data['source_url'] for _, _, article_data in batch]
+            stored = {url for url, article_id in zip(urls, article_ids) if article_id}
+            # None có thể là bài đã tồn tại hoặc lỗi DB: chỉ coi là xong khi URL đã được ghi nhận
+            stored |= self.db.filter_seen_urls(url for url in urls if url not in stored)
+            self._queue_mark(queue_name, stored, STORED)
+            for url in urls:
+                if url not in stored:
+                    self._queue_fail(queue_name, url, 'write')
+        
+        return article_ids
     
     def run(self, limit_per_source=10):
         """Chạy crawler cho tất cả các nguồn"""
@@ -183,6 +287,9 @@ class NewsCrawler:
     
     def close(self):
         """Đóng các kết nối"""
+        for parser in self.parsers.values():
+            parser.close()
+        self.parse_pool.close()
         self.db.close()
 
 
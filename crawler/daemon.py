@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Daemon - Chạy crawler thường trực thay cho việc gọi crawler.py/match_crawler.py theo cron
+
+Một process duy nhất giữ pool kết nối DB, HTTP session, cache tag/team và
+parser luôn "nóng". Mỗi nguồn trong NEWS_SOURCES/MATCH_SOURCES là một job
+chạy theo chu kỳ riêng ('interval' của nguồn, mặc định theo DAEMON); một job
+chưa chạy xong thì lượt kế tiếp của chính job đó bị bỏ qua (không chồng lấn).
+
+Ví dụ:
+    python daemon.py
+    python daemon.py --only vnexpress,robong_api
+"""
+
+import argparse
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from colorama import Fore, Style
+from database import DatabaseHandler
+from crawler import NewsCrawler, logger
+from match_crawler import MatchCrawler
+from live_scores import LiveScoreTracker
+from config import NEWS_SOURCES, MATCH_SOURCES, DAEMON, LIVE_SCORES
+
+# match_crawler có handler riêng, không đẩy tiếp lên root logger (tránh in log 2 lần)
+logging.getLogger('match_crawler').propagate = False
+
+
+class Job:
+    """
+    Một công việc chạy định kỳ
+
+    Args:
+        name: Tên job (dùng cho log)
+        func: Hàm không tham số
+        interval: Số giây giữa hai lần chạy (tính từ lúc bắt đầu lần trước)
+        start_delay: Số giây chờ trước lần chạy đầu tiên
+    """
+
+    def __init__(self, name, func, interval, start_delay=0):
+        self.name = name
+        self.func = func
+        self.interval = float(interval)
+        self.next_run = time.monotonic() + start_delay
+        self.stats = {'runs': 0, 'overlaps': 0, 'errors': 0, 'last_duration': 0.0}
+        self._running = threading.Lock()
+
+    def run(self):
+        """Chạy job (trong thread của scheduler), đã giữ self._running"""
+        started = time.monotonic()
+        try:
+            self.func()
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"✗ Lỗi job {self.name}: {e}", exc_info=True)
+        finally:
+            self.stats['runs'] += 1
+            self.stats['last_duration'] = time.monotonic() - started
+            self._running.release()
+            if self.stats['last_duration'] > self.interval:
+                logger.warning(f"⚠ Job {self.name} chạy {self.stats['last_duration']:.1f}s, "
+                               f"lâu hơn chu kỳ {self.interval:.0f}s")
+
+
+class Scheduler:
+    """Chạy các Job theo chu kỳ, mỗi job tối đa một lượt tại một thời điểm"""
+
+    def __init__(self, jobs):
+        if not jobs:
+            raise ValueError("Scheduler cần ít nhất một job")
+        self.jobs = jobs
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix='job')
+
+    def run(self):
+        """Vòng lặp chính, chạy tới khi stop() được gọi"""
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in self.jobs:
+                if job.next_run > now:
+                    continue
+                # Lịch cố định theo chu kỳ; trễ quá một chu kỳ thì tính lại từ bây giờ
+                job.next_run += job.interval
+                if job.next_run <= now:
+                    job.next_run = now + job.interval
+
+                if not job._running.acquire(blocking=False):
+                    job.stats['overlaps'] += 1
+                    logger.info(f"⏭ Bỏ qua lượt {job.name}: lượt trước chưa xong")
+                    continue
+                self._executor.submit(job.run)
+
+            next_due = min(job.next_run for job in self.jobs)
+            self._stop.wait(max(0.0, next_due - time.monotonic()))
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        """Chờ các job đang chạy xong"""
+        self._executor.shutdown(wait=True)
+
+
+class CrawlerDaemon:
+    """Dựng job cho từng nguồn, dùng chung một DatabaseHandler giữa các crawler"""
+
+    def __init__(self, only=None):
+        self.db = DatabaseHandler()
+        self.news_crawler = NewsCrawler(db=self.db)
+        self.match_crawler = MatchCrawler(db=self.db)
+        self.live_tracker = None
+        self.only = set(only) if only else None
+        self.started_at = None
+
+    def build_jobs(self):
+        jobs = []
+        for source_name, source_config in NEWS_SOURCES.items():
+            if self._enabled(source_name, source_config):
+                jobs.append(Job(
+                    f"news:{source_name}",
+                    lambda name=source_name, cfg=source_config: self.news_crawler.crawl_source(
+                        name, cfg, limit=DAEMON['news_limit']),
+                    source_config.get('interval', DAEMON['news_interval'])
+                ))
+        for source_name, source_config in MATCH_SOURCES.items():
+            if self._enabled(source_name, source_config):
+                jobs.append(Job(
+                    f"matches:{source_name}",
+                    lambda name=source_name, cfg=source_config: self.match_crawler.crawl_matches(
+                        name, cfg, limit=DAEMON['match_limit'], days_range=DAEMON['match_days_range']),
+                    source_config.get('interval', DAEMON['match_interval'])
+                ))
+        live_source = LIVE_SCORES['source']
+        if self._enabled(live_source, MATCH_SOURCES.get(live_source, {})):
+            # Poll tỉ số trận đang đá với chu kỳ ngắn (parser riêng, không chung với lịch thi đấu)
+            self.live_tracker = LiveScoreTracker(self.db, live_source)
+            jobs.append(Job(f"live:{live_source}", self.live_tracker.tick, LIVE_SCORES['interval']))
+        jobs.append(Job('stats', self.log_stats, DAEMON['stats_interval'],
+                        start_delay=DAEMON['stats_interval']))
+        return jobs
+
+    def _enabled(self, source_name, source_config):
+        if self.only is not None and source_name not in self.only:
+            return False
+        return source_config.get('enabled', False)
+
+    def log_stats(self):
+        """Log thống kê cộng dồn từ lúc khởi động"""
+        if self.started_at is None:
+            return
+        uptime = time.time() - self.started_at
+        news, matches = self.news_crawler.stats, self.match_crawler.stats
+        logger.info(
+            f"📊 Daemon chạy {uptime / 60:.0f} phút: "
+            f"{news['total_saved']} bài mới, {news['total_skipped']} bỏ qua, {news['total_errors']} lỗi | "
+            f"{matches['matches_saved']} trận mới, {matches['matches_updated']} cập nhật, "
+            f"{matches['matches_errors']} lỗi"
+        )
+        if self.live_tracker:
+            live = self.live_tracker.stats
+            logger.info(f"📊 Live: {live['polls']} lượt poll, {live['updated']} cập nhật tỉ số, "
+                        f"{live['notifications_sent']} thông báo, {live['errors']} lỗi")
+
+    def run(self):
+        jobs = self.build_jobs()
+        for job in jobs:
+            if job.name != 'stats':
+                print(f"{Fore.CYAN}  • {job.name}: mỗi {job.interval:.0f}s{Style.RESET_ALL}")
+
+        # Nạp sẵn cache team một lần, các lượt crawl sau không phải query lại
+        self.db.preload_teams()
+
+        self.started_at = time.time()
+        scheduler = Scheduler(jobs)
+
+        def handle_signal(signum, frame):
+            logger.info(f"⚠ Nhận tín hiệu {signum}, đang dừng daemon...")
+            scheduler.stop()
+
+        signal.signal(signal.SIGTERM, handle_signal)
+        logger.info(f"🚀 Daemon bắt đầu lúc: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        try:
+            scheduler.run()
+        finally:
+            scheduler.stop()
+            scheduler.close()
+            self.log_stats()
+
+    def close(self):
+        """Đóng parser của cả hai crawler rồi mới đóng pool DB dùng chung"""
+        for parser in self.news_crawler.parsers.values():
+            parser.close()
+        self.news_crawler.parse_pool.close()
+        for parser in self.match_crawler.match_parsers.values():
+            parser.close()
+        if self.live_tracker:
+            self.live_tracker.close()
+        self.db.close()
+
+
+def main():
+    """Hàm main"""
+    arg_parser = argparse.ArgumentParser(description='Chạy crawler thường trực theo lịch')
+    arg_parser.add_argument('--only', help='Chỉ chạy các nguồn này (key trong NEWS_SOURCES/MATCH_SOURCES, '
+                                           'cách nhau bởi dấu phẩy)')
+    args = arg_parser.parse_args()
+    only = [s.strip() for s in args.only.split(',')] if args.only else None
+
+    daemon = None
+    try:
+        daemon = CrawlerDaemon(only=only)
+        daemon.run()
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}⚠ Đã dừng daemon bởi người dùng{Style.RESET_ALL}")
+    except Exception as e:
+        logger.error(f"✗ Lỗi nghiêm trọng: {e}", exc_info=True)
+    finally:
+        if daemon:
+            daemon.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,66 +4,300 @@ Database Handler - Xử lý kết nối và thao tác với database
 """
 
 import mysql.connector
-from mysql.connector import Error
-from config import DB_CONFIG
+from mysql.connector import Error, errors
+from config import DB_CONFIG, DB_POOL, TAG_CACHE_SIZE, TEAM_CACHE_SIZE
+import functools
+import hashlib
 import logging
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from slugify import slugify
+from utils import LRUCache
+from match_events import is_status_regression
 
 logger = logging.getLogger(__name__)
 
+# Bảng riêng của crawler, tự tạo nếu chưa có
+CRAWLER_TABLES = {
+    # Chỉ mục URL nguồn đã crawl (tránh tải lại bài đã lưu)
+    'crawled_urls': """
+        CREATE TABLE IF NOT EXISTS crawled_urls (
+            url_hash CHAR(40) NOT NULL,
+            source_url VARCHAR(1000) NOT NULL,
+            article_id INT(11) DEFAULT NULL,
+            first_seen_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_seen_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (url_hash),
+            KEY idx_article (article_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+}
 
-class DatabaseHandler:
-    """Xử lý tất cả các thao tác với database"""
-    
-    def __init__(self):
-        self.connection = None
-        self.connect()
-    
-    def connect(self, retry_count=3):
-        """Kết nối đến database với retry"""
-        for attempt in range(retry_count):
+
+def url_hash(url):
+    """Hash cố định độ dài của URL (dùng làm khóa chính)"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+class ConnectionPool:
+    """
+    Pool kết nối MySQL dùng chung giữa các thread
+
+    Kết nối trả về pool được dùng lại theo thứ tự LIFO (kết nối vừa dùng còn
+    "nóng"). Chỉ ping server khi lấy ra một kết nối đã nằm yên lâu hơn
+    idle_check_seconds hoặc lần dùng trước bị lỗi kết nối.
+
+    Args:
+        size: Số kết nối tối đa
+        idle_check_seconds: Kết nối nằm yên lâu hơn ngưỡng này thì ping trước khi dùng
+        checkout_timeout: Số giây chờ khi mọi kết nối đều đang bận
+        connect_retries: Số lần thử khi tạo kết nối mới (backoff tăng dần)
+    """
+
+    def __init__(self, size=5, idle_check_seconds=30, checkout_timeout=30, connect_retries=3):
+        self.size = max(1, int(size))
+        self.idle_check_seconds = idle_check_seconds
+        self.checkout_timeout = checkout_timeout
+        self.connect_retries = max(1, int(connect_retries))
+        self._idle = []  # [(connection, last_used, suspect)]
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        """Tạo kết nối mới, thử lại với backoff 1s, 2s, 4s..."""
+        for attempt in range(self.connect_retries):
             try:
-                self.connection = mysql.connector.connect(**DB_CONFIG)
-                if self.connection.is_connected():
-                    logger.info(f"✓ Đã kết nối đến database thành công: {DB_CONFIG['host']}/{DB_CONFIG['database']}")
-                    return True
+                connection = mysql.connector.connect(**DB_CONFIG)
+                # READ COMMITTED: kết nối dùng lại lâu vẫn thấy dữ liệu mới nhất
+                cursor = connection.cursor()
+                cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
+                cursor.close()
+                logger.info(f"✓ Đã kết nối đến database thành công: {DB_CONFIG['host']}/{DB_CONFIG['database']}")
+                return connection
             except Error as e:
                 error_msg = str(e)
-                if attempt < retry_count - 1:
-                    logger.warning(f"⚠ Lỗi kết nối database (lần thử {attempt + 1}/{retry_count}): {error_msg}")
-                    logger.info("  Đang thử kết nối lại...")
-                    import time
-                    time.sleep(2)
+                if attempt < self.connect_retries - 1:
+                    delay = 2 ** attempt
+                    logger.warning(f"⚠ Lỗi kết nối database (lần thử {attempt + 1}/{self.connect_retries}): {error_msg}")
+                    logger.info(f"  Đang thử kết nối lại sau {delay}s...")
+                    time.sleep(delay)
                 else:
-                    logger.error(f"✗ Không thể kết nối database sau {retry_count} lần thử")
+                    logger.error(f"✗ Không thể kết nối database sau {self.connect_retries} lần thử")
                     logger.error(f"  Chi tiết lỗi: {error_msg}")
                     if "Access denied" in error_msg:
                         logger.error("  → Kiểm tra lại:")
                         logger.error(f"    1. Username/Password trong config.py")
                         logger.error(f"    2. IP của bạn có được phép truy cập database không?")
                         logger.error(f"    3. Database server có cho phép remote connection không?")
-                    return False
-        return False
+        return None
+
+    def acquire(self):
+        """Lấy một kết nối (None nếu không kết nối được hoặc chờ quá lâu)"""
+        with self._cond:
+            deadline = time.monotonic() + self.checkout_timeout
+            while not self._idle and self._created >= self.size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"⚠ Hết thời gian chờ kết nối database (pool {self.size} kết nối đều bận)")
+                    return None
+                self._cond.wait(remaining)
+            if self._closed:
+                return None
+            if self._idle:
+                connection, last_used, suspect = self._idle.pop()
+            else:
+                connection, last_used, suspect = None, 0, False
+                self._created += 1
+
+        if connection is not None:
+            if not suspect and time.monotonic() - last_used < self.idle_check_seconds:
+                return connection
+            try:
+                connection.ping()
+                return connection
+            except Error:
+                logger.warning("⚠ Mất kết nối database, đang thử kết nối lại...")
+                self._discard(connection)
+
+        connection = self._connect()
+        if connection is None:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+        return connection
+
+    def release(self, connection, suspect=False):
+        """Trả kết nối về pool; suspect=True thì lần lấy sau sẽ ping lại"""
+        try:
+            if connection.unread_result:
+                connection.consume_results()
+        except Error:
+            suspect = True
+        with self._cond:
+            if self._closed:
+                self._created -= 1
+                self._discard(connection)
+            else:
+                self._idle.append((connection, time.monotonic(), suspect))
+            self._cond.notify()
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def close(self):
+        """Đóng mọi kết nối đang rảnh; kết nối đang dùng sẽ đóng khi được trả về"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for connection, _, _ in idle:
+            self._discard(connection)
+        return len(idle)
+
+
+def pooled(method):
+    """Giữ một kết nối của pool cho thread hiện tại trong suốt lời gọi method"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._checkout():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class DatabaseHandler:
+    """
+    Xử lý tất cả các thao tác với database
+
+    Có thể dùng chung một handler giữa nhiều thread: mỗi lời gọi mượn một kết
+    nối riêng từ pool (lời gọi lồng nhau trong cùng thread dùng lại kết nối đó).
+    """
+    
+    def __init__(self, pool=None):
+        self.pool = pool or ConnectionPool(**DB_POOL)
+        self._local = threading.local()
+        # Cache tag_name → tag_id, dùng lại giữa các bài viết trong cùng lần chạy
+        self._tag_cache = LRUCache(TAG_CACHE_SIZE)
+        # Cache ('name'|'code', giá trị viết thường) → team_id
+        self._team_cache = LRUCache(TEAM_CACHE_SIZE)
+        if self.connect():
+            self.ensure_crawler_tables()
+    
+    @property
+    def connection(self):
+        """Kết nối mà thread hiện tại đang giữ (None nếu ngoài @pooled)"""
+        return getattr(self._local, 'connection', None)
+    
+    @contextmanager
+    def _checkout(self):
+        """Mượn kết nối cho thread hiện tại, lời gọi lồng nhau dùng lại kết nối cũ"""
+        if getattr(self._local, 'depth', 0):
+            self._local.depth += 1
+            try:
+                yield self._local.connection
+            finally:
+                self._local.depth -= 1
+            return
+        
+        connection = self.pool.acquire()
+        self._local.connection = connection
+        self._local.suspect = False
+        self._local.depth = 1
+        try:
+            yield connection
+        except Exception:
+            # Lỗi không phải mysql Error (vd. KeyError khi dựng dòng) không đi qua _rollback
+            # trong method: hủy transaction dở trước khi trả kết nối về pool
+            if connection is not None:
+                self._rollback()
+            raise
+        finally:
+            self._local.depth = 0
+            self._local.connection = None
+            if connection is not None:
+                self.pool.release(connection, suspect=self._local.suspect)
+    
+    def connect(self):
+        """Kiểm tra có lấy được kết nối từ pool không"""
+        with self._checkout() as connection:
+            return connection is not None
     
     def close(self):
-        """Đóng kết nối database"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("✓ Đã đóng kết nối database")
+        """Đóng các kết nối của pool"""
+        closed = self.pool.close()
+        logger.info(f"✓ Đã đóng kết nối database ({closed} kết nối)")
     
     def _check_connection(self):
-        """Kiểm tra kết nối database, tự động reconnect nếu cần"""
-        if not self.connection or not self.connection.is_connected():
-            logger.warning("⚠ Mất kết nối database, đang thử kết nối lại...")
-            if self.connect():
-                logger.info("✓ Đã kết nối lại database thành công")
-                return True
-            else:
-                logger.warning("⚠ Không thể kết nối database, bỏ qua thao tác")
-                return False
+        """Thread hiện tại đã mượn được kết nối chưa"""
+        if self.connection is None:
+            logger.warning("⚠ Không thể kết nối database, bỏ qua thao tác")
+            return False
         return True
     
+    def _rollback(self, error=None):
+        """Rollback sau lỗi; lỗi về kết nối thì đánh dấu để ping lại trước lần dùng sau"""
+        if isinstance(error, (errors.OperationalError, errors.InterfaceError)):
+            self._local.suspect = True
+        # Transaction bị hủy: id vừa cache (tag/team mới tạo) có thể không còn
+        self._tag_cache.clear()
+        self._team_cache.clear()
+        if self.connection is None:
+            return
+        try:
+            self.connection.rollback()
+        except Error:
+            self._local.suspect = True
+    
+    @pooled
+    def ensure_crawler_tables(self):
+        """Tạo các bảng riêng của crawler nếu chưa có"""
+        if not self._check_connection():
+            return False
+        try:
+            cursor = self.connection.cursor()
+            for table_sql in CRAWLER_TABLES.values():
+                cursor.execute(table_sql)
+            self.connection.commit()
+            cursor.close()
+            return True
+        except Error as e:
+            logger.error(f"✗ Lỗi tạo bảng crawler: {e}")
+            self._rollback(e)
+            return False
+    
+    @pooled
+    def filter_seen_urls(self, urls):
+        """
+        Trả về tập các URL (đã chuẩn hóa) đã được crawl trước đó
+        
+        Args:
+            urls: Danh sách URL nguồn đã chuẩn hóa
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls or not self._check_connection():
+            return set()
+        try:
+            hashes = {url_hash(url): url for url in urls}
+            cursor = self.connection.cursor()
+            placeholders = ', '.join(['%s'] * len(hashes))
+            query = f"SELECT url_hash FROM crawled_urls WHERE url_hash IN ({placeholders})"
+            cursor.execute(query, tuple(hashes))
+            seen = {hashes[row[0]] for row in cursor.fetchall()}
+            cursor.close()
+            return seen
+        except Error as e:
+            logger.error(f"✗ Lỗi kiểm tra URL đã crawl: {e}")
+            self._rollback(e)
+            return set()
+    
+    @pooled
     def article_exists(self, slug):
         """Kiểm tra bài viết đã tồn tại chưa (theo slug)"""
         if not self._check_connection():
@@ -77,8 +311,10 @@ class DatabaseHandler:
             return result is not None
         except Error as e:
             logger.error(f"✗ Lỗi kiểm tra bài viết: {e}")
+            self._rollback(e)
             return False
     
+    @pooled
     def get_or_create_category(self, category_name):
         """Lấy hoặc tạo category mới"""
         if not self._check_connection():
@@ -111,8 +347,10 @@ class DatabaseHandler:
             
         except Error as e:
             logger.error(f"✗ Lỗi xử lý category: {e}")
+            self._rollback(e)
             return None
     
+    @pooled
     def get_or_create_tag(self, tag_name):
         """Lấy hoặc tạo tag mới"""
         if not self._check_connection():
@@ -144,8 +382,10 @@ class DatabaseHandler:
             
         except Error as e:
             logger.error(f"✗ Lỗi xử lý tag: {e}")
+            self._rollback(e)
             return None
     
+    @pooled
     def insert_article(self, article_data):
         """Thêm bài viết mới vào database"""
         if not self._check_connection():
@@ -177,7 +417,7 @@ class DatabaseHandler:
                 article_data.get('is_featured', 0),
                 article_data.get('is_breaking_news', 0),
                 article_data.get('status', 'published'),
-                article_data.get('published_at', datetime.now())
+                article_data.get('published_at') or datetime.now()
             )
             
             cursor.execute(insert_query, values)
@@ -199,10 +439,205 @@ class DatabaseHandler:
             
         except Error as e:
             logger.error(f"✗ Lỗi thêm bài viết: {e}")
-            if self.connection and self.connection.is_connected():
-                self.connection.rollback()
+            self._rollback(e)
             return None
     
+    @pooled
+    def insert_articles_bulk(self, articles):
+        """
+        Thêm nhiều bài viết trong một transaction (kèm article_views, tags, images)
+        
+        Args:
+            articles: List article_data (cùng định dạng insert_article)
+            
+        Returns:
+            List article_id theo đúng thứ tự đầu vào (None nếu đã tồn tại hoặc lỗi)
+        """
+        if not articles:
+            return []
+        if not self._check_connection():
+            return [None] * len(articles)
+        try:
+            cursor = self.connection.cursor()
+            
+            # Kiểm tra trùng lặp cho cả batch bằng một query
+            slugs = list(dict.fromkeys(article['slug'] for article in articles))
+            placeholders = ', '.join(['%s'] * len(slugs))
+            cursor.execute(f"SELECT slug FROM articles WHERE slug IN ({placeholders})", tuple(slugs))
+            existing = {row[0] for row in cursor.fetchall()}
+            
+            new_articles = []
+            for article_data in articles:
+                if article_data['slug'] in existing:
+                    logger.warning(f"⚠ Bài viết đã tồn tại: {article_data['title']}")
+                    continue
+                existing.add(article_data['slug'])
+                new_articles.append(article_data)
+            
+            if not new_articles:
+                cursor.close()
+                return [None] * len(articles)
+            
+            insert_query = """
+                INSERT INTO articles 
+                (title, slug, summary, content, thumbnail_url, category_id, 
+                 author_id, is_featured, is_breaking_news, status, published_at, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+            """
+            cursor.executemany(insert_query, [
+                (
+                    article_data['title'],
+                    article_data['slug'],
+                    article_data.get('summary', ''),
+                    article_data['content'],
+                    article_data.get('thumbnail_url', ''),
+                    article_data['category_id'],
+                    article_data['author_id'],
+                    article_data.get('is_featured', 0),
+                    article_data.get('is_breaking_news', 0),
+                    article_data.get('status', 'published'),
+                    article_data.get('published_at') or datetime.now()
+                )
+                for article_data in new_articles
+            ])
+            
+            # Lấy article_id theo slug (slug là UNIQUE, không phụ thuộc auto_increment liên tiếp)
+            new_slugs = [article_data['slug'] for article_data in new_articles]
+            placeholders = ', '.join(['%s'] * len(new_slugs))
+            cursor.execute(f"SELECT slug, article_id FROM articles WHERE slug IN ({placeholders})", tuple(new_slugs))
+            id_by_slug = dict(cursor.fetchall())
+            
+            # Khởi tạo article_views cho các bài viết mới (phù hợp với API)
+            cursor.executemany("""
+                INSERT INTO article_views (article_id, view_count, like_count, comment_count, liked_user_ids)
+                VALUES (%s, 0, 0, 0, '')
+                ON DUPLICATE KEY UPDATE article_id = article_id
+            """, [(id_by_slug[slug],) for slug in new_slugs])
+            
+            # Tags
+            tag_names = list(dict.fromkeys(
+                tag_name for article_data in new_articles for tag_name in article_data.get('tags') or []
+            ))
+            tag_ids = self._resolve_tag_ids(cursor, tag_names)
+            tag_rows = list(dict.fromkeys(
+                (id_by_slug[article_data['slug']], tag_ids[tag_name])
+                for article_data in new_articles
+                for tag_name in article_data.get('tags') or []
+                if tag_ids.get(tag_name)
+            ))
+            if tag_rows:
+                cursor.executemany(
+                    "INSERT IGNORE INTO article_tags (article_id, tag_id) VALUES (%s, %s)",
+                    tag_rows
+                )
+            
+            # Images
+            image_rows = [
+                (id_by_slug[article_data['slug']], image_data.get('url', ''), image_data.get('caption', ''), idx)
+                for article_data in new_articles
+                for idx, image_data in enumerate(article_data.get('images') or [])
+            ]
+            if image_rows:
+                cursor.executemany("""
+                    INSERT INTO article_images 
+                    (article_id, image_url, caption, display_order)
+                    VALUES (%s, %s, %s, %s)
+                """, image_rows)
+            
+            # Ghi nhận URL nguồn cùng transaction
+            url_rows = [
+                (url_hash(article_data['source_url']), article_data['source_url'][:1000], id_by_slug[article_data['slug']])
+                for article_data in new_articles
+                if article_data.get('source_url')
+            ]
+            if url_rows:
+                cursor.executemany("""
+                    INSERT INTO crawled_urls (url_hash, source_url, article_id)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE article_id = VALUES(article_id), last_seen_at = NOW()
+                """, url_rows)
+            
+            self.connection.commit()
+            cursor.close()
+            self._cache_tag_ids(tag_ids)
+            
+            logger.info(f"✓ Đã thêm {len(new_articles)}/{len(articles)} bài viết "
+                        f"({len(tag_rows)} tags, {len(image_rows)} hình ảnh)")
+            
+            inserted = {id(article_data) for article_data in new_articles}
+            return [
+                id_by_slug[article_data['slug']] if id(article_data) in inserted else None
+                for article_data in articles
+            ]
+            
+        except Error as e:
+            logger.error(f"✗ Lỗi thêm batch bài viết: {e}")
+            self._rollback(e)
+            return [None] * len(articles)
+    
+    def _resolve_tag_ids(self, cursor, tag_names):
+        """
+        Lấy hoặc tạo tag_id cho cả danh sách tên tag (không commit, dùng trong transaction;
+        người gọi đưa kết quả vào cache bằng _cache_tag_ids sau khi commit)
+        
+        - Tag đã có trong cache: không query
+        - Còn lại: một SELECT ... IN, tag chưa có thì tạo bằng một INSERT nhiều dòng
+        
+        Returns:
+            Dict {tag_name: tag_id}
+        """
+        tag_ids = {}
+        missing = []
+        for tag_name in dict.fromkeys(tag_names):
+            tag_id = self._tag_cache.get(tag_name)
+            if tag_id:
+                tag_ids[tag_name] = tag_id
+            else:
+                missing.append(tag_name)
+        
+        if not missing:
+            return tag_ids
+        
+        placeholders = ', '.join(['%s'] * len(missing))
+        cursor.execute(f"SELECT tag_name, tag_id FROM tags WHERE tag_name IN ({placeholders})", tuple(missing))
+        for tag_name, tag_id in cursor.fetchall():
+            tag_ids[tag_name] = tag_id
+        
+        # So sánh theo collation của MySQL (không phân biệt hoa thường)
+        found = {tag_name.lower() for tag_name in tag_ids}
+        to_create = [tag_name for tag_name in missing if tag_name.lower() not in found]
+        if to_create:
+            # tag_slug là UNIQUE: tag trùng slug (do worker khác vừa tạo) thì giữ nguyên
+            slugs = {tag_name: slugify(tag_name, separator='-') for tag_name in to_create}
+            cursor.executemany("""
+                INSERT INTO tags (tag_name, tag_slug)
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE tag_id = tag_id
+            """, [(tag_name, slugs[tag_name]) for tag_name in to_create])
+            
+            placeholders = ', '.join(['%s'] * len(slugs))
+            cursor.execute(f"SELECT tag_slug, tag_id FROM tags WHERE tag_slug IN ({placeholders})",
+                           tuple(set(slugs.values())))
+            id_by_slug = dict(cursor.fetchall())
+            for tag_name, slug in slugs.items():
+                if slug in id_by_slug:
+                    tag_ids[tag_name] = id_by_slug[slug]
+        
+        # Khớp lại tên theo đúng chuỗi đầu vào (kết quả SELECT có thể khác hoa thường)
+        by_lower = {tag_name.lower(): tag_id for tag_name, tag_id in tag_ids.items()}
+        resolved = {}
+        for tag_name in dict.fromkeys(tag_names):
+            tag_id = tag_ids.get(tag_name) or by_lower.get(tag_name.lower())
+            if tag_id:
+                resolved[tag_name] = tag_id
+        return resolved
+    
+    def _cache_tag_ids(self, tag_ids):
+        """Đưa tag_id vào cache, chỉ gọi sau khi transaction đã commit (tag mới tạo mới thật sự tồn tại)"""
+        for tag_name, tag_id in tag_ids.items():
+            self._tag_cache.put(tag_name, tag_id)
+    
+    @pooled
     def insert_article_tags(self, article_id, tags):
         """Thêm tags cho bài viết"""
         if not self._check_connection():
@@ -210,31 +645,23 @@ class DatabaseHandler:
         try:
             cursor = self.connection.cursor()
             
-            for tag_name in tags:
-                tag_id = self.get_or_create_tag(tag_name)
-                if tag_id:
-                    # Kiểm tra đã có chưa
-                    check_query = """
-                        SELECT 1 FROM article_tags 
-                        WHERE article_id = %s AND tag_id = %s
-                    """
-                    cursor.execute(check_query, (article_id, tag_id))
-                    if not cursor.fetchone():
-                        insert_query = """
-                            INSERT INTO article_tags (article_id, tag_id)
-                            VALUES (%s, %s)
-                        """
-                        cursor.execute(insert_query, (article_id, tag_id))
+            tag_ids = self._resolve_tag_ids(cursor, tags)
+            if tag_ids:
+                cursor.executemany(
+                    "INSERT IGNORE INTO article_tags (article_id, tag_id) VALUES (%s, %s)",
+                    [(article_id, tag_id) for tag_id in dict.fromkeys(tag_ids.values())]
+                )
             
             self.connection.commit()
             cursor.close()
+            self._cache_tag_ids(tag_ids)
             logger.info(f"✓ Đã thêm {len(tags)} tags cho bài viết ID: {article_id}")
             
         except Error as e:
             logger.error(f"✗ Lỗi thêm tags: {e}")
-            if self.connection and self.connection.is_connected():
-                self.connection.rollback()
+            self._rollback(e)
     
+    @pooled
     def insert_article_images(self, article_id, images):
         """Thêm hình ảnh cho bài viết"""
         if not self._check_connection():
@@ -262,9 +689,9 @@ class DatabaseHandler:
             
         except Error as e:
             logger.error(f"✗ Lỗi thêm hình ảnh: {e}")
-            if self.connection and self.connection.is_connected():
-                self.connection.rollback()
+            self._rollback(e)
     
+    @pooled
     def get_or_create_team(self, team_name, team_code=None, logo_url=None):
         """Lấy hoặc tạo team mới"""
         if not self._check_connection():
@@ -299,8 +726,147 @@ class DatabaseHandler:
             
         except Error as e:
             logger.error(f"✗ Lỗi xử lý team: {e}")
+            self._rollback(e)
             return None
     
+    @pooled
+    def preload_teams(self):
+        """Nạp toàn bộ teams vào cache (bảng teams nhỏ, một query)"""
+        if not self._check_connection():
+            return 0
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT team_id, team_name, team_code FROM teams")
+            rows = cursor.fetchall()
+            cursor.close()
+            for team_id, team_name, team_code in rows:
+                self._cache_team(team_id, team_name, team_code)
+            logger.info(f"✓ Đã nạp {len(rows)} teams vào cache")
+            return len(rows)
+        except Error as e:
+            logger.error(f"✗ Lỗi nạp teams: {e}")
+            self._rollback(e)
+            return 0
+    
+    def _cache_team(self, team_id, team_name, team_code=None):
+        self._team_cache.put(('name', team_name.lower()), team_id)
+        if team_code:
+            self._team_cache.put(('code', team_code.lower()), team_id)
+    
+    def _cached_team_id(self, team_name, team_code=None):
+        # Giống get_or_create_team: khớp theo tên hoặc code (không có code thì so với tên)
+        return (self._team_cache.get(('name', team_name.lower())) or
+                self._team_cache.get(('code', (team_code or team_name).lower())))
+    
+    @pooled
+    def resolve_teams(self, teams):
+        """
+        Lấy hoặc tạo team_id cho nhiều đội cùng lúc
+        
+        - Đội đã có trong cache: không query
+        - Còn lại: một SELECT cho cả batch, đội mới được tạo bằng một INSERT nhiều dòng
+        
+        Args:
+            teams: List dict {'name', 'code' (tùy chọn), 'logo' (tùy chọn)}
+            
+        Returns:
+            Dict {team_name: team_id} (thiếu các đội không tạo được)
+        """
+        if not teams:
+            return {}
+        
+        by_name = {}
+        for team in teams:
+            if team.get('name') and team['name'] not in by_name:
+                by_name[team['name']] = team
+        
+        resolved = {}
+        missing = []
+        for team_name, team in by_name.items():
+            team_id = self._cached_team_id(team_name, team.get('code'))
+            if team_id:
+                resolved[team_name] = team_id
+            else:
+                missing.append(team)
+        
+        if not missing or not self._check_connection():
+            return resolved
+        
+        try:
+            cursor = self.connection.cursor()
+            # Đội tìm thấy/vừa tạo trong transaction này: chỉ đưa vào cache sau khi commit
+            found_rows = []
+            found = {}
+            
+            def lookup(pending):
+                """Một SELECT theo tên hoặc code cho tất cả đội còn thiếu"""
+                names = [team['name'] for team in pending]
+                codes = [team.get('code') or team['name'] for team in pending]
+                name_ph = ', '.join(['%s'] * len(names))
+                code_ph = ', '.join(['%s'] * len(codes))
+                cursor.execute(
+                    f"SELECT team_id, team_name, team_code FROM teams "
+                    f"WHERE team_name IN ({name_ph}) OR team_code IN ({code_ph})",
+                    tuple(names) + tuple(codes)
+                )
+                for team_id, team_name, team_code in cursor.fetchall():
+                    found_rows.append((team_id, team_name, team_code))
+                    found[('name', team_name.lower())] = team_id
+                    if team_code:
+                        found[('code', team_code.lower())] = team_id
+                
+                still_missing = []
+                for team in pending:
+                    # Giống _cached_team_id
+                    team_id = (found.get(('name', team['name'].lower())) or
+                               found.get(('code', (team.get('code') or team['name']).lower())))
+                    if team_id:
+                        new_ids[team['name']] = team_id
+                    else:
+                        still_missing.append(team)
+                return still_missing
+            
+            new_ids = {}
+            
+            missing = lookup(missing)
+            
+            if missing:
+                # Tạo các đội mới bằng một INSERT (team_code UNIQUE: trùng thì bỏ qua)
+                rows = [
+                    (team['name'], team.get('code') or slugify(team['name'], separator='').upper()[:10], team.get('logo'))
+                    for team in missing
+                ]
+                cursor.executemany(
+                    "INSERT IGNORE INTO teams (team_name, team_code, logo_url) VALUES (%s, %s, %s)",
+                    rows
+                )
+                missing = lookup(missing)
+            
+            if missing:
+                # Code tự sinh trùng với đội khác (vd. 10 ký tự đầu giống nhau): tạo không có code
+                cursor.executemany(
+                    "INSERT INTO teams (team_name, team_code, logo_url) VALUES (%s, NULL, %s)",
+                    [(team['name'], team.get('logo')) for team in missing]
+                )
+                missing = lookup(missing)
+            
+            self.connection.commit()
+            cursor.close()
+            
+            for team_id, team_name, team_code in found_rows:
+                self._cache_team(team_id, team_name, team_code)
+            resolved.update(new_ids)
+            
+            for team in missing:
+                logger.error(f"✗ Không thể tạo team: {team['name']}")
+            return resolved
+            
+        except Error as e:
+            logger.error(f"✗ Lỗi xử lý teams: {e}")
+            self._rollback(e)
+            return resolved
+    
+    @pooled
     def match_exists(self, home_team_id, away_team_id, match_date):
         """Kiểm tra trận đấu đã tồn tại chưa"""
         if not self._check_connection():
@@ -320,8 +886,10 @@ class DatabaseHandler:
             return result is not None
         except Error as e:
             logger.error(f"✗ Lỗi kiểm tra trận đấu: {e}")
+            self._rollback(e)
             return False
     
+    @pooled
     def insert_match(self, match_data):
         """Thêm trận đấu mới vào database"""
         if not self._check_connection():
@@ -366,10 +934,305 @@ class DatabaseHandler:
             
         except Error as e:
             logger.error(f"✗ Lỗi thêm trận đấu: {e}")
-            if self.connection and self.connection.is_connected():
-                self.connection.rollback()
+            self._rollback(e)
+            return None
+    
+    @pooled
+    def upsert_matches(self, batch):
+        """
+        Thêm mới hoặc cập nhật tỉ số/trạng thái cho nhiều trận đấu trong một transaction
+        
+        Trận đấu được coi là trùng khi cùng đội nhà, đội khách và lệch nhau dưới 12 giờ
+        (giống match_exists). Các trận ứng viên được lấy bằng một query theo khoảng
+        match_date (dùng được idx_date), việc so khớp làm trong Python. Query này khóa
+        các dòng (FOR UPDATE) tới khi commit, nên LiveScoreTracker không thể ghi tỉ số
+        mới hơn xen vào giữa: 'old' trong 'changes' luôn là giá trị vừa bị thay thế.
+        
+        Args:
+            batch: List match_data (cùng định dạng insert_match)
+            
+        Returns:
+            Dict:
+            - 'results': trạng thái từng trận theo thứ tự đầu vào
+                         ('inserted', 'updated', 'unchanged', 'duplicate' hoặc None nếu lỗi)
+            - 'changes': List thay đổi của các trận đã cập nhật
+                         {'match_id', 'home_team_id', 'away_team_id', 'old', 'new'}
+            - 'inserted', 'updated', 'unchanged': số lượng
+        """
+        summary = {'results': [None] * len(batch), 'changes': [], 'inserted': 0, 'updated': 0, 'unchanged': 0}
+        if not batch or not self._check_connection():
+            return summary
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+            window = timedelta(hours=12)
+            
+            # Một query lấy tất cả trận ứng viên trong khoảng thời gian của batch
+            dates = [match_data['match_date'] for match_data in batch]
+            home_ids = list({match_data['home_team_id'] for match_data in batch})
+            placeholders = ', '.join(['%s'] * len(home_ids))
+            cursor.execute(f"""
+                SELECT match_id, home_team_id, away_team_id, match_date, home_score, away_score, status
+                FROM matches
+                WHERE match_date > %s AND match_date < %s
+                AND home_team_id IN ({placeholders})
+                FOR UPDATE
+            """, (min(dates) - window, max(dates) + window, *home_ids))
+            
+            candidates = {}
+            for row in cursor.fetchall():
+                candidates.setdefault((row['home_team_id'], row['away_team_id']), []).append(row)
+            
+            to_insert = []
+            to_update = []
+            claimed = set()
+            for idx, match_data in enumerate(batch):
+                key = (match_data['home_team_id'], match_data['away_team_id'])
+                same_teams = [
+                    row for row in candidates.get(key, [])
+                    if abs(row['match_date'] - match_data['match_date']) < window
+                ]
+                
+                if not same_teams:
+                    # Trùng với một trận mới khác trong chính batch này
+                    if any(key == (other['home_team_id'], other['away_team_id']) and
+                           abs(other['match_date'] - match_data['match_date']) < window
+                           for _, other in to_insert):
+                        summary['results'][idx] = 'duplicate'
+                        continue
+                    to_insert.append((idx, match_data))
+                    continue
+                
+                existing = min(same_teams, key=lambda row: abs(row['match_date'] - match_data['match_date']))
+                if existing['match_id'] in claimed:
+                    summary['results'][idx] = 'duplicate'
+                    continue
+                claimed.add(existing['match_id'])
+                
+                new_values = {
+                    'home_score': match_data.get('home_score'),
+                    'away_score': match_data.get('away_score'),
+                    'status': match_data.get('status', 'scheduled'),
+                }
+                # Nguồn không có tỉ số thì giữ tỉ số cũ
+                for field in ('home_score', 'away_score'):
+                    if new_values[field] is None:
+                        new_values[field] = existing[field]
+                old_values = {field: existing[field] for field in new_values}
+                
+                # Payload cũ hơn dữ liệu trong DB (vd. 'live' đến sau 'finished'): không lùi trạng thái
+                # (giống LiveScoreTracker._diff)
+                if new_values == old_values or is_status_regression(old_values['status'], new_values['status']):
+                    summary['results'][idx] = 'unchanged'
+                    continue
+                
+                to_update.append((idx, existing, old_values, new_values))
+            
+            if to_insert:
+                cursor.executemany("""
+                    INSERT INTO matches 
+                    (home_team_id, away_team_id, category_id, tournament_name, 
+                     match_date, venue, home_score, away_score, status, highlight_url, 
+                     created_at, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+                """, [
+                    (
+                        match_data['home_team_id'],
+                        match_data['away_team_id'],
+                        match_data.get('category_id', 1),  # Default: Bóng đá
+                        match_data.get('tournament_name', ''),
+                        match_data['match_date'],
+                        match_data.get('venue', ''),
+                        match_data.get('home_score'),
+                        match_data.get('away_score'),
+                        match_data.get('status', 'scheduled'),  # Default: scheduled
+                        match_data.get('highlight_url')
+                    )
+                    for _, match_data in to_insert
+                ])
+            
+            if to_update:
+                cursor.executemany("""
+                    UPDATE matches
+                    SET home_score = %s, away_score = %s, status = %s, updated_at = NOW()
+                    WHERE match_id = %s
+                """, [
+                    (new_values['home_score'], new_values['away_score'], new_values['status'], existing['match_id'])
+                    for _, existing, _, new_values in to_update
+                ])
+            
+            self.connection.commit()
+            cursor.close()
+            
+            for idx, _ in to_insert:
+                summary['results'][idx] = 'inserted'
+            for idx, existing, old_values, new_values in to_update:
+                summary['results'][idx] = 'updated'
+                summary['changes'].append({
+                    'match_id': existing['match_id'],
+                    'home_team_id': existing['home_team_id'],
+                    'away_team_id': existing['away_team_id'],
+                    'home_team_name': batch[idx].get('home_team_name', ''),
+                    'away_team_name': batch[idx].get('away_team_name', ''),
+                    'old': old_values,
+                    'new': new_values
+                })
+            summary['inserted'] = len(to_insert)
+            summary['updated'] = len(to_update)
+            summary['unchanged'] = summary['results'].count('unchanged')
+            
+            logger.info(f"✓ Upsert trận đấu: {summary['inserted']} mới, {summary['updated']} cập nhật, "
+                        f"{summary['unchanged']} không đổi")
+            return summary
+            
+        except Error as e:
+            logger.error(f"✗ Lỗi upsert trận đấu: {e}")
+            self._rollback(e)
+            return {'results': [None] * len(batch), 'changes': [], 'inserted': 0, 'updated': 0, 'unchanged': 0}
+    
+    @pooled
+    def get_live_candidates(self, started_after, starts_before):
+        """
+        Các trận cần theo dõi tỉ số trực tiếp: đang live, hoặc còn scheduled và
+        bắt đầu trong khoảng [started_after, starts_before] (sắp đá / đã tới giờ
+        nhưng chưa được cập nhật trạng thái)
+        
+        Returns:
+            List dict (match_id, home/away_team_id, home/away_team_name, match_date,
+            home_score, away_score, status)
+        """
+        if not self._check_connection():
+            return []
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+            # Hai nhánh đều dùng được idx_status_date
+            cursor.execute("""
+                SELECT m.match_id, m.home_team_id, m.away_team_id, m.match_date,
+                       m.home_score, m.away_score, m.status,
+                       ht.team_name AS home_team_name, awt.team_name AS away_team_name
+                FROM matches m
+                JOIN teams ht ON ht.team_id = m.home_team_id
+                JOIN teams awt ON awt.team_id = m.away_team_id
+                WHERE (m.status = 'live' AND m.match_date >= %s)
+                   OR (m.status = 'scheduled' AND m.match_date BETWEEN %s AND %s)
+            """, (started_after - timedelta(days=1), started_after, starts_before))
+            rows = cursor.fetchall()
+            cursor.close()
+            return rows
+        except Error as e:
+            logger.error(f"✗ Lỗi lấy trận đang diễn ra: {e}")
+            self._rollback(e)
+            return []
+    
+    @pooled
+    def update_match_scores(self, changes):
+        """
+        Cập nhật tỉ số/trạng thái của nhiều trận (compare-and-set) bằng một câu UPDATE
+        
+        Chỉ trận trong DB còn đúng giá trị 'old' mới được ghi: trận đã được nơi khác
+        (vd. MatchCrawler) cập nhật trước thì bỏ qua, để sự kiện không bị thông báo
+        hai lần. Các dòng được khóa bằng SELECT ... FOR UPDATE trước khi so sánh.
+        
+        Args:
+            changes: List {'match_id', 'old', 'new'}, old/new: {'home_score', 'away_score', 'status'}
+            
+        Returns:
+            Set match_id đã cập nhật (None nếu lỗi)
+        """
+        if not changes:
+            return set()
+        if not self._check_connection():
+            return None
+        columns = ('home_score', 'away_score', 'status')
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+            ids = [change['match_id'] for change in changes]
+            cursor.execute(
+                f"SELECT match_id, home_score, away_score, status FROM matches "
+                f"WHERE match_id IN ({', '.join(['%s'] * len(ids))}) FOR UPDATE",
+                tuple(ids)
+            )
+            current = {row['match_id']: row for row in cursor.fetchall()}
+            applied = [
+                change for change in changes
+                if change['match_id'] in current and
+                all(current[change['match_id']][column] == change['old'][column] for column in columns)
+            ]
+            
+            if applied:
+                cases = {column: [] for column in columns}
+                params = {column: [] for column in columns}
+                for change in applied:
+                    for column in columns:
+                        cases[column].append("WHEN %s THEN %s")
+                        params[column].extend((change['match_id'], change['new'][column]))
+                applied_ids = [change['match_id'] for change in applied]
+                cursor.execute(f"""
+                    UPDATE matches
+                    SET home_score = CASE match_id {' '.join(cases['home_score'])} END,
+                        away_score = CASE match_id {' '.join(cases['away_score'])} END,
+                        status = CASE match_id {' '.join(cases['status'])} END,
+                        updated_at = NOW()
+                    WHERE match_id IN ({', '.join(['%s'] * len(applied_ids))})
+                """, (*params['home_score'], *params['away_score'], *params['status'], *applied_ids))
+            self.connection.commit()
+            cursor.close()
+            
+            skipped = len(changes) - len(applied)
+            if skipped:
+                logger.info(f"⏭ {skipped} trận đã được cập nhật ở nơi khác, bỏ qua")
+            return {change['match_id'] for change in applied}
+        except Error as e:
+            logger.error(f"✗ Lỗi cập nhật tỉ số trực tiếp: {e}")
+            self._rollback(e)
+            return None
+    
+    @pooled
+    def notify_team_followers(self, events):
+        """
+        Gửi thông báo sự kiện trận đấu tới mọi người theo dõi đội nhà hoặc đội khách
+        
+        Một câu INSERT ... SELECT cho cả batch sự kiện: người dùng được lấy thẳng
+        từ favorites (type = 'team', dùng idx_team) trong DB, không lặp từng người
+        trong Python. Người theo dõi cả hai đội chỉ nhận một thông báo mỗi sự kiện.
+        
+        Args:
+            events: List {'match_id', 'home_team_id', 'away_team_id', 'title', 'message'}
+            
+        Returns:
+            Số thông báo đã tạo (None nếu lỗi)
+        """
+        if not events:
+            return 0
+        if not self._check_connection():
+            return None
+        try:
+            cursor = self.connection.cursor()
+            event_rows = ' UNION ALL '.join(
+                ["SELECT %s AS match_id, %s AS home_team_id, %s AS away_team_id, "
+                 "%s AS title, %s AS message"] * len(events)
+            )
+            params = []
+            for event in events:
+                params.extend((event['match_id'], event['home_team_id'], event['away_team_id'],
+                               event['title'], event['message']))
+            cursor.execute(f"""
+                INSERT INTO notifications (user_id, title, message, type, reference_id, is_read, created_at)
+                SELECT DISTINCT f.user_id, e.title, e.message, 'match', e.match_id, 0, NOW()
+                FROM ({event_rows}) e
+                JOIN favorites f
+                  ON f.type = 'team' AND f.team_id IN (e.home_team_id, e.away_team_id)
+            """, tuple(params))
+            self.connection.commit()
+            created = cursor.rowcount
+            cursor.close()
+            logger.info(f"✓ Đã tạo {created} thông báo cho {len(events)} sự kiện trận đấu")
+            return created
+        except Error as e:
+            logger.error(f"✗ Lỗi tạo thông báo trận đấu: {e}")
+            self._rollback(e)
             return None
     
+    @pooled
     def get_statistics(self):
         """Lấy thống kê database"""
         if not self._check_connection():
@@ -416,5 +1279,6 @@ class DatabaseHandler:
             
         except Error as e:
             logger.error(f"✗ Lỗi lấy thống kê: {e}")
+            self._rollback(e)
             return None
 
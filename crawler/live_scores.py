@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Live Scores - Cập nhật tỉ số/trạng thái trận đang diễn ra theo chu kỳ ngắn
+
+Chỉ theo dõi các trận đang live hoặc sắp đá (lấy từ DB, nạp lại mỗi
+refresh_interval giây). Mỗi lượt poll chỉ tải các ngày có trận đang theo
+dõi, bỏ qua ngày có payload không đổi, và ghi mọi thay đổi bằng một câu
+UPDATE duy nhất.
+
+Ví dụ:
+    python live_scores.py
+    python live_scores.py --interval 10
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from colorama import Fore, Style
+from database import DatabaseHandler
+from parsers import RobongMatchParser
+from match_crawler import logger
+from match_events import collect_events, is_status_regression
+from config import MATCH_SOURCES, LIVE_SCORES
+
+# Trận ở các trạng thái này thì thôi theo dõi
+DONE_STATUSES = ('finished', 'cancelled', 'postponed')
+
+
+class LiveScoreTracker:
+    """
+    Theo dõi tỉ số trực tiếp của một nguồn lịch thi đấu (Robong API)
+
+    Args:
+        db: DatabaseHandler (có thể dùng chung với các crawler khác)
+        source_name: Key trong MATCH_SOURCES
+        parser: RobongMatchParser (mặc định tạo mới)
+    """
+
+    def __init__(self, db, source_name=None, parser=None):
+        self.db = db
+        self.source_name = source_name or LIVE_SCORES['source']
+        self.parser = parser or RobongMatchParser()
+        self.parser.configure(MATCH_SOURCES[self.source_name])
+        self.tracked = {}           # match_id → dòng trong DB (get_live_candidates)
+        self._refreshed_at = None
+        self._digests = {}          # date_str → digest payload lần poll trước
+        self.stats = {'ticks': 0, 'polls': 0, 'updated': 0, 'notifications_sent': 0, 'errors': 0}
+
+    def refresh(self):
+        """Nạp lại danh sách trận cần theo dõi từ DB"""
+        now = datetime.now()
+        rows = self.db.get_live_candidates(
+            now - timedelta(hours=LIVE_SCORES['started_window_hours']),
+            now + timedelta(minutes=LIVE_SCORES['soon_minutes'])
+        )
+        # Ngày có trận mới vào danh sách thì parse lại dù payload không đổi;
+        # ngày không còn trận theo dõi thì không cần nhớ digest
+        new_days = {row['match_date'].strftime('%d-%m-%Y') for row in rows if row['match_id'] not in self.tracked}
+        days = {row['match_date'].strftime('%d-%m-%Y') for row in rows}
+        self._digests = {
+            day: digest for day, digest in self._digests.items() if day in days and day not in new_days
+        }
+        self.tracked = {row['match_id']: row for row in rows}
+        self._refreshed_at = time.monotonic()
+        logger.debug(f"Live: theo dõi {len(self.tracked)} trận")
+
+    def tick(self):
+        """
+        Một lượt poll
+
+        Returns:
+            List thay đổi {'match_id', 'home_team_id', 'away_team_id', 'home_team_name',
+            'away_team_name', 'old', 'new'} đã ghi vào DB
+        """
+        self.stats['ticks'] += 1
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= LIVE_SCORES['refresh_interval']:
+            self.refresh()
+        if not self.tracked:
+            return []
+
+        self.stats['polls'] += 1
+        days = sorted({row['match_date'].strftime('%d-%m-%Y') for row in self.tracked.values()})
+        changed_days = self.parser.poll_days(days, self._digests, LIVE_SCORES['max_matches_per_day'])
+        if not changed_days:
+            return []
+
+        changes = self._diff(match_info for matches in changed_days.values() for match_info in matches)
+        if not changes:
+            return []
+
+        updated = self.db.update_match_scores(changes)
+        if updated is None:
+            # Ghi lỗi: quên digest để lượt sau parse và ghi lại
+            self.stats['errors'] += 1
+            for day in changed_days:
+                self._digests.pop(day, None)
+            return []
+
+        stale = [change for change in changes if change['match_id'] not in updated]
+        if stale:
+            # DB đã khác snapshot (vd. MatchCrawler ghi trước): nạp lại danh sách trận
+            # và parse lại các ngày đó ở lượt sau, không thông báo lại sự kiện
+            self._refreshed_at = None
+            for change in stale:
+                self._digests.pop(self.tracked[change['match_id']]['match_date'].strftime('%d-%m-%Y'), None)
+            changes = [change for change in changes if change['match_id'] in updated]
+
+        self.stats['updated'] += len(changes)
+        for change in changes:
+            row = self.tracked[change['match_id']]
+            row.update(change['new'])
+            if row['status'] in DONE_STATUSES:
+                del self.tracked[change['match_id']]
+            old, new = change['old'], change['new']
+            print(f"  {Fore.GREEN}[LIVE] {change['home_team_name']} vs {change['away_team_name']}: "
+                  f"{old['status']} {old['home_score']}-{old['away_score']} → "
+                  f"{new['status']} {new['home_score']}-{new['away_score']}{Style.RESET_ALL}")
+
+        events = collect_events(changes)
+        if events:
+            self.stats['notifications_sent'] += self.db.notify_team_followers(events) or 0
+        return changes
+
+    def _diff(self, parsed_matches):
+        """So trận vừa parse với trận đang theo dõi, trả về các thay đổi tỉ số/trạng thái"""
+        # Khớp theo tên hai đội (tên trong bảng teams lấy từ chính API này) và lệch giờ dưới 12 tiếng
+        by_teams = {}
+        for row in self.tracked.values():
+            key = (row['home_team_name'].lower(), row['away_team_name'].lower())
+            by_teams.setdefault(key, []).append(row)
+
+        changes = []
+        window = timedelta(hours=12)
+        for match_info in parsed_matches:
+            key = (match_info['home_team_name'].lower(), match_info['away_team_name'].lower())
+            for row in by_teams.get(key, ()):
+                if abs(row['match_date'] - match_info['match_date']) >= window:
+                    continue
+                new = {
+                    'home_score': match_info['home_score'],
+                    'away_score': match_info['away_score'],
+                    'status': match_info['status'],
+                }
+                # API đôi khi trả tỉ số rỗng cho trận đang đá: giữ tỉ số cũ (giống upsert_matches)
+                for column in ('home_score', 'away_score'):
+                    if new[column] is None:
+                        new[column] = row[column]
+                # Payload cũ hơn trạng thái đang theo dõi (vd. 'pending' cho trận đã live): bỏ qua
+                if is_status_regression(row['status'], new['status']):
+                    continue
+                old = {column: row[column] for column in new}
+                if new != old:
+                    changes.append({
+                        'match_id': row['match_id'],
+                        'home_team_id': row['home_team_id'],
+                        'away_team_id': row['away_team_id'],
+                        'home_team_name': row['home_team_name'],
+                        'away_team_name': row['away_team_name'],
+                        'old': old,
+                        'new': new
+                    })
+                break
+        return changes
+
+    def close(self):
+        self.parser.close()
+
+
+def main():
+    """Hàm main"""
+    arg_parser = argparse.ArgumentParser(description='Cập nhật tỉ số trực tiếp theo chu kỳ ngắn')
+    arg_parser.add_argument('--interval', type=float, default=LIVE_SCORES['interval'],
+                            help='Số giây giữa hai lượt poll')
+    args = arg_parser.parse_args()
+
+    db = None
+    tracker = None
+    try:
+        db = DatabaseHandler()
+        tracker = LiveScoreTracker(db)
+        logger.info(f"🚀 Bắt đầu theo dõi tỉ số trực tiếp (mỗi {args.interval:.0f}s)")
+        while True:
+            started = time.monotonic()
+            try:
+                tracker.tick()
+            except Exception as e:
+                tracker.stats['errors'] += 1
+                logger.error(f"[ERROR] Lỗi cập nhật tỉ số trực tiếp: {e}", exc_info=True)
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}[WARN] Đã dừng theo dõi tỉ số{Style.RESET_ALL}")
+    finally:
+        if tracker:
+            tracker.close()
+            logger.info(f"[OK] {tracker.stats['polls']} lượt poll, {tracker.stats['updated']} cập nhật, "
+                        f"{tracker.stats['errors']} lỗi")
+        if db:
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
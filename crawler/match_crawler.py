@@ -8,7 +8,10 @@ from logging.handlers import RotatingFileHandler
 from colorama import init, Fore, Style
 from database import DatabaseHandler
 from parsers import VnExpressMatchParser, RobongMatchParser
+from parsers.robong_match_parser import UNCHANGED_DAY
 from config import MATCH_SOURCES, LOG_FILE
+from work_queue import get_work_queue, PARSED, STORED, FINAL_STATES
+from match_events import collect_events
 import time
 import sys
 from datetime import datetime, timedelta
@@ -59,8 +62,9 @@ logger = setup_logging()
 class MatchCrawler:
     """Crawler chuyên dụng cho lịch thi đấu"""
     
-    def __init__(self):
-        self.db = DatabaseHandler()
+    def __init__(self, db=None):
+        # db: DatabaseHandler dùng chung (vd. với NewsCrawler), mặc định tạo mới
+        self.db = db or DatabaseHandler()
         self.match_parsers = {
             'VnExpressMatchParser': VnExpressMatchParser(),
             'RobongMatchParser': RobongMatchParser(),
@@ -68,9 +72,13 @@ class MatchCrawler:
         self.stats = {
             'matches_crawled': 0,
             'matches_saved': 0,
+            'matches_updated': 0,
             'matches_skipped': 0,
-            'matches_errors': 0
+            'matches_errors': 0,
+            'notifications_sent': 0
         }
+        # Hàng đợi bền vững: ngày chưa lưu xong của lần chạy trước được xử lý tiếp
+        self.work_queue = get_work_queue()
     
     def print_header(self):
         """In header đẹp"""
@@ -97,6 +105,8 @@ class MatchCrawler:
             print(f"{Fore.YELLOW}THỐNG KÊ CRAWLER LỊCH THI ĐẤU:")
             print(f"{Fore.GREEN}  [OK] Tổng số trận đấu crawl: {self.stats['matches_crawled']}")
             print(f"{Fore.GREEN}  [OK] Đã lưu thành công: {self.stats['matches_saved']}")
+            print(f"{Fore.GREEN}  [OK] Đã cập nhật tỉ số/trạng thái: {self.stats['matches_updated']}")
+            print(f"{Fore.GREEN}  [OK] Thông báo đã gửi: {self.stats['notifications_sent']}")
             print(f"{Fore.YELLOW}  [SKIP] Đã bỏ qua (trùng): {self.stats['matches_skipped']}")
             print(f"{Fore.RED}  [ERROR] Lỗi: {self.stats['matches_errors']}")
             print(f"{Fore.YELLOW}{'-'*70}{Style.RESET_ALL}\n")
@@ -106,6 +116,8 @@ class MatchCrawler:
             print(f"{Fore.YELLOW}THONG KE CRAWLER LICH THI DAU:")
             print(f"{Fore.GREEN}  [OK] Tong so tran dau crawl: {self.stats['matches_crawled']}")
             print(f"{Fore.GREEN}  [OK] Da luu thanh cong: {self.stats['matches_saved']}")
+            print(f"{Fore.GREEN}  [OK] Da cap nhat ti so/trang thai: {self.stats['matches_updated']}")
+            print(f"{Fore.GREEN}  [OK] Thong bao da gui: {self.stats['notifications_sent']}")
             print(f"{Fore.YELLOW}  [SKIP] Da bo qua (trung): {self.stats['matches_skipped']}")
             print(f"{Fore.RED}  [ERROR] Loi: {self.stats['matches_errors']}")
             print(f"{Fore.YELLOW}{'-'*70}{Style.RESET_ALL}\n")
@@ -135,21 +147,40 @@ class MatchCrawler:
         
         parser = self.match_parsers[parser_name]
         
-        # Cập nhật base_url từ config
-        if hasattr(parser, 'base_url'):
-            parser.base_url = source_config['base_url']
+        # Cập nhật base_url, rate limit từ config
+        parser.configure(source_config)
         
         try:
             # Lấy danh sách trận đấu với filter theo ngày
-            matches = parser.get_upcoming_matches(limit=limit, days_range=days_range)
+            queue_name = f"matches:{source_name}"
+            by_date = {}
+            if hasattr(parser, 'fetch_matches_by_date'):
+                matches, by_date = self._fetch_by_date(queue_name, parser, limit, days_range)
+            else:
+                matches = parser.get_upcoming_matches(limit=limit, days_range=days_range)
             
             if not matches:
-                logger.warning(f"[WARN] Không tìm thấy trận đấu nào từ {source_name}")
+                if not by_date or any(date_matches is not UNCHANGED_DAY for date_matches in by_date.values()):
+                    logger.warning(f"[WARN] Không tìm thấy trận đấu nào từ {source_name}")
+                self._finish_dates(queue_name, parser, by_date, set())
                 return
             
             print(f"{Fore.GREEN}  [OK] Tìm thấy {len(matches)} trận đấu\n")
             
-            # Lưu từng trận đấu
+            # Lấy hoặc tạo teams cho cả batch
+            teams = []
+            for match_info in matches:
+                for side in ('home', 'away'):
+                    teams.append({
+                        'name': match_info.get(f'{side}_team_name', 'Unknown'),
+                        'code': match_info.get(f'{side}_team_code'),
+                        'logo': match_info.get(f'{side}_team_logo')
+                    })
+            team_ids = self.db.resolve_teams(teams)
+            
+            # Chuẩn bị batch (batch_sources[i]: match_info của batch[i])
+            batch = []
+            batch_sources = []
             for idx, match_info in enumerate(matches, 1):
                 home_team_name = match_info.get('home_team_name', 'Unknown')
                 away_team_name = match_info.get('away_team_name', 'Unknown')
@@ -160,17 +191,8 @@ class MatchCrawler:
                 
                 self.stats['matches_crawled'] += 1
                 
-                # Lấy hoặc tạo teams
-                home_team_id = self.db.get_or_create_team(
-                    home_team_name,
-                    team_code=match_info.get('home_team_code'),
-                    logo_url=match_info.get('home_team_logo')
-                )
-                away_team_id = self.db.get_or_create_team(
-                    away_team_name,
-                    team_code=match_info.get('away_team_code'),
-                    logo_url=match_info.get('away_team_logo')
-                )
+                home_team_id = team_ids.get(home_team_name)
+                away_team_id = team_ids.get(away_team_name)
                 
                 if not home_team_id or not away_team_id:
                     logger.error(f"  {Fore.RED}[ERROR] Không thể tạo teams")
@@ -178,7 +200,8 @@ class MatchCrawler:
                     continue
                 
                 # Chuẩn bị dữ liệu match
-                match_data = {
+                batch_sources.append(match_info)
+                batch.append({
                     'home_team_id': home_team_id,
                     'away_team_id': away_team_id,
                     'home_team_name': home_team_name,
@@ -187,26 +210,137 @@ class MatchCrawler:
                     'tournament_name': match_info.get('tournament_name', ''),
                     'category_id': match_info.get('category_id', 1),
                     'venue': match_info.get('venue', ''),
+                    'home_score': match_info.get('home_score'),
+                    'away_score': match_info.get('away_score'),
                     'status': match_info.get('status', 'scheduled')
+                })
+            
+            # Lưu cả batch vào database (thêm mới hoặc cập nhật tỉ số/trạng thái)
+            result = self.db.upsert_matches(batch)
+            
+            if not any(result['results']):
+                # Lỗi DB (hoặc không tạo được team nào): các ngày sẽ được thử lại ở lần chạy sau
+                if self.work_queue:
+                    for date_str, date_matches in by_date.items():
+                        if date_matches is not None and date_matches is not UNCHANGED_DAY:
+                            self.work_queue.fail(queue_name, date_str, 'upsert')
+            else:
+                stored = {
+                    id(match_info) for match_info, status in zip(batch_sources, result['results'])
+                    if status in ('inserted', 'updated', 'unchanged', 'duplicate')
                 }
-                
-                # Lưu vào database
-                match_id = self.db.insert_match(match_data)
-                
-                if match_id:
-                    print(f"  {Fore.GREEN}[OK] Đã lưu (ID: {match_id})")
+                self._finish_dates(queue_name, parser, by_date, stored)
+            
+            for match_data, status in zip(batch, result['results']):
+                label = f"{match_data['home_team_name']} vs {match_data['away_team_name']}"
+                if status == 'inserted':
                     self.stats['matches_saved'] += 1
-                else:
-                    print(f"  {Fore.YELLOW}[SKIP] Bỏ qua (đã tồn tại)")
+                elif status == 'updated':
+                    self.stats['matches_updated'] += 1
+                elif status in ('unchanged', 'duplicate'):
                     self.stats['matches_skipped'] += 1
-                
-                # Delay giữa các trận đấu
-                time.sleep(1)
+                else:
+                    print(f"  {Fore.RED}[ERROR] Không lưu được: {label}")
+                    self.stats['matches_errors'] += 1
+            
+            for change in result['changes']:
+                old, new = change['old'], change['new']
+                print(f"  {Fore.GREEN}[UPDATE] {change['home_team_name']} vs {change['away_team_name']}: "
+                      f"{old['status']} {old['home_score']}-{old['away_score']} → "
+                      f"{new['status']} {new['home_score']}-{new['away_score']}")
+            
+            # Bắt đầu/bàn thắng/kết thúc → thông báo cho người theo dõi hai đội
+            self.notify_followers(result['changes'])
+            
+            print(f"  {Fore.GREEN}[OK] {result['inserted']} mới, {result['updated']} cập nhật, "
+                  f"{result['unchanged']} không đổi")
             
         except Exception as e:
             logger.error(f"[ERROR] Lỗi crawl matches từ {source_name}: {e}", exc_info=True)
             self.stats['matches_errors'] += 1
     
+    def notify_followers(self, changes):
+        """Sinh sự kiện từ các thay đổi tỉ số/trạng thái và gửi tới người theo dõi đội"""
+        events = collect_events(changes)
+        if not events:
+            return 0
+        created = self.db.notify_team_followers(events) or 0
+        self.stats['notifications_sent'] += created
+        return created
+    
+    def _fetch_by_date(self, queue_name, parser, limit, days_range):
+        """
+        Tải trận đấu theo từng ngày, bỏ qua ngày có payload không đổi từ lần lưu trước
+        
+        Luôn tải các ngày trong days_range. Có work queue thì tải thêm các ngày
+        chưa lưu xong của lần chạy trước (đã tới hạn retry) mà vẫn chưa qua;
+        ngày đã trước cửa sổ hiện tại thì bỏ khỏi queue.
+        
+        Returns:
+            Tuple (list trận đấu cần lưu, dict date_str → list trận/None/UNCHANGED_DAY)
+        """
+        date_strs = parser.match_dates(days_range)
+        if self.work_queue:
+            window_start = min(datetime.strptime(date_str, '%d-%m-%Y') for date_str in date_strs)
+            leftover, expired = [], []
+            for date_str, _ in self.work_queue.due(queue_name):
+                if date_str in date_strs:
+                    continue
+                if datetime.strptime(date_str, '%d-%m-%Y') < window_start:
+                    expired.append(date_str)
+                else:
+                    leftover.append(date_str)
+            if expired:
+                self.work_queue.remove(queue_name, expired)
+            if leftover:
+                print(f"{Fore.YELLOW}  ↻ Tiếp tục {len(leftover)} ngày chưa xong từ lần chạy trước")
+            # Ngày trong cửa sổ bắt đầu lại từ đầu (kể cả đã stored/dead ở lượt trước)
+            self.work_queue.clear(queue_name, FINAL_STATES)
+            self.work_queue.add(queue_name, ((date_str, None) for date_str in date_strs))
+            date_strs = leftover + date_strs
+        
+        by_date = parser.fetch_matches_by_date(date_strs, limit, skip_unchanged=True)
+        unchanged = [date_str for date_str, date_matches in by_date.items() if date_matches is UNCHANGED_DAY]
+        if unchanged:
+            print(f"{Fore.YELLOW}  [SKIP] {len(unchanged)} ngày không thay đổi: {', '.join(unchanged)}")
+        
+        if self.work_queue:
+            self._queue_mark(queue_name, unchanged, STORED)
+            for date_str, date_matches in by_date.items():
+                if date_matches is None:
+                    self.work_queue.fail(queue_name, date_str, 'fetch')
+            self._queue_mark(queue_name, [
+                date_str for date_str, date_matches in by_date.items()
+                if date_matches is not None and date_matches is not UNCHANGED_DAY
+            ], PARSED)
+        return parser.merge_matches(by_date.values(), limit), by_date
+    
+    def _finish_dates(self, queue_name, parser, by_date, stored):
+        """
+        Các ngày đã lưu DB xong: đánh dấu stored và ghi nhận fingerprint payload
+        
+        Ngày có trận chưa được lưu (bị cắt bởi limit, không tạo được team, lỗi
+        upsert) không ghi fingerprint, để lần sau vẫn được parse lại.
+        
+        Args:
+            stored: Set id(match_info) của các trận upsert_matches đã lưu
+        """
+        done, complete = [], []
+        for date_str, date_matches in by_date.items():
+            if date_matches is None or date_matches is UNCHANGED_DAY:
+                continue
+            done.append(date_str)
+            if all(id(match_info) in stored for match_info in date_matches):
+                complete.append(date_str)
+        self._queue_mark(queue_name, done, STORED)
+        if complete:
+            parser.commit_fingerprints(complete)
+    
+    def _queue_mark(self, queue_name, keys, state):
+        """Cập nhật trạng thái các ngày trong work queue (nếu bật)"""
+        if self.work_queue and keys:
+            self.work_queue.mark(queue_name, keys, state)
+    
     def run(self, limit_per_source=50, days_range=None):
         """
         Chạy crawler cho tất cả các nguồn lịch thi đấu
@@ -258,6 +392,8 @@ class MatchCrawler:
     
     def close(self):
         """Đóng các kết nối"""
+        for parser in self.match_parsers.values():
+            parser.close()
         self.db.close()
 
 
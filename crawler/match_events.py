@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Match Events - Sinh sự kiện trận đấu (bắt đầu, bàn thắng, kết thúc) từ thay đổi tỉ số/trạng thái
+
+Thay đổi lấy từ upsert_matches()['changes'] (MatchCrawler) hoặc
+LiveScoreTracker.tick(); sự kiện được gửi tới người theo dõi hai đội bằng
+DatabaseHandler.notify_team_followers.
+"""
+
+from config import NOTIFICATIONS
+
+KICKOFF = 'kickoff'
+GOAL = 'goal'
+FULL_TIME = 'full_time'
+
+# Vòng đời trận đấu chỉ đi tới: scheduled < live < finished (cancelled/postponed cùng bậc finished)
+STATUS_ORDER = {'scheduled': 0, 'live': 1, 'finished': 2, 'cancelled': 2, 'postponed': 2}
+
+
+def is_status_regression(old_status, new_status):
+    """True nếu new_status lùi so với old_status (vd. live → scheduled, finished → live)"""
+    return STATUS_ORDER.get(new_status, 0) < STATUS_ORDER.get(old_status, 0)
+
+
+def _score(values):
+    home, away = values.get('home_score'), values.get('away_score')
+    return f"{home if home is not None else 0}-{away if away is not None else 0}"
+
+
+def detect_events(change):
+    """
+    Các sự kiện của một thay đổi
+
+    Args:
+        change: Dict {'match_id', 'home_team_id', 'away_team_id', 'home_team_name',
+                'away_team_name', 'old', 'new'}
+
+    Returns:
+        List sự kiện {'kind', 'match_id', 'home_team_id', 'away_team_id', 'title', 'message'}
+    """
+    old, new = change['old'], change['new']
+    match_name = f"{change['home_team_name']} vs {change['away_team_name']}"
+    events = []
+
+    def add(kind, title, message):
+        if kind in NOTIFICATIONS['events']:
+            events.append({
+                'kind': kind,
+                'match_id': change['match_id'],
+                'home_team_id': change['home_team_id'],
+                'away_team_id': change['away_team_id'],
+                'title': title[:255],
+                'message': message,
+            })
+
+    if new['status'] == 'live' and old['status'] == 'scheduled':
+        add(KICKOFF, f"Trận đấu bắt đầu: {match_name}", f"{match_name} đã bắt đầu.")
+
+    scored = (
+        (new.get('home_score') or 0) > (old.get('home_score') or 0) or
+        (new.get('away_score') or 0) > (old.get('away_score') or 0)
+    )
+    # Bàn thắng phát hiện cùng lúc trận kết thúc thì gộp vào thông báo kết thúc
+    if scored and new['status'] != 'finished':
+        add(GOAL, f"Bàn thắng! {change['home_team_name']} {_score(new)} {change['away_team_name']}",
+            f"Tỉ số hiện tại trận {match_name}: {_score(new)}.")
+
+    if new['status'] == 'finished' and old['status'] != 'finished':
+        add(FULL_TIME, f"Kết thúc: {change['home_team_name']} {_score(new)} {change['away_team_name']}",
+            f"Trận {match_name} đã kết thúc với tỉ số {_score(new)}.")
+
+    return events
+
+
+def collect_events(changes):
+    """Sự kiện của nhiều thay đổi (theo thứ tự)"""
+    if not NOTIFICATIONS.get('enabled', False):
+        return []
+    return [event for change in changes for event in detect_events(change)]
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Network Package - Các thành phần dùng chung cho tầng tải trang
+"""
+
+from network.rate_limiter import TokenBucket, RateLimiter, rate_limiter
+from network.retry import RetryPolicy
+from network.http_cache import CacheEntry, HttpCache, get_http_cache
+from network.replay import ReplayResponse, HttpArchive, get_http_archive
+
+__all__ = [
+    'TokenBucket', 'RateLimiter', 'rate_limiter', 'RetryPolicy',
+    'CacheEntry', 'HttpCache', 'get_http_cache',
+    'ReplayResponse', 'HttpArchive', 'get_http_archive'
+]
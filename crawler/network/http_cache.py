@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP Cache - Cache response trên đĩa, hỗ trợ conditional GET (ETag/Last-Modified)
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from config import HTTP_CACHE, HTTP_REPLAY
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    """Một response đã lưu trong cache"""
+
+    def __init__(self, url, body, etag=None, last_modified=None, stored_at=0.0):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    @property
+    def age(self):
+        """Số giây kể từ lần tải/xác nhận gần nhất"""
+        return time.time() - self.stored_at
+
+    def is_fresh(self, ttl):
+        """Còn trong TTL thì dùng luôn, không cần hỏi lại server"""
+        return bool(ttl) and self.age < ttl
+
+    def conditional_headers(self):
+        """Header để server trả 304 nếu nội dung không đổi"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    Cache response HTTP lưu trong SQLite, giới hạn dung lượng bằng LRU
+
+    Args:
+        path: Đường dẫn file SQLite
+        max_bytes: Tổng dung lượng body tối đa, vượt quá thì xóa entry ít dùng nhất
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries (last_access)")
+        # Dấu vân tay nội dung đã xử lý (vd. payload lịch thi đấu từng ngày), không tính vào max_bytes
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                key TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def get(self, url):
+        """Lấy entry theo URL (None nếu chưa có), đánh dấu vừa được dùng"""
+        key = self._key(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, stored_at FROM entries WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if not row:
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        body, etag, last_modified, stored_at = row
+        return CacheEntry(url, body.decode('utf-8'), etag, last_modified, stored_at)
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """Lưu (hoặc thay) response của URL"""
+        key = self._key(url)
+        data = body.encode('utf-8')
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("""
+                INSERT OR REPLACE INTO entries
+                (key, url, body, etag, last_modified, stored_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (key, url, data, etag, last_modified, now, now, len(data)))
+            self._total_bytes += len(data) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url):
+        """Server trả 304: nội dung cũ vẫn đúng, tính lại TTL từ bây giờ"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE entries SET stored_at = ?, last_access = ? WHERE key = ?",
+                (now, now, self._key(url))
+            )
+            self._conn.commit()
+
+    def get_fingerprint(self, key):
+        """Digest đã lưu cho key (None nếu chưa có)"""
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM fingerprints WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put_fingerprints(self, digests):
+        """Lưu nhiều digest một lần (dict key → digest)"""
+        if not digests:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints (key, digest, updated_at) VALUES (?, ?, ?)",
+                [(key, digest, now) for key, digest in digests.items()]
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        """Xóa các entry lâu không dùng tới khi dưới max_bytes (gọi khi đang giữ lock)"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        removed = 0
+        for key, size in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._total_bytes -= size
+            removed += 1
+        logger.debug(f"HTTP cache: đã xóa {removed} entry (LRU)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    """Cache dùng chung cho mọi parser (None nếu HTTP_CACHE tắt hoặc đang record/replay)"""
+    global _http_cache
+    if not HTTP_CACHE.get('enabled', False) or HTTP_REPLAY.get('mode'):
+        return None
+    with _http_cache_lock:
+        if _http_cache is None:
+            HTTP_CACHE['directory'].mkdir(parents=True, exist_ok=True)
+            _http_cache = HttpCache(HTTP_CACHE['directory'] / 'http_cache.sqlite', HTTP_CACHE['max_bytes'])
+        return _http_cache
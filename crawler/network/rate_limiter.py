@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Rate Limiter - Giới hạn tốc độ request theo host bằng token bucket
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from config import NEWS_SOURCES, MATCH_SOURCES, DEFAULT_RATE_LIMIT, MAX_CONCURRENT_PER_HOST
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket an toàn khi nhiều thread dùng chung
+
+    Args:
+        requests_per_second: Tốc độ nạp token (số request trung bình mỗi giây)
+        burst: Số token tối đa (số request được gửi dồn ngay lập tức)
+    """
+
+    def __init__(self, requests_per_second, burst=1):
+        if requests_per_second <= 0:
+            raise ValueError("requests_per_second phải lớn hơn 0")
+        self.rate = float(requests_per_second)
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Lấy trước một token, trả về số giây cần chờ"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Cho phép token âm: request đến sau xếp hàng phía sau request trước
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Chờ tới khi có token, trả về số giây đã chờ"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """Quản lý token bucket và giới hạn số kết nối đồng thời cho từng host"""
+
+    def __init__(self, default_limit=None, max_per_host=MAX_CONCURRENT_PER_HOST):
+        self.default_limit = dict(default_limit or DEFAULT_RATE_LIMIT)
+        self.max_per_host = max_per_host
+        self._buckets = {}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url_or_host):
+        return urlparse(url_or_host).netloc or url_or_host
+
+    def configure(self, host, requests_per_second, burst=1):
+        """Đặt giới hạn cho một host (ghi đè cấu hình cũ)"""
+        host = self._host(host)
+        with self._lock:
+            self._buckets[host] = TokenBucket(requests_per_second, burst)
+        logger.debug(f"Rate limit {host}: {requests_per_second} req/s, burst {burst}")
+
+    def configure_source(self, source_config):
+        """Đặt giới hạn từ một entry của NEWS_SOURCES/MATCH_SOURCES"""
+        limit = dict(self.default_limit)
+        limit.update(source_config.get('rate_limit', {}))
+        self.configure(source_config['base_url'], limit['requests_per_second'], limit['burst'])
+
+    def bucket_for(self, url_or_host):
+        """Token bucket của host (tạo với giới hạn mặc định nếu chưa có)"""
+        host = self._host(url_or_host)
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(
+                    self.default_limit['requests_per_second'],
+                    self.default_limit['burst']
+                )
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url_or_host):
+        """Chờ tới lượt gửi request tới host của URL"""
+        return self.bucket_for(url_or_host).acquire()
+
+    @contextmanager
+    def slot(self, url):
+        """Giữ một kết nối tới host trong lúc gửi request (chờ token trước)"""
+        host = self._host(url)
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_per_host)
+                self._semaphores[host] = semaphore
+
+        with semaphore:
+            self.acquire(host)
+            yield
+
+
+def build_rate_limiter():
+    """Tạo rate limiter với cấu hình của tất cả các nguồn"""
+    limiter = RateLimiter()
+    for sources in (NEWS_SOURCES, MATCH_SOURCES):
+        for source_config in sources.values():
+            limiter.configure_source(source_config)
+    return limiter
+
+
+# Dùng chung cho mọi parser để nhiều parser cùng host chia sẻ một giới hạn
+rate_limiter = build_rate_limiter()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP Replay - Ghi lại response thật và phát lại offline để chạy crawler có thể lặp lại
+
+- record: mọi response 200 của get_page (URL, status, headers, body) được lưu vào
+  archive SQLite (body nén zlib, chỉ mục theo URL)
+- replay: không gửi request nào, trả lại response đã ghi theo đúng thứ tự
+  (URL được ghi nhiều lần thì lần gọi thứ n nhận bản ghi thứ n, hết thì dùng bản cuối),
+  có thể giả lập độ trễ mạng
+"""
+
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from requests.structures import CaseInsensitiveDict
+from config import HTTP_REPLAY
+
+logger = logging.getLogger(__name__)
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+
+class ReplayResponse:
+    """Response đã có sẵn body, dùng được thay cho requests.Response trong BaseParser"""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.content = content
+        self.encoding = 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class HttpArchive:
+    """
+    Archive response HTTP trong SQLite
+
+    Args:
+        path: Đường dẫn file archive
+        mode: 'record' hoặc 'replay'
+        latency: Độ trễ giả lập khi replay: số giây cố định, hoặc 'recorded'
+                 để dùng đúng thời gian tải lúc ghi
+        jitter: Cộng thêm ngẫu nhiên 0..jitter giây vào độ trễ
+    """
+
+    def __init__(self, path, mode, latency=0.0, jitter=0.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Chế độ HTTP replay không hợp lệ: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency if latency == 'recorded' else float(latency or 0)
+        self.jitter = float(jitter or 0)
+        self._lock = threading.Lock()
+        self._cursors = {}  # URL → số lần đã replay
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                elapsed REAL NOT NULL,
+                recorded_at REAL NOT NULL,
+                PRIMARY KEY (url, seq)
+            )
+        """)
+        self._conn.commit()
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    def record(self, url, response, started):
+        """
+        Lưu response (đọc hết body) và trả về ReplayResponse thay thế
+        (response gốc đã được đóng)
+
+        Args:
+            started: time.monotonic() lúc gửi request (thời gian tải tính cả đọc body)
+        """
+        try:
+            content = response.content
+        finally:
+            response.close()
+        self.add(url, content, response.status_code, response.headers, time.monotonic() - started)
+        return ReplayResponse(url, response.status_code, response.headers, content)
+
+    def add(self, url, content, status=200, headers=None, elapsed=0.0):
+        """Thêm một bản ghi cho URL (sau các bản ghi đã có), dùng cả để dựng archive mẫu"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        headers = json.dumps(dict(headers or {}), ensure_ascii=False)
+        with self._lock:
+            seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM responses WHERE url = ?", (url,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO responses (url, seq, status, headers, body, elapsed, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, seq, status, headers, zlib.compress(content), elapsed, time.time())
+            )
+            self._conn.commit()
+
+    def replay(self, url):
+        """Response đã ghi cho URL (None nếu archive không có URL này)"""
+        with self._lock:
+            index = self._cursors.get(url, 0)
+            row = self._conn.execute(
+                "SELECT status, headers, body, elapsed FROM responses "
+                "WHERE url = ? AND seq <= ? ORDER BY seq DESC LIMIT 1",
+                (url, index)
+            ).fetchone()
+            if row:
+                self._cursors[url] = index + 1
+        if not row:
+            logger.warning(f"⚠ Replay: không có bản ghi cho {url}")
+            return None
+
+        status, headers, body, elapsed = row
+        delay = elapsed if self.latency == 'recorded' else self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        return ReplayResponse(url, status, json.loads(headers), zlib.decompress(body))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_http_archive = None
+_http_archive_lock = threading.Lock()
+
+
+def get_http_archive():
+    """Archive dùng chung cho mọi parser (None nếu không bật record/replay)"""
+    global _http_archive
+    if not HTTP_REPLAY.get('mode'):
+        return None
+    with _http_archive_lock:
+        if _http_archive is None:
+            HTTP_REPLAY['archive'].parent.mkdir(parents=True, exist_ok=True)
+            _http_archive = HttpArchive(
+                HTTP_REPLAY['archive'], HTTP_REPLAY['mode'],
+                latency=HTTP_REPLAY.get('latency', 0), jitter=HTTP_REPLAY.get('jitter', 0)
+            )
+            logger.info(f"✓ HTTP {HTTP_REPLAY['mode']}: {HTTP_REPLAY['archive']}")
+        return _http_archive
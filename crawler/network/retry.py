@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Retry Policy - Chính sách retry cho request HTTP
+"""
+
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from config import RETRY_POLICY
+
+
+class RetryPolicy:
+    """
+    Quyết định khi nào retry và chờ bao lâu
+
+    - Status lỗi tạm thời (429, 5xx...) và lỗi mạng (timeout, mất kết nối) thì retry
+    - Các status còn lại (404, 410, 403...) coi là lỗi vĩnh viễn, dừng ngay
+    - Thời gian chờ tăng theo cấp số nhân, có jitter để các worker không retry cùng lúc
+    - Tôn trọng header Retry-After của server
+    - Tổng thời gian retry của một URL không vượt quá max_total_time
+    """
+
+    def __init__(self, max_attempts=3, backoff_base=1.0, backoff_max=30.0,
+                 max_total_time=60.0, retry_statuses=(408, 425, 429, 500, 502, 503, 504),
+                 jitter=True):
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.max_total_time = float(max_total_time)
+        self.retry_statuses = frozenset(retry_statuses)
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, overrides=None):
+        """Tạo policy từ RETRY_POLICY trong config, ghi đè bằng cấu hình riêng của nguồn"""
+        options = dict(RETRY_POLICY)
+        options.update(overrides or {})
+        return cls(**options)
+
+    def is_retryable_status(self, status_code):
+        return status_code in self.retry_statuses
+
+    def is_retryable_exception(self, error):
+        """Chỉ retry lỗi mạng tạm thời, không retry URL sai..."""
+        return isinstance(error, (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ))
+
+    def backoff(self, attempt):
+        """Thời gian chờ sau lần thử thứ attempt (bắt đầu từ 0), full jitter"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Parse Retry-After (số giây hoặc HTTP-date), trả về số giây hoặc None"""
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def next_delay(self, attempt, response=None):
+        """Thời gian chờ trước lần thử kế tiếp (ưu tiên Retry-After nếu có)"""
+        if response is not None:
+            retry_after = self.parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return retry_after
+        return self.backoff(attempt)
+
+    def deadline(self):
+        """Thời điểm (time.monotonic) phải dừng retry"""
+        return time.monotonic() + self.max_total_time
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Parse Pool - Parse HTML trong các process riêng để dùng nhiều core
+
+Fetch vẫn chạy bằng thread/async trong process chính; chỉ phần tốn CPU (dựng
+cây lxml/BeautifulSoup, get_text, regex) được gửi sang process con. Kết quả là
+dict thuần (picklable) dùng được ngay cho DatabaseHandler.
+
+Log của process con được gửi về process chính qua queue (QueueHandler), để
+chỉ process chính ghi file log.
+"""
+
+import logging
+import logging.handlers
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import PARSE_PROCESS_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Pool được tạo lười từ thread của pipeline khi các thread fetch/write, session HTTP và
+# lock của rate limiter đang chạy: fork lúc đó có thể để process con thừa hưởng một lock
+# đang bị giữ. Dùng forkserver (Windows/macOS không có thì spawn) để process con sạch.
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Parser trong từng process con, tạo một lần theo tên class
+_worker_parsers = {}
+
+
+def _init_worker(log_queue, level):
+    """
+    Chạy khi process con khởi động: bỏ mọi handler (forkserver/spawn import lại
+    module main nên setup_logging đã gắn thêm RotatingFileHandler vào cùng file log)
+    và gửi log về process chính qua log_queue
+    """
+    loggers = [logging.getLogger()] + [
+        item for item in logging.root.manager.loggerDict.values() if isinstance(item, logging.Logger)
+    ]
+    for item in loggers:
+        for handler in list(item.handlers):
+            item.removeHandler(handler)
+            handler.close()
+    logging.getLogger().addHandler(logging.handlers.QueueHandler(log_queue))
+    logging.getLogger().setLevel(level)
+
+
+class _DispatchHandler(logging.Handler):
+    """Process chính: chuyển log của process con cho logger cùng tên (và các handler của nó)"""
+
+    def emit(self, record):
+        logging.getLogger(record.name).handle(record)
+
+
+def _call_in_worker(parser_name, source_config, method, args):
+    """Chạy trong process con: gọi parser.<method>(*args) với cấu hình nguồn như ở process chính"""
+    parser = _worker_parsers.get(parser_name)
+    if parser is None:
+        import parsers
+        parser = getattr(parsers, parser_name)()
+        _worker_parsers[parser_name] = parser
+    if source_config is not None and parser.source_config != source_config:
+        parser.configure(source_config)
+    return getattr(parser, method)(*args)
+
+
+class ParsePool:
+    """
+    Pool process cho các hàm parse của parser
+
+    Args:
+        workers: Số process (0 = parse trong process hiện tại)
+    """
+
+    def __init__(self, workers=PARSE_PROCESS_WORKERS):
+        self.workers = max(0, int(workers or 0))
+        self._executor = None
+        self._log_listener = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self.workers and self._executor is None:
+                try:
+                    context = multiprocessing.get_context(START_METHOD)
+                    log_queue = context.Queue()
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=context,
+                        initializer=_init_worker,
+                        initargs=(log_queue, logging.getLogger().getEffectiveLevel())
+                    )
+                    self._log_listener = logging.handlers.QueueListener(log_queue, _DispatchHandler())
+                    self._log_listener.start()
+                    logger.info(f"✓ Đã tạo parse pool {self.workers} process")
+                except (OSError, NotImplementedError, ImportError) as e:
+                    logger.warning(f"⚠ Không tạo được parse pool, parse trong process chính: {e}")
+                    self.workers = 0
+            return self._executor
+
+    def _disable(self, error):
+        """Pool hỏng (process con chết...): từ giờ parse trong process chính"""
+        with self._lock:
+            if self.workers:
+                logger.warning(f"⚠ Parse pool lỗi, chuyển sang parse trong process chính: {error}")
+            self.workers = 0
+            executor, self._executor = self._executor, None
+            listener, self._log_listener = self._log_listener, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if listener is not None:
+            listener.stop()
+
+    def call(self, parser, method, *args):
+        """
+        Gọi parser.<method>(*args) trong process con (hoặc tại chỗ nếu pool tắt)
+
+        Args:
+            parser: Parser trong process chính (dùng tên class và source_config)
+            method: Tên method parse, vd. 'parse_article_html'
+            args: Tham số picklable (URL, HTML...)
+        """
+        executor = self._get_executor()
+        if executor is None:
+            return getattr(parser, method)(*args)
+        try:
+            future = executor.submit(_call_in_worker, type(parser).__name__, parser.source_config, method, args)
+            return future.result()
+        except (BrokenProcessPool, RuntimeError) as e:
+            # RuntimeError: pool đã shutdown (do thread khác vừa tắt pool)
+            self._disable(e)
+            return getattr(parser, method)(*args)
+
+    def map(self, parser, method, items, chunksize=4):
+        """
+        Gọi parser.<method>(*item) cho từng item, trả về list kết quả theo thứ tự
+        (dùng cho backfill: gửi nhiều trang một lần để giảm chi phí IPC)
+        """
+        items = list(items)
+        executor = self._get_executor()
+        if executor is None:
+            return [getattr(parser, method)(*item) for item in items]
+        name = type(parser).__name__
+        try:
+            return list(executor.map(
+                _call_in_worker,
+                [name] * len(items), [parser.source_config] * len(items),
+                [method] * len(items), items,
+                chunksize=chunksize
+            ))
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._disable(e)
+            return [getattr(parser, method)(*item) for item in items]
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            listener, self._log_listener = self._log_listener, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if listener is not None:
+            listener.stop()
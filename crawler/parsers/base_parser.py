@@ -5,46 +5,290 @@ Base Parser - Lớp cơ sở cho các parser
 
 import requests
 from bs4 import BeautifulSoup
+import asyncio
+import functools
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from slugify import slugify
-from config import USER_AGENT, REQUEST_TIMEOUT, RETRY_TIMES, DELAY_BETWEEN_REQUESTS
+from config import (
+    USER_AGENT, REQUEST_TIMEOUT, MAX_CONCURRENT_REQUESTS, HTTP_CACHE, STREAM_PARSE,
+    CATEGORY_MAPPING, CATEGORY_WEIGHTS, TAG_KEYWORDS, MAX_TAGS_PER_ARTICLE
+)
+from network import rate_limiter, RetryPolicy, get_http_cache, get_http_archive
+from parsers.selector_strategy import SelectorStrategy
+from parsers.html_stream import trim_html
+from parsers.keyword_index import KeywordIndex
 from datetime import datetime
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
 
 logger = logging.getLogger(__name__)
 
+# Query params chỉ dùng để tracking, không ảnh hưởng nội dung trang
+TRACKING_PARAMS = {'fbclid', 'gclid', 'vn_source', 'vn_medium', 'vn_campaign'}
+
+# Chỉ mục từ khóa dựng một lần, dùng chung cho mọi bài viết
+CATEGORY_INDEX = KeywordIndex(CATEGORY_MAPPING)
+TAG_INDEX = KeywordIndex(TAG_KEYWORDS)
+
+
+class PageResult:
+    """Kết quả tải một trang"""
+    
+    def __init__(self, url, text, status_code=200, from_cache=False, not_modified=False):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+        self.from_cache = from_cache        # Lấy từ cache, không gửi request
+        self.not_modified = not_modified    # Server trả 304
+    
+    @property
+    def unchanged(self):
+        """Nội dung giống lần tải trước (cache còn hạn hoặc 304)"""
+        return self.from_cache or self.not_modified
+
+
+class ContentExtract:
+    """Kết quả duyệt nội dung bài viết (BaseParser.extract_content)"""
+    
+    def __init__(self):
+        self.html = ''              # HTML nội dung, src ảnh đã là URL tuyệt đối
+        self.text = ''              # Text thuần của nội dung
+        self.images = []            # [{'url', 'caption'}] theo thứ tự trong bài
+        self.image_count = 0        # Số thẻ img
+        self.processed_count = 0    # Số ảnh đã thay src
+
 
 class BaseParser:
     """Lớp cơ sở cho tất cả các parser"""
     
+    # KeepRule cho chế độ stream (None = parser không hỗ trợ stream)
+    STREAM_KEEP = None
+    
     def __init__(self, source_name, base_url):
         self.source_name = source_name
         self.base_url = base_url
+        # Cấu hình nguồn đã áp dụng (configure), parse pool gửi kèm cho process con
+        self.source_config = None
         self.session = requests.Session()
         self.session.headers.update({'User-Agent': USER_AGENT})
+        self.retry_policy = RetryPolicy.from_config()
+        self.cache_ttl = HTTP_CACHE.get('default_ttl', 0)
+        # Tải trang bài viết theo chế độ stream (chỉ giữ phần cần parse)
+        self.stream = False
+        # Ghi nhớ selector khớp gần nhất cho từng trường (dùng lại giữa các trang)
+        self.selectors = SelectorStrategy(source_name)
+        self._local = threading.local()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+    
+    def configure(self, source_config):
+        """Áp dụng cấu hình của nguồn (NEWS_SOURCES/MATCH_SOURCES) cho parser"""
+        self.source_config = source_config
+        self.base_url = source_config.get('base_url', self.base_url)
+        if 'rate_limit' in source_config:
+            rate_limiter.configure_source(source_config)
+        self.retry_policy = RetryPolicy.from_config(source_config.get('retry'))
+        self.cache_ttl = source_config.get('cache_ttl', HTTP_CACHE.get('default_ttl', 0))
+        self.stream = bool(source_config.get('stream')) and self.STREAM_KEEP is not None
+    
+    def _get_session(self):
+        """Session cho thread hiện tại (requests.Session không thread-safe)"""
+        if threading.current_thread() is threading.main_thread():
+            return self.session
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.session.headers)
+            self._local.session = session
+        return session
     
-    def get_page(self, url, retry=RETRY_TIMES):
-        """Lấy nội dung trang web"""
-        for attempt in range(retry):
+    def _get_executor(self):
+        """Thread pool chạy các request blocking cho API async"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=MAX_CONCURRENT_REQUESTS,
+                    thread_name_prefix=f"fetch-{self.source_name}"
+                )
+            return self._executor
+    
+    def get_page(self, url, retry=None, stream=False):
+        """
+        Lấy nội dung trang web
+        
+        Args:
+            url: URL cần tải
+            retry: Số lần thử tối đa (mặc định theo self.retry_policy)
+            stream: True thì chỉ trả về HTML rút gọn theo STREAM_KEEP
+        """
+        page = self.fetch_page(url, retry=retry, stream=stream)
+        return page.text if page else None
+    
+    def fetch_page(self, url, retry=None, max_age=None, stream=False):
+        """
+        Tải trang, dùng HTTP cache nếu có
+        
+        - Cache còn trong TTL (cache_ttl của nguồn): trả luôn, không gửi request
+        - Hết TTL: gửi If-None-Match/If-Modified-Since, server trả 304 thì dùng body cũ
+        
+        Args:
+            url: URL cần tải
+            retry: Số lần thử tối đa (mặc định theo self.retry_policy)
+            max_age: Ghi đè cache_ttl cho lần tải này (0 = luôn hỏi lại server)
+            stream: True thì đọc response theo chunk và chỉ giữ các phần tử
+                    theo STREAM_KEEP (HTML rút gọn, cache riêng với trang đầy đủ)
+            
+        Returns:
+            PageResult hoặc None nếu lỗi
+        """
+        stream = stream and self.STREAM_KEEP is not None
+        cache = get_http_cache()
+        ttl = self.cache_ttl if max_age is None else max_age
+        cache_key = f"{url}#trimmed" if stream else url
+        entry = cache.get(cache_key) if cache else None
+        
+        if entry and entry.is_fresh(ttl):
+            logger.info(f"💾 Dùng cache ({entry.age:.0f}s): {url}")
+            return PageResult(url, entry.body, from_cache=True)
+        
+        headers = entry.conditional_headers() if entry else {}
+        response = self._request(url, retry=retry, headers=headers, stream=stream)
+        if response is None:
+            return None
+        
+        if response.status_code == 304 and entry:
+            response.close()
+            logger.info(f"💾 Không thay đổi (304): {url}")
+            cache.touch(cache_key)
+            return PageResult(url, entry.body, status_code=304, not_modified=True)
+        
+        text = self._read_trimmed(url, response) if stream else response.text
+        if cache and 'no-store' not in response.headers.get('Cache-Control', ''):
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            # Chỉ lưu khi có thể revalidate hoặc nguồn có TTL
+            if etag or last_modified or ttl:
+                cache.put(cache_key, text, etag, last_modified)
+        return PageResult(url, text)
+    
+    def _read_trimmed(self, url, response):
+        """Đọc body theo chunk, bỏ phần không cần ngay khi parse xong (bộ nhớ có giới hạn)"""
+        try:
+            text, received, truncated = trim_html(
+                response.iter_content(chunk_size=STREAM_PARSE['chunk_size']),
+                self.STREAM_KEEP,
+                STREAM_PARSE['max_bytes']
+            )
+        finally:
+            response.close()
+        if truncated:
+            logger.warning(f"⚠ Trang vượt quá {STREAM_PARSE['max_bytes'] // 1024} KB, chỉ parse phần đầu: {url}")
+        logger.debug(f"Stream {url}: đọc {received} bytes, giữ {len(text)} ký tự")
+        return text
+    
+    def _request(self, url, retry=None, headers=None, stream=False):
+        """
+        Gửi GET với rate limit và retry, trả về response 200/304 hoặc None
+        (stream=True: body chưa được đọc, người gọi phải close response)
+        
+        Đang replay (HTTP_REPLAY) thì trả response đã ghi, không gửi request;
+        đang record thì response 200 được lưu vào archive trước khi trả về
+        """
+        archive = get_http_archive()
+        if archive and archive.replaying:
+            response = archive.replay(url)
+            if response is None or response.status_code not in (200, 304):
+                return None
+            return response
+        
+        policy = self.retry_policy
+        attempts = retry or policy.max_attempts
+        deadline = policy.deadline()
+        
+        for attempt in range(attempts):
+            response = None
             try:
                 logger.info(f"📡 Đang tải: {url}")
-                response = self.session.get(url, timeout=REQUEST_TIMEOUT)
+                # Mỗi lần thử (kể cả retry) đều phải lấy token của host
+                with rate_limiter.slot(url):
+                    started = time.monotonic()
+                    response = self._get_session().get(
+                        url, headers=headers, timeout=REQUEST_TIMEOUT, stream=stream
+                    )
                 response.encoding = 'utf-8'
                 
-                if response.status_code == 200:
-                    time.sleep(DELAY_BETWEEN_REQUESTS)
-                    return response.text
-                else:
-                    logger.warning(f"⚠ HTTP {response.status_code}: {url}")
-                    
+                if response.status_code == 200 and archive:
+                    return archive.record(url, response, started)
+                if response.status_code in (200, 304):
+                    return response
+                response.close()
+                
+                if not policy.is_retryable_status(response.status_code):
+                    logger.warning(f"✗ HTTP {response.status_code} (không retry): {url}")
+                    return None
+                
+                logger.warning(f"⚠ HTTP {response.status_code} (lần {attempt + 1}/{attempts}): {url}")
+                
             except Exception as e:
-                logger.error(f"✗ Lỗi tải trang (lần {attempt + 1}/{retry}): {e}")
-                if attempt < retry - 1:
-                    time.sleep(5)
+                if not policy.is_retryable_exception(e):
+                    logger.error(f"✗ Lỗi tải trang (không retry): {e}")
+                    return None
+                logger.error(f"✗ Lỗi tải trang (lần {attempt + 1}/{attempts}): {e}")
+            
+            if attempt == attempts - 1:
+                break
+            
+            delay = policy.next_delay(attempt, response)
+            if time.monotonic() + delay > deadline:
+                logger.warning(f"⚠ Hết thời gian retry ({policy.max_total_time:.0f}s): {url}")
+                break
+            time.sleep(delay)
         
         return None
     
+    async def get_page_async(self, url, retry=None):
+        """Phiên bản async của get_page (request chạy trong thread pool)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            functools.partial(self.get_page, url, retry)
+        )
+    
+    async def fetch_many_async(self, urls, concurrency=MAX_CONCURRENT_REQUESTS):
+        """
+        Tải nhiều trang cùng lúc
+        
+        Args:
+            urls: Danh sách URL
+            concurrency: Số request tối đa đang chạy cùng lúc
+            
+        Returns:
+            List HTML (hoặc None nếu lỗi) theo đúng thứ tự urls
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def fetch(url):
+            async with semaphore:
+                return await self.get_page_async(url)
+        
+        return await asyncio.gather(*(fetch(url) for url in urls))
+    
+    def fetch_many(self, urls, concurrency=MAX_CONCURRENT_REQUESTS):
+        """Tải nhiều trang cùng lúc từ code đồng bộ (không gọi trong event loop đang chạy)"""
+        urls = list(urls)
+        if not urls:
+            return []
+        return asyncio.run(self.fetch_many_async(urls, concurrency))
+    
+    def close(self):
+        """Đóng session và thread pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
+    
     def parse_soup(self, html):
         """Parse HTML thành BeautifulSoup object"""
         return BeautifulSoup(html, 'lxml')
@@ -55,6 +299,19 @@ class BaseParser:
             return ""
         return ' '.join(text.strip().split())
     
+    def canonical_url(self, url):
+        """
+        Chuẩn hóa URL nguồn để nhận diện bài đã crawl:
+        host viết thường, bỏ fragment, bỏ các tham số tracking (utm_*, fbclid...)
+        """
+        parts = urlsplit(url.strip())
+        query = [
+            (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+        ]
+        path = parts.path.rstrip('/') or '/'
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ''))
+    
     def generate_slug(self, title):
         """Tạo slug từ tiêu đề (unique với timestamp)"""
         base_slug = slugify(title, separator='-')
@@ -116,89 +373,142 @@ class BaseParser:
                 soup = BeautifulSoup(content_html, 'lxml')
             else:
                 soup = content_html
-            
-            # Tìm tất cả thẻ img
-            img_tags = soup.find_all('img')
-            
-            if not img_tags:
-                logger.info("ℹ Không có ảnh trong content")
-                return str(soup)
-            
-            logger.info(f"🖼️ Tìm thấy {len(img_tags)} ảnh trong content, đang xử lý URL...")
-            
-            processed_count = 0
-            for img in img_tags:
-                # Lấy URL ảnh (thử nhiều thuộc tính)
-                img_url = img.get('data-src') or img.get('src') or img.get('data-original')
-                
-                if not img_url:
-                    continue
-                
-                # Chuyển thành URL tuyệt đối
-                absolute_url = self.download_image(img_url, article_slug)
-                
-                if absolute_url:
-                    # Thay thế URL cũ bằng URL gốc
-                    img['src'] = absolute_url
-                    
-                    # Xóa các thuộc tính lazy load
-                    if img.get('data-src'):
-                        del img['data-src']
-                    if img.get('data-original'):
-                        del img['data-original']
-                    
-                    processed_count += 1
-                else:
-                    logger.warning(f"  ⚠ Không xử lý được: {img_url[:50]}...")
-            
-            logger.info(f"✓ Đã xử lý {processed_count}/{len(img_tags)} ảnh trong content")
-            
-            # Trả về HTML đã xử lý
-            # Lấy body content (bỏ các thẻ html, body tự động thêm vào)
-            body = soup.find('body')
-            if body:
-                return ''.join(str(child) for child in body.children)
-            else:
-                return str(soup)
-            
+            return self.extract_content(soup, article_slug).html
         except Exception as e:
             logger.error(f"✗ Lỗi xử lý ảnh trong content: {e}")
             return str(content_html)
     
-    def detect_category(self, title, content, url):
-        """Phát hiện category từ nội dung (override trong subclass)"""
-        from config import CATEGORY_MAPPING
+    def extract_content(self, content_tag, article_slug, image_base=None):
+        """
+        Duyệt cây nội dung một lần, lấy cùng lúc:
+        - danh sách ảnh kèm caption (figcaption của figure gần nhất, hoặc alt/title)
+        - src ảnh được thay bằng URL tuyệt đối (bỏ data-src, data-original)
+        - text thuần (giống content_tag.get_text())
+        - HTML đã xử lý (giống process_content_images)
         
-        text = f"{title} {content} {url}".lower()
+        Args:
+            content_tag: Tag/BeautifulSoup chứa nội dung bài viết
+            article_slug: Slug của bài viết
+            image_base: URL gốc để chuyển URL ảnh tương đối (mặc định base_url)
+            
+        Returns:
+            ContentExtract
+        """
+        image_base = image_base or self.base_url
+        text_types = content_tag.interesting_string_types
+        result = ContentExtract()
+        texts = []
+        body = None
+        figures = []            # Các figure đang mở: [{'caption': ..., 'images': [...]}]
+        stack = [(content_tag, False)]
         
-        for keyword, category_id in CATEGORY_MAPPING.items():
-            if keyword in text:
-                return category_id
+        while stack:
+            node, leaving = stack.pop()
+            if leaving:
+                # Ra khỏi figure: gán caption cho các ảnh trong figure chưa có caption
+                figure = figures.pop()
+                for image, fallback in figure['images']:
+                    image['caption'] = (figure['caption'] or fallback)[:500]
+                continue
+            
+            name = node.name
+            if name is None:
+                if type(node) in text_types:
+                    texts.append(node)
+                continue
+            
+            if name == 'img':
+                self._extract_image(node, article_slug, image_base, figures, result)
+            elif name == 'figcaption':
+                for figure in figures:
+                    if figure['caption'] is None:
+                        figure['caption'] = self.clean_text(node.get_text())
+            elif name == 'body' and body is None and node is not content_tag:
+                body = node
+            
+            if name == 'figure':
+                figures.append({'caption': None, 'images': []})
+                stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.contents))
         
-        return 1  # Default: Bóng đá
-    
-    def extract_tags(self, title, content):
-        """Trích xuất tags từ nội dung"""
-        tags = []
-        
-        # Danh sách các keywords phổ biến trong bóng đá
-        common_keywords = [
-            'Premier League', 'La Liga', 'Serie A', 'Bundesliga',
-            'Champions League', 'Europa League', 'World Cup',
-            'Manchester United', 'Liverpool', 'Real Madrid', 'Barcelona',
-            'Arsenal', 'Chelsea', 'Man City', 'PSG', 'Bayern Munich',
-            'Messi', 'Ronaldo', 'Neymar', 'Mbappe',
-            'V-League', 'AFF Cup', 'SEA Games',
-            'Chuyển nhượng', 'Transfer', 'HLV', 'Coach'
-        ]
+        if result.image_count:
+            logger.info(f"✓ Đã xử lý {result.processed_count}/{result.image_count} ảnh trong content")
+        else:
+            logger.info("ℹ Không có ảnh trong content")
         
-        text = f"{title} {content}"
+        result.text = ''.join(texts)
+        # Bỏ các thẻ html, body do parser tự thêm vào (nếu có)
+        if body is not None:
+            result.html = ''.join(str(child) for child in body.children)
+        else:
+            result.html = str(content_tag)
+        return result
+    
+    def _extract_image(self, img, article_slug, image_base, figures, result):
+        """Xử lý một thẻ img trong extract_content"""
+        result.image_count += 1
         
-        for keyword in common_keywords:
-            if keyword.lower() in text.lower():
-                tags.append(keyword)
+        # URL cho danh sách ảnh (ưu tiên data-src cho lazy load), lấy trước khi sửa thẻ
+        img_url = (img.get('data-src') or
+                   img.get('data-original') or
+                   img.get('src') or
+                   img.get('data-lazy-src'))
+        if img_url:
+            # Chuyển thành URL tuyệt đối nếu cần, giữ nguyên query parameters
+            if not img_url.startswith('http'):
+                img_url = urljoin(image_base, img_url)
+            img_url = img_url.strip()
+            
+            if img_url.startswith('http'):
+                image = {'url': img_url, 'caption': ''}
+                fallback = img.get('alt', '') or img.get('title', '')
+                if figures:
+                    # Caption lấy từ figure gần nhất khi ra khỏi figure đó
+                    figures[-1]['images'].append((image, fallback))
+                else:
+                    image['caption'] = fallback[:500]
+                result.images.append(image)
+            else:
+                logger.warning(f"  ⚠ Bỏ qua URL ảnh không hợp lệ: {img_url[:50]}...")
         
-        return tags[:10]  # Giới hạn 10 tags
+        # Thay src bằng URL gốc tuyệt đối trong HTML
+        src = img.get('data-src') or img.get('src') or img.get('data-original')
+        if not src:
+            return
+        absolute_url = self.download_image(src, article_slug)
+        if absolute_url:
+            img['src'] = absolute_url
+            # Xóa các thuộc tính lazy load
+            if img.get('data-src'):
+                del img['data-src']
+            if img.get('data-original'):
+                del img['data-original']
+            result.processed_count += 1
+        else:
+            logger.warning(f"  ⚠ Không xử lý được: {src[:50]}...")
+    
+    def category_scores(self, title, content, url):
+        """Điểm của từng category theo số lần khớp từ khóa (có trọng số theo vị trí)"""
+        # URL dùng '-' và '/' thay cho khoảng trắng (vd. /bong-da/)
+        url_text = url.replace('-', ' ').replace('/', ' ') if url else ''
+        return CATEGORY_INDEX.scores([
+            (title, CATEGORY_WEIGHTS['title']),
+            (url_text, CATEGORY_WEIGHTS['url']),
+            (content, CATEGORY_WEIGHTS['content']),
+        ])
+    
+    def detect_category(self, title, content, url):
+        """Phát hiện category từ nội dung (category có điểm cao nhất)"""
+        scores = self.category_scores(title, content, url)
+        if not scores:
+            return 1  # Default: Bóng đá
+        # Bằng điểm thì ưu tiên category_id nhỏ hơn
+        return max(scores, key=lambda category_id: (scores[category_id], -category_id))
+    
+    def extract_tags(self, title, content):
+        """Trích xuất tags từ nội dung (xuất hiện nhiều hơn đứng trước)"""
+        counts = TAG_INDEX.counts(f"{title} {content}")
+        return [tag for tag, _ in counts.most_common(MAX_TAGS_PER_ARTICLE)]
     
     def get_article_list(self):
         """Lấy danh sách bài viết (phải override trong subclass)"""
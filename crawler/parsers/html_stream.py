@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+HTML Stream - Parse HTML theo từng chunk, chỉ giữ các phần tử cần dùng
+
+Dùng lxml HTMLPullParser: phần tử không cần được xóa ngay khi đóng thẻ, nên bộ
+nhớ chỉ phụ thuộc vào phần giữ lại (tiêu đề, sapo, nội dung, meta) chứ không
+phụ thuộc vào kích thước cả trang.
+"""
+
+import logging
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# Phần tử thuộc <head> trong tài liệu rút gọn
+HEAD_TAGS = {'meta', 'title'}
+
+
+class KeepRule:
+    """
+    Điều kiện giữ một phần tử (giữ nguyên cả cây con của nó)
+
+    Args:
+        tags: Tên thẻ luôn giữ (vd. 'h1', 'meta')
+        classes: Giữ phần tử có một trong các class này
+        attributes: Giữ phần tử có một trong các thuộc tính này (vd. 'datetime')
+        stop_after: Class của phần tử mà khi đóng thẻ thì ngừng đọc phần còn lại
+    """
+
+    def __init__(self, tags=(), classes=(), attributes=(), stop_after=None):
+        self.tags = set(tags)
+        self.classes = set(classes)
+        self.attributes = set(attributes)
+        self.stop_after = stop_after
+
+    def matches(self, elem):
+        if elem.tag in self.tags:
+            return True
+        if self.classes and self.classes.intersection(elem.get('class', '').split()):
+            return True
+        return any(name in elem.attrib for name in self.attributes)
+
+
+def _serialize(elem):
+    return etree.tostring(elem, encoding='unicode', method='html', with_tail=False)
+
+
+def _discard(elem):
+    """Giải phóng phần tử đã xử lý xong và các anh em đứng trước nó"""
+    elem.clear(keep_tail=False)
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+def trim_html(chunks, keep, max_bytes):
+    """
+    Đọc HTML theo từng chunk (bytes), trả về tài liệu HTML chỉ gồm các phần tử được giữ
+
+    Args:
+        chunks: Iterable bytes (vd. response.iter_content())
+        keep: KeepRule
+        max_bytes: Số byte tối đa được đọc, vượt quá thì dừng và dùng phần đã có
+
+    Returns:
+        (html rút gọn, số byte đã đọc, True nếu bị cắt do max_bytes)
+    """
+    parser = etree.HTMLPullParser(events=('start', 'end'), encoding='utf-8')
+    head, body = [], []
+    kept_root = None
+    depth = 0
+    received = 0
+    truncated = False
+    done = False
+
+    def handle(events):
+        nonlocal kept_root, depth, done
+        for event, elem in events:
+            if not isinstance(elem.tag, str):
+                # Comment, processing instruction
+                continue
+            if event == 'start':
+                if kept_root is not None:
+                    depth += 1
+                elif keep.matches(elem):
+                    kept_root, depth = elem, 1
+                continue
+
+            if kept_root is None:
+                _discard(elem)
+                continue
+            depth -= 1
+            if depth:
+                continue
+            (head if elem.tag in HEAD_TAGS else body).append(_serialize(elem))
+            if keep.stop_after and keep.stop_after in elem.get('class', '').split():
+                done = True
+            kept_root = None
+            _discard(elem)
+            if done:
+                return
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        received += len(chunk)
+        if received > max_bytes:
+            truncated = True
+            chunk = chunk[:len(chunk) - (received - max_bytes)]
+            received = max_bytes
+        parser.feed(chunk)
+        handle(parser.read_events())
+        if done or truncated:
+            break
+
+    if truncated and kept_root is not None:
+        # Phần tử đang đọc dở khi chạm giới hạn: giữ phần đã có
+        body.append(_serialize(kept_root))
+
+    if not done and not truncated:
+        try:
+            parser.close()
+            handle(parser.read_events())
+        except etree.LxmlError as e:
+            logger.debug(f"HTML stream: lỗi khi đóng parser: {e}")
+
+    html = f"<html><head>{''.join(head)}</head><body>{''.join(body)}</body></html>"
+    return html, received, truncated
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Keyword Index - Tìm nhiều từ khóa trong văn bản chỉ với một lần quét
+
+Các từ khóa được gộp thành một regex dạng trie (các từ chung tiền tố dùng
+chung nhánh) và có ràng buộc biên từ, nên thời gian tìm gần như chỉ phụ thuộc
+độ dài văn bản, không tăng theo số từ khóa.
+"""
+
+import re
+from collections import Counter
+
+
+def _trie_pattern(words):
+    """Regex khớp đúng một trong các từ, tiền tố chung được gộp lại"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        optional = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        # '?' tham lam: ưu tiên từ dài hơn, trượt biên từ thì lùi về từ ngắn hơn
+        return group + '?' if optional else group
+
+    return build(trie)
+
+
+class KeywordIndex:
+    """
+    Chỉ mục từ khóa → giá trị (không phân biệt hoa thường, khớp nguyên từ)
+
+    Args:
+        keywords: Dict {từ khóa: giá trị} hoặc iterable từ khóa (giá trị là chính từ khóa)
+    """
+
+    def __init__(self, keywords):
+        if not isinstance(keywords, dict):
+            keywords = {keyword: keyword for keyword in keywords}
+        self._values = {}
+        self._canonical = {}
+        for keyword, value in keywords.items():
+            key = keyword.lower()
+            self._values.setdefault(key, value)
+            self._canonical.setdefault(key, keyword)
+        if self._values:
+            # Văn bản được viết thường trước khi tìm (nhanh hơn re.IGNORECASE)
+            self._pattern = re.compile(r'(?<!\w)' + _trie_pattern(self._values) + r'(?!\w)')
+        else:
+            self._pattern = None
+
+    def __len__(self):
+        return len(self._values)
+
+    def finditer(self, text):
+        """Lần lượt (từ khóa như khai báo, giá trị, vị trí trong text.lower()) của các lần khớp"""
+        if not text or self._pattern is None:
+            return
+        for match in self._pattern.finditer(text.lower()):
+            key = match.group()
+            yield self._canonical[key], self._values[key], match.start()
+
+    def counts(self, text):
+        """Counter {từ khóa: số lần xuất hiện}"""
+        return Counter(keyword for keyword, _, _ in self.finditer(text))
+
+    def scores(self, weighted_texts):
+        """
+        Cộng điểm theo giá trị của từ khóa
+
+        Args:
+            weighted_texts: List (văn bản, trọng số)
+
+        Returns:
+            Counter {giá trị: tổng trọng số các lần khớp}
+        """
+        scores = Counter()
+        for text, weight in weighted_texts:
+            for _, value, _ in self.finditer(text):
+                scores[value] += weight
+        return scores
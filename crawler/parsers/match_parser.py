@@ -4,6 +4,7 @@ Match Parser - Parser cho các trận đấu sắp diễn ra
 """
 
 from parsers.base_parser import BaseParser
+import bisect
 import logging
 from datetime import datetime, timedelta
 import re
@@ -13,6 +14,100 @@ from config import CATEGORY_MAPPING, PAGE_LOAD_DELAY
 
 logger = logging.getLogger(__name__)
 
+# ---------------------------------------------------------------------------
+# Regex dùng chung (compile một lần khi import)
+#
+# Tên đội: 1-4 từ viết hoa chữ đầu (vd. "Man City", "Nottingham Forest"),
+# mỗi từ tối đa 20 ký tự. Phải bắt đầu ở đầu từ, nên regex chỉ thử tại các vị
+# trí đầu từ viết hoa thay vì mọi ký tự, và không còn lặp lười {1,35}? vốn
+# backtrack rất nhiều trên text của cả trang.
+# ---------------------------------------------------------------------------
+_UPPER = 'A-Z' + ''.join(
+    c for c in map(chr, range(0xC0, 0x1EFA)) if c.isalpha() and c.isupper()
+)
+_TEAM_WORD = rf'[{_UPPER}][\w.\']{{0,20}}'
+_TEAM = rf'(?<!\w)({_TEAM_WORD}(?:[ ]{_TEAM_WORD}){{0,3}})(?![\w.\'])'
+
+# "Team A vs Team B", "Team A đấu/gặp Team B"
+MATCH_VS_RE = re.compile(rf'{_TEAM}\s+(?i:vs\.?|v\.s\.?|v|đấu|gặp)\s+{_TEAM}')
+# "Team A - Team B"
+MATCH_DASH_RE = re.compile(rf'{_TEAM}\s*[-–—]\s*{_TEAM}')
+MATCH_PATTERNS = (MATCH_VS_RE, MATCH_DASH_RE)
+
+# Ngày giờ: dd/mm/yyyy HH:MM, yyyy-mm-dd HH:MM, dd/mm HH:MM (năm hiện tại)
+DATE_RE = re.compile(
+    r'(?<!\d)(?:'
+    r'(?P<y1>\d{4})[/-](?P<m1>\d{1,2})[/-](?P<d1>\d{1,2})'
+    r'|(?P<d2>\d{1,2})[/-](?P<m2>\d{1,2})[/-](?P<y2>\d{4})'
+    r'|(?P<d3>\d{1,2})[/-](?P<m3>\d{1,2})'
+    r')\s+(?P<hour>\d{1,2}):(?P<minute>\d{2})(?!\d)'
+)
+
+
+class DateIndex:
+    """
+    Vị trí mọi ngày giờ trong một văn bản (quét một lần)
+
+    Mỗi trận lấy ngày giờ gần nó nhất theo vị trí (ưu tiên ngày trên cùng
+    dòng), thay vì quét lại cả văn bản cho từng trận.
+    """
+
+    # Thứ tự ưu tiên của extract_match_date: có năm (dd/mm/yyyy, yyyy-mm-dd) rồi mới đến dd/mm
+    _PRIORITY = {'2': 0, '1': 1, '3': 2}
+
+    def __init__(self, text, current_year=None):
+        if current_year is None:
+            current_year = datetime.now().year
+        self.text = text or ''
+        self.starts = []
+        self.entries = []   # (start, end, datetime, kind)
+        for match in DATE_RE.finditer(self.text):
+            kind = next(k for k in '123' if match.group(f'd{k}') is not None)
+            year = int(match.group(f'y{kind}')) if kind != '3' else current_year
+            try:
+                value = datetime(
+                    year, int(match.group(f'm{kind}')), int(match.group(f'd{kind}')),
+                    int(match.group('hour')), int(match.group('minute'))
+                )
+            except ValueError:
+                continue
+            self.starts.append(match.start())
+            self.entries.append((match.start(), match.end(), value, kind))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def first(self):
+        """Ngày giờ đầu tiên theo thứ tự ưu tiên định dạng (None nếu không có)"""
+        if not self.entries:
+            return None
+        return min(self.entries, key=lambda e: (self._PRIORITY[e[3]], e[0]))[2]
+
+    def nearest(self, start, end=None):
+        """Ngày giờ gần đoạn [start, end) nhất (None nếu không có)"""
+        if not self.entries:
+            return None
+        end = start if end is None else end
+        idx = bisect.bisect_left(self.starts, start)
+        best = None
+        for i in (idx - 1, idx, idx + 1):
+            if 0 <= i < len(self.entries):
+                d_start, d_end, value, _ = self.entries[i]
+                if d_end <= start:
+                    gap = (d_end, start)
+                else:
+                    gap = (end, max(end, d_start))
+                # Ngày ở dòng khác (hàng khác của bảng lịch) xếp sau ngày cùng dòng
+                distance = (self.text.find('\n', *gap) != -1, gap[1] - gap[0])
+                if best is None or distance < best[0]:
+                    best = (distance, value)
+        return best[1]
+
+
+def default_match_date():
+    """Ngày mặc định khi không tìm thấy: ngày mai 20:00"""
+    return datetime.now().replace(hour=20, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
 
 class VnExpressMatchParser(BaseParser):
     """Parser cho lịch thi đấu VnExpress"""
@@ -91,7 +186,7 @@ class VnExpressMatchParser(BaseParser):
             logger.info(f"✓ Tìm thấy {len(match_containers)} container chứa lịch thi đấu")
             for container in match_containers:
                 container_matches = self.extract_matches_from_text(
-                    container.get_text(), 
+                    container.get_text('\n'), 
                     'Ngoại Hạng Anh'
                 )
                 if container_matches:
@@ -204,7 +299,7 @@ class VnExpressMatchParser(BaseParser):
         # Nếu vẫn chưa đủ, thử parse từ toàn bộ nội dung trang
         if len(matches) < limit:
             logger.info("📄 Đang parse từ toàn bộ nội dung trang...")
-            page_text = soup.get_text()
+            page_text = soup.get_text('\n')
             text_matches = self.extract_matches_from_text(page_text, 'Ngoại Hạng Anh')
             if text_matches:
                 logger.info(f"  ✓ Parse được {len(text_matches)} trận từ nội dung trang")
@@ -266,7 +361,7 @@ class VnExpressMatchParser(BaseParser):
         # Nếu không tìm thấy phần tử match cụ thể, parse từ toàn bộ nội dung
         if not match_elements:
             # Tìm các pattern trong text
-            content_text = soup.get_text()
+            content_text = soup.get_text('\n')
             matches_found = self.extract_matches_from_text(content_text, tournament_name)
             return matches_found[:limit]
         
@@ -320,13 +415,11 @@ class VnExpressMatchParser(BaseParser):
     
     def parse_match_element(self, element, tournament_name):
         """Parse một phần tử match thành dict"""
-        text = element.get_text()
+        text = element.get_text('\n')
         current_year = datetime.now().year
         
         # Tìm pattern: "Team A vs Team B" hoặc "Team A - Team B"
-        # Cải thiện pattern để match tốt hơn
-        match_pattern = r'([A-Za-zÀ-ỹ][A-Za-zÀ-ỹ\s\-\.]{1,30}?)\s*(?:vs|v\.s|đấu|gặp|[-–—])\s*([A-Za-zÀ-ỹ][A-Za-zÀ-ỹ\s\-\.]{1,30}?)'
-        match = re.search(match_pattern, text, re.IGNORECASE)
+        match = MATCH_VS_RE.search(text) or MATCH_DASH_RE.search(text)
         
         if not match:
             return None
@@ -370,33 +463,26 @@ class VnExpressMatchParser(BaseParser):
         if not text or len(text.strip()) < 10:
             return matches
         
-        # Pattern: "Team A vs Team B" hoặc "Team A - Team B"
-        # Cải thiện pattern để match tốt hơn với tên đội Premier League
-        # Cho phép số trong tên đội (như "Man City", "Man Utd")
-        match_patterns = [
-            # Pattern chính: Team vs Team
-            r'([A-Za-zÀ-ỹ][A-Za-zÀ-ỹ0-9\s\-\.]{1,35}?)\s+(?:vs|v\.s|đấu|gặp|v|VS)\s+([A-Za-zÀ-ỹ][A-Za-zÀ-ỹ0-9\s\-\.]{1,35}?)',
-            # Pattern với dấu gạch ngang
-            r'([A-Za-zÀ-ỹ][A-Za-zÀ-ỹ0-9\s\-\.]{1,35}?)\s*[-–—]\s*([A-Za-zÀ-ỹ][A-Za-zÀ-ỹ0-9\s\-\.]{1,35}?)',
-        ]
+        # Ngày giờ trong text: tìm một lần, mỗi trận lấy ngày gần nhất
+        dates = DateIndex(text, current_year)
         
+        # Pattern: "Team A vs Team B" hoặc "Team A - Team B"
         found_matches = []
-        for pattern in match_patterns:
-            matches_found = re.findall(pattern, text, re.IGNORECASE)
-            found_matches.extend(matches_found)
+        for pattern in MATCH_PATTERNS:
+            found_matches.extend(pattern.finditer(text))
         
         # Loại bỏ trùng lặp
         seen_pairs = set()
         unique_matches = []
         for match in found_matches:
-            pair = (match[0].strip().lower(), match[1].strip().lower())
+            pair = (match.group(1).strip().lower(), match.group(2).strip().lower())
             if pair not in seen_pairs:
                 seen_pairs.add(pair)
                 unique_matches.append(match)
         
         for match in unique_matches[:30]:  # Tăng giới hạn lên 30 trận
-            home_team = self.clean_text(match[0])
-            away_team = self.clean_text(match[1])
+            home_team = self.clean_text(match.group(1))
+            away_team = self.clean_text(match.group(2))
             
             # Loại bỏ các từ không hợp lệ ở đầu/cuối
             home_team = home_team.strip(' .,;:!?()[]{}"\'-–—')
@@ -406,8 +492,8 @@ class VnExpressMatchParser(BaseParser):
             if not self.is_valid_team_name(home_team) or not self.is_valid_team_name(away_team):
                 continue
             
-            # Tìm ngày giờ gần nhất
-            match_date = self.extract_match_date(text, current_year)
+            # Ngày giờ gần trận nhất
+            match_date = dates.nearest(match.start(), match.end()) or default_match_date()
             
             matches.append({
                 'home_team_name': home_team,
@@ -450,44 +536,40 @@ class VnExpressMatchParser(BaseParser):
                 return None
             
             soup = self.parse_soup(html)
-            content_text = soup.get_text()
+            content_text = soup.get_text('\n')
             
             # Tìm các trận đấu trong nội dung
-            # Pattern: "Team A vs Team B" hoặc "Team A - Team B"
-            matches = []
-            
-            # Tìm ngày giờ trong bài viết
-            date_patterns = [
-                r'(\d{1,2})[\/\-](\d{1,2})[\/\-](\d{4})',  # dd/mm/yyyy
-                r'(\d{4})[\/\-](\d{1,2})[\/\-](\d{1,2})',  # yyyy/mm/dd
-            ]
-            
-            time_patterns = [
-                r'(\d{1,2}):(\d{2})',  # HH:MM
-            ]
-            
-            # Parse từ title và content
             # Ví dụ: "Lịch thi đấu Premier League: Man City vs Liverpool 15/01/2025 20:00"
-            match_pattern = r'([A-Za-zÀ-ỹ\s]+?)\s*(?:vs|v\.s|đấu|gặp|-)\s*([A-Za-zÀ-ỹ\s]+?)(?:\s+\d{1,2}[\/\-]\d{1,2})?'
+            matches = []
+            text = title + ' ' + content_text
+            dates = DateIndex(text)
             
-            found_matches = re.findall(match_pattern, title + ' ' + content_text[:500], re.IGNORECASE)
+            # Tên trận chỉ tìm trong title + phần đầu nội dung
+            head = text[:len(title) + 501]
+            found_matches = []
+            for pattern in MATCH_PATTERNS:
+                found_matches.extend(pattern.finditer(head))
+            found_matches.sort(key=lambda match: match.start())
             
+            tournament = None
+            category_id = None
             for match in found_matches[:10]:  # Giới hạn 10 trận
-                home_team = match[0].strip()
-                away_team = match[1].strip()
+                home_team = match.group(1).strip()
+                away_team = match.group(2).strip()
                 
                 if len(home_team) < 3 or len(away_team) < 3:
                     continue
                 
-                # Tìm ngày giờ
-                match_date = self.extract_match_date(content_text)
+                if tournament is None:
+                    tournament = self.extract_tournament(title, content_text)
+                    category_id = self.detect_category(title, content_text, url)
                 
                 matches.append({
                     'home_team_name': home_team,
                     'away_team_name': away_team,
-                    'match_date': match_date,
-                    'tournament_name': self.extract_tournament(title, content_text),
-                    'category_id': self.detect_category(title, content_text, url),
+                    'match_date': dates.nearest(match.start(), match.end()) or default_match_date(),
+                    'tournament_name': tournament,
+                    'category_id': category_id,
                     'status': 'scheduled'
                 })
             
@@ -498,42 +580,11 @@ class VnExpressMatchParser(BaseParser):
             return None
     
     def extract_match_date(self, text, current_year=None):
-        """Trích xuất ngày giờ từ text"""
-        try:
-            if current_year is None:
-                current_year = datetime.now().year
-            
-            # Tìm ngày giờ trong text
-            # Pattern: dd/mm/yyyy HH:MM hoặc yyyy-mm-dd HH:MM:SS
-            date_pattern = r'(\d{1,2})[\/\-](\d{1,2})[\/\-](\d{4})\s+(\d{1,2}):(\d{2})'
-            match = re.search(date_pattern, text)
-            
-            if match:
-                day, month, year, hour, minute = match.groups()
-                return datetime(int(year), int(month), int(day), int(hour), int(minute))
-            
-            # Pattern khác: yyyy-mm-dd HH:MM
-            date_pattern2 = r'(\d{4})[\/\-](\d{1,2})[\/\-](\d{1,2})\s+(\d{1,2}):(\d{2})'
-            match = re.search(date_pattern2, text)
-            
-            if match:
-                year, month, day, hour, minute = match.groups()
-                return datetime(int(year), int(month), int(day), int(hour), int(minute))
-            
-            # Pattern: dd/mm HH:MM (không có năm, dùng current_year)
-            date_pattern3 = r'(\d{1,2})[\/\-](\d{1,2})\s+(\d{1,2}):(\d{2})'
-            match = re.search(date_pattern3, text)
-            
-            if match:
-                day, month, hour, minute = match.groups()
-                return datetime(current_year, int(month), int(day), int(hour), int(minute))
-            
-            # Mặc định: hôm nay + 1 ngày, 20:00
-            return datetime.now().replace(hour=20, minute=0, second=0, microsecond=0) + timedelta(days=1)
-            
-        except Exception as e:
-            logger.warning(f"⚠ Không parse được ngày giờ: {e}")
-            return datetime.now().replace(hour=20, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        """
+        Trích xuất ngày giờ từ text
+        Ưu tiên dd/mm/yyyy HH:MM, rồi yyyy-mm-dd HH:MM, rồi dd/mm HH:MM (năm hiện tại)
+        """
+        return DateIndex(text, current_year).first() or default_match_date()
     
     def extract_tournament(self, title, content):
         """Trích xuất tên giải đấu"""
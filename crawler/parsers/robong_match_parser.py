@@ -4,6 +4,8 @@ Robong Match Parser - Parser cho API Robong
 """
 
 from parsers.base_parser import BaseParser
+from network import get_http_cache
+import hashlib
 import logging
 from datetime import datetime, timedelta
 import json
@@ -11,12 +13,19 @@ from config import CATEGORY_MAPPING
 
 logger = logging.getLogger(__name__)
 
+# fetch_matches_by_date(skip_unchanged=True): payload của ngày giống lần đã lưu trước
+# (so sánh bằng `is`)
+UNCHANGED_DAY = object()
+
 
 class RobongMatchParser(BaseParser):
     """Parser cho API Robong lịch thi đấu"""
     
     def __init__(self):
         super().__init__('Robong Matches', 'https://rbapi.online/v1/match/list')
+        # Dấu vân tay payload từng ngày: đã lưu DB (key → digest) và chờ lưu (date_str → (key, digest))
+        self._day_fingerprints = {}
+        self._pending_fingerprints = {}
     
     def get_upcoming_matches(self, limit=50, days_range=None):
         """
@@ -27,33 +36,141 @@ class RobongMatchParser(BaseParser):
             days_range: Tuple (days_before, days_after) để filter theo ngày
                        Ví dụ: (1, 1) = hôm qua, hôm nay, hôm sau
         """
-        matches = []
-        
         try:
-            # Tính toán ngày để query API
-            if days_range:
-                days_before, days_after = days_range
-                start_date = datetime.now() - timedelta(days=days_before)
-                end_date = datetime.now() + timedelta(days=days_after)
-                
-                # Query cho từng ngày trong khoảng
-                current_date = start_date
-                while current_date <= end_date:
-                    date_str = current_date.strftime('%d-%m-%Y')
-                    date_matches = self._fetch_matches_for_date(date_str, limit)
-                    matches.extend(date_matches)
-                    current_date += timedelta(days=1)
-            else:
-                # Nếu không có days_range, lấy hôm nay và các ngày tiếp theo
-                for i in range(7):  # Lấy 7 ngày tới
-                    date = datetime.now() + timedelta(days=i)
-                    date_str = date.strftime('%d-%m-%Y')
-                    date_matches = self._fetch_matches_for_date(date_str, limit)
-                    matches.extend(date_matches)
+            by_date = self.fetch_matches_by_date(self.match_dates(days_range), limit)
+            return self.merge_matches(by_date.values(), limit)
+        except Exception as e:
+            logger.error(f"✗ Lỗi lấy matches từ Robong API: {e}", exc_info=True)
+            return []
+    
+    def match_dates(self, days_range=None):
+        """
+        Các ngày cần query API ('dd-mm-yyyy')
+        
+        Args:
+            days_range: Tuple (days_before, days_after), None = hôm nay và 6 ngày tiếp theo
+        """
+        date_strs = []
+        if days_range:
+            days_before, days_after = days_range
+            start_date = datetime.now() - timedelta(days=days_before)
+            end_date = datetime.now() + timedelta(days=days_after)
+            
+            # Query cho từng ngày trong khoảng
+            current_date = start_date
+            while current_date <= end_date:
+                date_strs.append(current_date.strftime('%d-%m-%Y'))
+                current_date += timedelta(days=1)
+        else:
+            # Nếu không có days_range, lấy hôm nay và các ngày tiếp theo
+            for i in range(7):  # Lấy 7 ngày tới
+                date = datetime.now() + timedelta(days=i)
+                date_strs.append(date.strftime('%d-%m-%Y'))
+        return date_strs
+    
+    def fetch_matches_by_date(self, date_strs, limit=50, skip_unchanged=False):
+        """
+        Tải song song các ngày và parse từng ngày
+        
+        Args:
+            date_strs: Các ngày 'dd-mm-yyyy'
+            limit: Số lượng trận đấu tối đa mỗi ngày
+            skip_unchanged: True thì ngày có payload giống hệt lần đã lưu
+                            (commit_fingerprints) được trả về UNCHANGED_DAY, không parse
+        
+        Returns:
+            Dict date_str → list trận đấu (None nếu ngày đó tải/parse lỗi,
+            UNCHANGED_DAY nếu bỏ qua vì không đổi)
+        """
+        date_strs = list(date_strs)
+        payloads = self.fetch_many(self._build_api_url(date_str) for date_str in date_strs)
+        by_date = {}
+        unchanged = 0
+        for date_str, response_text in zip(date_strs, payloads):
+            data = self._decode_payload(date_str, response_text)
+            if data is None:
+                by_date[date_str] = None
+                continue
+            
+            if skip_unchanged:
+                key = f"{self._build_api_url(date_str)}#limit={limit}"
+                digest = self.payload_fingerprint(data)
+                if self._stored_fingerprint(key) == digest:
+                    by_date[date_str] = UNCHANGED_DAY
+                    unchanged += 1
+                    continue
+                self._pending_fingerprints[date_str] = (key, digest)
             
-            # Loại bỏ trùng lặp dựa trên home_team và away_team
-            seen = set()
-            unique_matches = []
+            by_date[date_str] = self._parse_matches_data(date_str, data, limit)
+        
+        if unchanged:
+            logger.info(f"✓ {unchanged}/{len(date_strs)} ngày không thay đổi từ lần trước, bỏ qua")
+        return by_date
+    
+    def poll_days(self, date_strs, digests, limit=1000):
+        """
+        Chế độ live: tải các ngày, chỉ parse ngày có payload khác lần poll trước
+        
+        Args:
+            date_strs: Các ngày 'dd-mm-yyyy'
+            digests: Dict date_str → digest của lần poll trước (được cập nhật tại chỗ)
+            limit: Số lượng trận đấu tối đa mỗi ngày
+        
+        Returns:
+            Dict date_str → list trận đấu, chỉ gồm các ngày đã thay đổi
+        """
+        date_strs = list(date_strs)
+        payloads = self.fetch_many(self._build_api_url(date_str) for date_str in date_strs)
+        changed = {}
+        for date_str, response_text in zip(date_strs, payloads):
+            data = self._decode_payload(date_str, response_text)
+            if data is None:
+                continue
+            digest = self.payload_fingerprint(data)
+            if digests.get(date_str) == digest:
+                continue
+            matches = self._parse_matches_data(date_str, data, limit)
+            if matches is not None:
+                digests[date_str] = digest
+                changed[date_str] = matches
+        return changed
+    
+    @staticmethod
+    def payload_fingerprint(data):
+        """Digest của payload đã decode (không phụ thuộc thứ tự key/khoảng trắng)"""
+        canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+    
+    def _stored_fingerprint(self, key):
+        if key in self._day_fingerprints:
+            return self._day_fingerprints[key]
+        cache = get_http_cache()
+        return cache.get_fingerprint(key) if cache else None
+    
+    def commit_fingerprints(self, date_strs):
+        """
+        Ghi nhận các ngày đã lưu DB xong: lần sau payload không đổi thì bỏ qua hẳn
+        
+        Chỉ gọi sau khi ghi DB thành công, để ngày lỗi vẫn được xử lý lại.
+        """
+        digests = dict(
+            self._pending_fingerprints.pop(date_str)
+            for date_str in date_strs if date_str in self._pending_fingerprints
+        )
+        self._day_fingerprints.update(digests)
+        cache = get_http_cache()
+        if cache:
+            cache.put_fingerprints(digests)
+    
+    def merge_matches(self, match_lists, limit=50):
+        """Gộp trận đấu của nhiều ngày: loại trùng, sắp xếp theo ngày, cắt theo limit"""
+        # Loại bỏ trùng lặp dựa trên home_team và away_team
+        seen = set()
+        unique_matches = []
+        for matches in match_lists:
+            # None (lỗi) hoặc UNCHANGED_DAY: không có trận nào cần gộp
+            if matches is None or matches is UNCHANGED_DAY:
+                continue
             for match in matches:
                 match_date = match.get('match_date')
                 if isinstance(match_date, datetime):
@@ -67,41 +184,37 @@ class RobongMatchParser(BaseParser):
                 if key not in seen:
                     seen.add(key)
                     unique_matches.append(match)
-            
-            # Sắp xếp theo ngày
-            unique_matches.sort(key=lambda x: x.get('match_date', datetime.now()))
-            
-            logger.info(f"✓ Tổng cộng tìm thấy {len(unique_matches)} trận đấu từ Robong API")
-            return unique_matches[:limit]
-            
-        except Exception as e:
-            logger.error(f"✗ Lỗi lấy matches từ Robong API: {e}", exc_info=True)
-            return []
-    
-    def _fetch_matches_for_date(self, date_str, limit=50):
-        """
-        Lấy matches cho một ngày cụ thể
         
-        Args:
-            date_str: Ngày theo định dạng 'dd-mm-yyyy' (ví dụ: '05-11-2025')
-            limit: Số lượng trận đấu tối đa
-        """
-        matches = []
+        # Sắp xếp theo ngày
+        unique_matches.sort(key=lambda x: x.get('match_date', datetime.now()))
         
+        logger.info(f"✓ Tổng cộng tìm thấy {len(unique_matches)} trận đấu từ Robong API")
+        return unique_matches[:limit]
+    
+    def _build_api_url(self, date_str):
+        """URL API với tham số: type=schedule&state= (để lấy lịch thi đấu)"""
+        return f"{self.base_url}?sport_type=football&date={date_str}&type=schedule&state="
+    
+    def _decode_payload(self, date_str, response_text):
+        """Decode JSON của một ngày (None nếu tải lỗi hoặc JSON hỏng)"""
+        if not response_text:
+            logger.warning(f"⚠ Không thể lấy dữ liệu từ API cho ngày {date_str}")
+            return None
         try:
-            # URL API mới với tham số: type=schedule&state= (để lấy lịch thi đấu)
-            api_url = f"{self.base_url}?sport_type=football&date={date_str}&type=schedule&state="
-            logger.info(f"📡 Đang tải: {api_url}")
-            
-            # Sử dụng get_page từ BaseParser
-            response_text = self.get_page(api_url)
-            if not response_text:
-                logger.warning(f"⚠ Không thể lấy dữ liệu từ API cho ngày {date_str}")
-                return []
-            
-            # Parse JSON
             data = json.loads(response_text)
-            
+        except json.JSONDecodeError as e:
+            logger.error(f"✗ Lỗi parse JSON từ API: {e}")
+            return None
+        if not isinstance(data, dict):
+            logger.error(f"✗ Payload API không đúng định dạng cho ngày {date_str}")
+            return None
+        return data
+    
+    def _parse_matches_data(self, date_str, data, limit=50):
+        """Parse payload đã decode của một ngày thành list trận đấu (None nếu lỗi)"""
+        matches = []
+        
+        try:
             # Kiểm tra status
             if not data.get('status', False):
                 logger.warning(f"⚠ API trả về status=False cho ngày {date_str}")
@@ -130,12 +243,9 @@ class RobongMatchParser(BaseParser):
             logger.info(f"✓ Đã parse {len(matches)} trận từ ngày {date_str}")
             return matches
             
-        except json.JSONDecodeError as e:
-            logger.error(f"✗ Lỗi parse JSON từ API: {e}")
-            return []
         except Exception as e:
             logger.error(f"✗ Lỗi fetch matches cho ngày {date_str}: {e}", exc_info=True)
-            return []
+            return None
     
     def _parse_match_data(self, match_data, tournament_name):
         """
@@ -178,6 +288,13 @@ class RobongMatchParser(BaseParser):
             }
             status = status_map.get(status_text.lower(), 'scheduled')
             
+            # Parse tỉ số (chưa đá thì để None)
+            home_score = None
+            away_score = None
+            if status in ('live', 'finished'):
+                home_score = self._parse_score(match_data.get('home_score', home_team.get('score')))
+                away_score = self._parse_score(match_data.get('away_score', away_team.get('score')))
+            
             # Detect category từ tournament name
             category_id = self.detect_category_from_tournament(tournament_name)
             
@@ -190,6 +307,8 @@ class RobongMatchParser(BaseParser):
                 'tournament_name': tournament_name,
                 'category_id': category_id,
                 'status': status,
+                'home_score': home_score,
+                'away_score': away_score,
                 'venue': ''  # API không có venue
             }
             
@@ -197,6 +316,14 @@ class RobongMatchParser(BaseParser):
             logger.error(f"✗ Lỗi parse match data: {e}", exc_info=True)
             return None
     
+    @staticmethod
+    def _parse_score(value):
+        """Chuyển tỉ số từ API thành int (None nếu không có)"""
+        try:
+            return int(value) if value not in (None, '') else None
+        except (TypeError, ValueError):
+            return None
+    
     def detect_category_from_tournament(self, tournament_name):
         """Phát hiện category từ tên giải đấu"""
         if not tournament_name:
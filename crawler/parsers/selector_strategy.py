@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Selector Strategy - Chọn CSS selector cho từng trường dữ liệu
+
+Mỗi trường (tiêu đề, mô tả, nội dung...) có một danh sách selector dự phòng.
+Selector khớp gần nhất của từng (nguồn, loại trang, trường) được thử trước,
+chỉ khi trượt mới thử lại toàn bộ danh sách - với trang cùng cấu trúc, mỗi
+trường chỉ tốn một lần duyệt cây thay vì nhiều lần select_one thất bại.
+"""
+
+import logging
+import threading
+import soupsieve
+
+logger = logging.getLogger(__name__)
+
+
+class SelectorStrategy:
+    """
+    Bộ chọn selector có ghi nhớ cho một nguồn
+
+    Args:
+        source_name: Tên nguồn (dùng cho log/thống kê)
+    """
+
+    def __init__(self, source_name):
+        self.source_name = source_name
+        self._compiled = {}     # selector → SoupSieve đã compile
+        self._preferred = {}    # (page_type, field) → selector khớp gần nhất
+        self._stats = {}        # (page_type, field) → {selector: {'hits', 'misses'}}
+        self._lock = threading.Lock()
+
+    def _compile(self, selector):
+        pattern = self._compiled.get(selector)
+        if pattern is None:
+            pattern = soupsieve.compile(selector)
+            self._compiled[selector] = pattern
+        return pattern
+
+    def _ordered(self, key, selectors):
+        preferred = self._preferred.get(key)
+        if preferred in selectors:
+            return [preferred] + [s for s in selectors if s != preferred]
+        return list(selectors)
+
+    def _record(self, key, selector, hit):
+        with self._lock:
+            counters = self._stats.setdefault(key, {}).setdefault(selector, {'hits': 0, 'misses': 0})
+            counters['hits' if hit else 'misses'] += 1
+            if hit:
+                self._preferred[key] = selector
+
+    def select_one(self, root, page_type, field, selectors, accept=None):
+        """
+        Tìm phần tử đầu tiên khớp một trong các selector
+
+        Args:
+            root: Tag/BeautifulSoup để tìm trong đó
+            page_type: Loại trang ('listing', 'article'...)
+            field: Tên trường ('title', 'content'...)
+            selectors: Danh sách selector theo thứ tự ưu tiên mặc định
+            accept: Hàm kiểm tra phần tử tìm được (False thì coi như trượt)
+
+        Returns:
+            (tag, selector) hoặc (None, None) nếu không selector nào khớp
+        """
+        key = (page_type, field)
+        for selector in self._ordered(key, selectors):
+            tag = self._compile(selector).select_one(root)
+            hit = tag is not None and (accept is None or accept(tag))
+            self._record(key, selector, hit)
+            if hit:
+                return tag, selector
+        return None, None
+
+    def select(self, root, page_type, field, selectors):
+        """Giống select_one nhưng trả về mọi phần tử của selector đầu tiên có kết quả"""
+        key = (page_type, field)
+        for selector in self._ordered(key, selectors):
+            tags = self._compile(selector).select(root)
+            self._record(key, selector, bool(tags))
+            if tags:
+                return tags, selector
+        return [], None
+
+    def stats(self):
+        """Thống kê hit/miss: {(page_type, field): {selector: {'hits', 'misses'}}}"""
+        with self._lock:
+            return {
+                key: {selector: dict(counters) for selector, counters in by_selector.items()}
+                for key, by_selector in self._stats.items()
+            }
+
+    def unused_selectors(self):
+        """Các selector đã được thử nhưng chưa khớp lần nào (ứng viên để bỏ)"""
+        unused = []
+        for (page_type, field), by_selector in self.stats().items():
+            for selector, counters in by_selector.items():
+                if counters['hits'] == 0:
+                    unused.append((page_type, field, selector))
+        return unused
+
+    def log_stats(self):
+        """Ghi thống kê selector ra log"""
+        for (page_type, field), by_selector in sorted(self.stats().items()):
+            summary = ', '.join(
+                f"{selector} {counters['hits']}/{counters['hits'] + counters['misses']}"
+                for selector, counters in by_selector.items()
+            )
+            logger.info(f"  {self.source_name} {page_type}.{field}: {summary}")
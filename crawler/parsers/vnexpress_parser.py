@@ -4,75 +4,172 @@ VnExpress Parser - Parser cho VnExpress Thể Thao
 """
 
 from parsers.base_parser import BaseParser
+from parsers.html_stream import KeepRule
 import logging
+import re
 from datetime import datetime
-from urllib.parse import urljoin
-from config import DEFAULT_AUTHOR_ID
+from config import DEFAULT_AUTHOR_ID, LISTING_MEMO_SIZE
+from utils import LRUCache
 
 logger = logging.getLogger(__name__)
 
+# Ngày giờ trong text, vd. "Thứ năm, 16/10/2025, 10:00 (GMT+7)"
+DATE_TEXT_RE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})(?:\D{1,5}(\d{1,2}):(\d{2}))?')
+
 
 class VnExpressParser(BaseParser):
     """Parser cho VnExpress Thể Thao"""
     
+    # Selector dự phòng cho từng trường, theo thứ tự ưu tiên mặc định
+    # (SelectorStrategy sẽ thử selector khớp gần nhất trước)
+    SELECTORS = {
+        'listing': {
+            'item': [
+                '.item-news',
+                '.article-item',
+                '.story-item',
+                'article.item-news',
+                'article.article-item',
+                '.thumb-art',
+                '.list-news-subfolder .item-news',
+                '.container .item-news'
+            ],
+            'title': [
+                '.title-news a',
+                'h3.title-news a',
+                'h2.title-news a',
+                '.title a',
+                'a.title-news',
+                'h3 a',
+                'h2 a',
+                'a[href*="/the-thao/"]'
+            ],
+            'thumbnail': ['img', '.thumb img', 'picture img', '.thumb-art img'],
+            'description': ['.description', '.sapo', '.lead', '.summary', 'p.description'],
+        },
+        'article': {
+            'title': [
+                'h1.title-detail',
+                'h1.title-news',
+                'h1.article-title',
+                'h1',
+                '.title-detail',
+                '.article-title'
+            ],
+            'description': [
+                '.description',
+                '.sapo',
+                '.lead',
+                '.article-summary',
+                'p.description',
+                '.article-lead'
+            ],
+            'content': [
+                '.fck_detail',
+                '.Normal',
+                '.article-body',
+                '.article-content',
+                '.content-detail',
+                '.article-body-content',
+                '[class*="fck"]',
+                '[class*="Normal"]'
+            ],
+            'thumbnail': [
+                '.fig-picture img',
+                '.fig-picture picture img',
+                '.article-thumb img',
+                '.article-image img',
+                'picture img',
+                '.container-figure img',
+                'figure img'
+            ],
+            'time': [
+                'meta[itemprop="datePublished"]',
+                'meta[property="article:published_time"]',
+                'meta[name="pubdate"]',
+                '.date',
+                '.header-content .date',
+                '.article-date',
+                'time',
+                '[datetime]',
+                '.date-time',
+                '.article-time'
+            ],
+        },
+    }
+    
+    # Chế độ stream: chỉ giữ các phần tử mà SELECTORS['article'] có thể cần,
+    # ngừng đọc khi hết .fck_detail (phần sau là bình luận, tin liên quan)
+    STREAM_KEEP = KeepRule(
+        tags=['h1', 'time', 'meta', 'title'],
+        classes=[
+            'title-detail', 'title-news', 'article-title',
+            'description', 'sapo', 'lead', 'article-summary', 'article-lead',
+            'fck_detail', 'Normal', 'article-body', 'article-content', 'content-detail', 'article-body-content',
+            'fig-picture', 'article-thumb', 'article-image', 'container-figure',
+            'date', 'article-date', 'date-time', 'article-time'
+        ],
+        attributes=['datetime'],
+        stop_after='fck_detail'
+    )
+    
     def __init__(self):
         super().__init__('VnExpress', 'https://vnexpress.net/the-thao')
+        # Kết quả parse trang danh sách gần nhất: (url, limit) → articles
+        self._listing_memo = LRUCache(LISTING_MEMO_SIZE)
     
-    def get_article_list(self, limit=10):
-        """Lấy danh sách bài viết từ trang chủ"""
-        html = self.get_page(self.base_url)
-        if not html:
+    @staticmethod
+    def _image_src(img):
+        """URL ảnh của thẻ img (ưu tiên data-src cho lazy load), '' nếu không có"""
+        return (img.get('data-src') or
+                img.get('data-original') or
+                img.get('src') or
+                img.get('data-lazy-src') or '')
+    
+    def listing_url(self, section_url=None, page=1):
+        """URL trang danh sách thứ `page` của một chuyên mục (VnExpress: <url>-p2, <url>-p3...)"""
+        section_url = (section_url or self.base_url).rstrip('/')
+        return section_url if page <= 1 else f"{section_url}-p{page}"
+    
+    def get_article_list(self, limit=10, url=None):
+        """Lấy danh sách bài viết từ trang chủ (hoặc trang danh sách `url`)"""
+        url = url or self.base_url
+        page = self.fetch_page(url)
+        if not page:
             return []
         
+        memo_key = (url, limit)
+        memo = self._listing_memo.get(memo_key) if page.unchanged else None
+        if memo is not None:
+            logger.info("✓ Trang danh sách không thay đổi, dùng lại kết quả parse trước")
+            return list(memo)
+        
+        articles = self.parse_listing_html(page.text, limit)
+        self._listing_memo.put(memo_key, list(articles))
+        return articles
+    
+    def parse_listing_html(self, html, limit=None):
+        """Parse trang danh sách thành list {'title', 'url', 'thumbnail', 'description'}"""
         soup = self.parse_soup(html)
         articles = []
         
         # Tìm các bài viết - thử nhiều selector để tương thích với cấu trúc mới
-        article_items = []
-        
-        # Thử các selector mới trước
-        selectors = [
-            '.item-news',
-            '.article-item',
-            '.story-item',
-            'article.item-news',
-            'article.article-item',
-            '.thumb-art',
-            '.list-news-subfolder .item-news',
-            '.container .item-news'
-        ]
-        
-        for selector in selectors:
-            article_items = soup.select(selector)
-            if article_items:
-                logger.info(f"✓ Tìm thấy {len(article_items)} bài viết với selector: {selector}")
-                break
+        listing = self.SELECTORS['listing']
+        article_items, selector = self.selectors.select(soup, 'listing', 'item', listing['item'])
+        if article_items:
+            logger.info(f"✓ Tìm thấy {len(article_items)} bài viết với selector: {selector}")
         
         if not article_items:
             logger.warning("⚠ Không tìm thấy bài viết với bất kỳ selector nào")
             return []
         
-        article_items = article_items[:limit]
+        if limit:
+            article_items = article_items[:limit]
         
         for item in article_items:
             try:
                 # Thử nhiều selector cho title
-                title_tag = None
-                title_selectors = [
-                    '.title-news a',
-                    'h3.title-news a',
-                    'h2.title-news a',
-                    '.title a',
-                    'a.title-news',
-                    'h3 a',
-                    'h2 a',
-                    'a[href*="/the-thao/"]'
-                ]
-                
-                for selector in title_selectors:
-                    title_tag = item.select_one(selector)
-                    if title_tag:
-                        break
+                title_tag, _ = self.selectors.select_one(item, 'listing', 'title', listing['title'])
                 
                 if not title_tag:
                     # Thử tìm thẻ a trực tiếp
@@ -89,27 +186,17 @@ class VnExpressParser(BaseParser):
                     url = f"https://vnexpress.net{url}"
                 
                 # Lấy thumbnail nếu có - thử nhiều selector
-                thumbnail = ''
-                thumb_selectors = ['img', '.thumb img', 'picture img', '.thumb-art img']
-                for selector in thumb_selectors:
-                    thumb_tag = item.select_one(selector)
-                    if thumb_tag:
-                        thumbnail = (thumb_tag.get('data-src') or 
-                                   thumb_tag.get('data-original') or 
-                                   thumb_tag.get('src') or 
-                                   thumb_tag.get('data-lazy-src') or '')
-                        if thumbnail:
-                            break
+                thumb_tag, _ = self.selectors.select_one(
+                    item, 'listing', 'thumbnail', listing['thumbnail'], accept=self._image_src
+                )
+                thumbnail = self._image_src(thumb_tag) if thumb_tag else ''
                 
                 # Lấy mô tả - thử nhiều selector
-                description = ''
-                desc_selectors = ['.description', '.sapo', '.lead', '.summary', 'p.description']
-                for selector in desc_selectors:
-                    desc_tag = item.select_one(selector)
-                    if desc_tag:
-                        description = self.clean_text(desc_tag.get_text())
-                        if description:
-                            break
+                desc_tag, _ = self.selectors.select_one(
+                    item, 'listing', 'description', listing['description'],
+                    accept=lambda tag: self.clean_text(tag.get_text())
+                )
+                description = self.clean_text(desc_tag.get_text()) if desc_tag else ''
                 
                 articles.append({
                     'title': title,
@@ -125,30 +212,60 @@ class VnExpressParser(BaseParser):
         logger.info(f"✓ Tìm thấy {len(articles)} bài viết từ VnExpress")
         return articles
     
+    @staticmethod
+    def parse_published_at(tag):
+        """
+        Ngày đăng từ thẻ meta (content ISO), thẻ có attribute datetime (ISO)
+        hoặc text dạng "Thứ năm, 16/10/2025, 10:00 (GMT+7)"
+        
+        Returns:
+            datetime theo giờ của trang (bỏ múi giờ), None nếu không đọc được
+        """
+        value = tag.get('content') or tag.get('datetime')
+        if value:
+            try:
+                return datetime.fromisoformat(value.strip().replace('Z', '+00:00')).replace(tzinfo=None)
+            except ValueError:
+                pass
+        
+        match = DATE_TEXT_RE.search(value or tag.get_text(' '))
+        if not match:
+            return None
+        day, month, year, hour, minute = match.groups()
+        try:
+            return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0))
+        except ValueError:
+            return None
+    
     def parse_article(self, url):
         """Parse chi tiết một bài viết"""
+        html = self.get_page(url, stream=self.stream)
+        if not html:
+            return None
+        return self.parse_article_html(url, html)
+    
+    def parse_articles(self, urls):
+        """
+        Tải song song và parse nhiều bài viết
+        
+        Returns:
+            List article_data (hoặc None nếu lỗi) theo đúng thứ tự urls
+        """
+        urls = list(urls)
+        pages = self.fetch_many(urls)
+        return [
+            self.parse_article_html(url, html) if html else None
+            for url, html in zip(urls, pages)
+        ]
+    
+    def parse_article_html(self, url, html):
+        """Parse chi tiết một bài viết từ HTML đã tải"""
         try:
-            html = self.get_page(url)
-            if not html:
-                return None
-            
             soup = self.parse_soup(html)
+            selectors = self.SELECTORS['article']
             
             # Lấy tiêu đề - thử nhiều selector
-            title_tag = None
-            title_selectors = [
-                'h1.title-detail',
-                'h1.title-news',
-                'h1.article-title',
-                'h1',
-                '.title-detail',
-                '.article-title'
-            ]
-            
-            for selector in title_selectors:
-                title_tag = soup.select_one(selector)
-                if title_tag:
-                    break
+            title_tag, _ = self.selectors.select_one(soup, 'article', 'title', selectors['title'])
             
             if not title_tag:
                 logger.warning(f"⚠ Không tìm thấy tiêu đề: {url}")
@@ -157,41 +274,14 @@ class VnExpressParser(BaseParser):
             title = self.clean_text(title_tag.get_text())
             
             # Lấy mô tả - thử nhiều selector
-            desc_tag = None
-            desc_selectors = [
-                '.description',
-                '.sapo',
-                '.lead',
-                '.article-summary',
-                'p.description',
-                '.article-lead'
-            ]
-            
-            for selector in desc_selectors:
-                desc_tag = soup.select_one(selector)
-                if desc_tag:
-                    break
+            desc_tag, _ = self.selectors.select_one(soup, 'article', 'description', selectors['description'])
             
             summary = self.clean_text(desc_tag.get_text()) if desc_tag else ''
             
             # Lấy nội dung - thử nhiều selector
-            content_tag = None
-            content_selectors = [
-                '.fck_detail',
-                '.Normal',
-                '.article-body',
-                '.article-content',
-                '.content-detail',
-                '.article-body-content',
-                '[class*="fck"]',
-                '[class*="Normal"]'
-            ]
-            
-            for selector in content_selectors:
-                content_tag = soup.select_one(selector)
-                if content_tag:
-                    logger.info(f"✓ Tìm thấy nội dung với selector: {selector}")
-                    break
+            content_tag, selector = self.selectors.select_one(soup, 'article', 'content', selectors['content'])
+            if content_tag:
+                logger.debug(f"✓ Tìm thấy nội dung với selector: {selector}")
             
             if not content_tag:
                 logger.warning(f"⚠ Không tìm thấy nội dung: {url}")
@@ -200,77 +290,18 @@ class VnExpressParser(BaseParser):
             # Tạo slug trước (cần cho download ảnh)
             slug = self.generate_slug(title)
             
-            # Thu thập danh sách ảnh từ content trước khi xử lý
-            images_list = []
-            img_tags = content_tag.find_all('img')
-            for img in img_tags:
-                # Thử nhiều thuộc tính để lấy URL ảnh (ưu tiên data-src cho lazy load)
-                img_url = (img.get('data-src') or 
-                          img.get('data-original') or 
-                          img.get('src') or 
-                          img.get('data-lazy-src'))
-                
-                if img_url:
-                    # Chuyển thành URL tuyệt đối nếu cần
-                    if not img_url.startswith('http'):
-                        img_url = urljoin('https://vnexpress.net', img_url)
-                    
-                    # Loại bỏ các ký tự không hợp lệ và làm sạch URL
-                    # Giữ nguyên query parameters vì CDN có thể cần chúng
-                    img_url = img_url.strip()
-                    
-                    # Validate URL hợp lệ
-                    if not img_url.startswith('http'):
-                        logger.warning(f"  ⚠ Bỏ qua URL ảnh không hợp lệ: {img_url[:50]}...")
-                        continue
-                    
-                    # Lấy caption nếu có
-                    caption = ''
-                    # Tìm caption trong thẻ figure hoặc từ alt
-                    figure = img.find_parent('figure')
-                    if figure:
-                        caption_tag = figure.find('figcaption')
-                        if caption_tag:
-                            caption = self.clean_text(caption_tag.get_text())
-                    if not caption:
-                        caption = img.get('alt', '') or img.get('title', '')
-                    
-                    images_list.append({
-                        'url': img_url,
-                        'caption': caption[:500] if caption else ''  # Giới hạn độ dài caption
-                    })
-            
-            # Xử lý ảnh trong content HTML
-            # Download tất cả ảnh và thay thế URL trong HTML
-            content_html = self.process_content_images(content_tag, slug)
+            # Một lần duyệt nội dung: ảnh + caption, thay src ảnh, text và HTML
+            content = self.extract_content(content_tag, slug, image_base='https://vnexpress.net')
+            images_list = content.images
+            content_html = content.html
             
             if not content_html or len(content_html) < 50:
                 logger.warning(f"⚠ Nội dung rỗng: {url}")
                 return None
             
             # Lấy thumbnail - thử nhiều selector
-            thumb_tag = None
-            thumb_selectors = [
-                '.fig-picture img',
-                '.fig-picture picture img',
-                '.article-thumb img',
-                '.article-image img',
-                'picture img',
-                '.container-figure img',
-                'figure img'
-            ]
-            
-            for selector in thumb_selectors:
-                thumb_tag = soup.select_one(selector)
-                if thumb_tag:
-                    break
-            
-            thumbnail_url = ''
-            if thumb_tag:
-                thumbnail_url = (thumb_tag.get('data-src') or 
-                               thumb_tag.get('data-original') or 
-                               thumb_tag.get('src') or 
-                               thumb_tag.get('data-lazy-src') or '')
+            thumb_tag, _ = self.selectors.select_one(soup, 'article', 'thumbnail', selectors['thumbnail'])
+            thumbnail_url = self._image_src(thumb_tag) if thumb_tag else ''
             
             # Download thumbnail
             if thumbnail_url:
@@ -278,8 +309,8 @@ class VnExpressParser(BaseParser):
                 if local_thumb:
                     thumbnail_url = local_thumb
             
-            # Lấy text từ content để phân tích category và tags
-            content_text = content_tag.get_text()
+            # Text của content (đã lấy khi duyệt) để phân tích category và tags
+            content_text = content.text
             
             # Phát hiện category
             category_id = self.detect_category(title, content_text, url)
@@ -288,49 +319,12 @@ class VnExpressParser(BaseParser):
             tags = self.extract_tags(title, content_text)
             
             # Lấy ngày đăng - thử nhiều selector
-            time_tag = None
-            time_selectors = [
-                '.date',
-                '.header-content .date',
-                '.article-date',
-                'time',
-                '[datetime]',
-                '.date-time',
-                '.article-time'
-            ]
-            
-            for selector in time_selectors:
-                time_tag = soup.select_one(selector)
-                if time_tag:
-                    break
-            
-            published_at = datetime.now()
-            if time_tag:
-                try:
-                    # Thử lấy từ attribute datetime trước
-                    datetime_attr = time_tag.get('datetime')
-                    if datetime_attr:
-                        # Parse ISO format: 2024-01-01T10:00:00+07:00 hoặc 2024-01-01T10:00:00
-                        try:
-                            # Thử parse ISO format đơn giản
-                            if 'T' in datetime_attr:
-                                date_part, time_part = datetime_attr.split('T')
-                                year, month, day = date_part.split('-')
-                                time_part = time_part.split('+')[0].split('-')[0]  # Bỏ timezone
-                                hour, minute, second = time_part.split(':')
-                                published_at = datetime(
-                                    int(year), int(month), int(day),
-                                    int(hour), int(minute), int(second.split('.')[0]) if '.' in second else int(second)
-                                )
-                        except:
-                            pass
-                    else:
-                        time_text = self.clean_text(time_tag.get_text())
-                        # Parse time từ format VnExpress
-                        # TODO: Implement proper date parsing
-                except Exception as e:
-                    logger.debug(f"Không thể parse ngày đăng: {e}")
-                    pass
+            time_tag, _ = self.selectors.select_one(
+                soup, 'article', 'time', selectors['time'],
+                accept=lambda tag: self.parse_published_at(tag) is not None
+            )
+            # None nếu không đọc được ngày đăng (không thay bằng thời điểm crawl)
+            published_at = self.parse_published_at(time_tag) if time_tag else None
             
             article_data = {
                 'title': title,
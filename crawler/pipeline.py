@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline - Xử lý nhiều giai đoạn (fetch → parse → ghi DB) chạy song song
+
+Mỗi giai đoạn có số worker riêng, các giai đoạn nối với nhau bằng queue có
+giới hạn kích thước (backpressure): giai đoạn nhanh sẽ phải chờ khi giai đoạn
+sau bị đầy, nên bộ nhớ không tăng vô hạn.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class Stage:
+    """
+    Một giai đoạn của pipeline
+
+    Args:
+        name: Tên giai đoạn (dùng cho log/thống kê)
+        handler: Hàm xử lý một item, trả về item cho giai đoạn sau
+                 (trả về None để bỏ item)
+        workers: Số thread xử lý song song
+        queue_size: Kích thước tối đa của queue đầu vào
+        batch_size: > 1 thì handler nhận list item (tối đa batch_size) và trả về
+                    list kết quả tương ứng (None để bỏ item)
+        batch_timeout: Số giây chờ thêm item trước khi xử lý một batch chưa đầy
+    """
+
+    def __init__(self, name, handler, workers=1, queue_size=20, batch_size=1, batch_timeout=0.5):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self.batch_size = max(1, int(batch_size))
+        self.batch_timeout = batch_timeout
+        self.stats = {'processed': 0, 'dropped': 0, 'errors': 0, 'busy_time': 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+
+class Pipeline:
+    """Chạy các Stage nối tiếp nhau, mỗi Stage có pool thread riêng"""
+
+    def __init__(self, stages):
+        if not stages:
+            raise ValueError("Pipeline cần ít nhất một stage")
+        self.stages = stages
+
+    def _worker(self, stage, in_queue, out_queue, results):
+        if stage.batch_size > 1:
+            self._batch_worker(stage, in_queue, out_queue, results)
+            return
+
+        while True:
+            item = in_queue.get()
+            if item is _STOP:
+                break
+            self._handle(stage, item, [item], out_queue, results)
+
+    def _batch_worker(self, stage, in_queue, out_queue, results):
+        batch = []
+        while True:
+            try:
+                # Đang gom dở batch thì chỉ chờ batch_timeout
+                item = in_queue.get(timeout=stage.batch_timeout if batch else None)
+            except queue.Empty:
+                self._handle(stage, batch, batch, out_queue, results)
+                batch = []
+                continue
+
+            if item is _STOP:
+                if batch:
+                    self._handle(stage, batch, batch, out_queue, results)
+                break
+
+            batch.append(item)
+            if len(batch) >= stage.batch_size:
+                self._handle(stage, batch, batch, out_queue, results)
+                batch = []
+
+    def _handle(self, stage, payload, items, out_queue, results):
+        """Gọi handler cho một item (hoặc một batch) và chuyển kết quả sang stage sau"""
+        started = time.perf_counter()
+        try:
+            output = stage.handler(payload)
+        except Exception as e:
+            logger.error(f"✗ Lỗi ở stage {stage.name}: {e}", exc_info=True)
+            stage._count('errors', len(items))
+            return
+        finally:
+            stage._count('busy_time', time.perf_counter() - started)
+
+        outputs = output if stage.batch_size > 1 else [output]
+        for output in outputs or []:
+            if output is None:
+                stage._count('dropped')
+                continue
+
+            stage._count('processed')
+            if out_queue is not None:
+                out_queue.put(output)
+            else:
+                results.append(output)
+
+    def run(self, items):
+        """
+        Đưa tất cả items qua pipeline và chờ xử lý xong
+
+        Args:
+            items: Iterable các item đầu vào (có thể là generator)
+
+        Returns:
+            Dict gồm 'results' (output của stage cuối), 'stats' và 'elapsed'
+        """
+        started = time.perf_counter()
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results = []
+        threads = []
+
+        for idx, stage in enumerate(self.stages):
+            out_queue = queues[idx + 1] if idx + 1 < len(self.stages) else None
+            stage_threads = []
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[idx], out_queue, results),
+                    name=f"{stage.name}-{n}",
+                    daemon=True
+                )
+                thread.start()
+                stage_threads.append(thread)
+            threads.append(stage_threads)
+
+        try:
+            # Queue đầu vào có giới hạn: put() sẽ chờ khi fetch stage bị đầy
+            for item in items:
+                queues[0].put(item)
+        finally:
+            # Đóng lần lượt từng stage: chờ stage trước xong mới dừng stage sau
+            for idx, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    queues[idx].put(_STOP)
+                for thread in threads[idx]:
+                    thread.join()
+
+        elapsed = time.perf_counter() - started
+        return {
+            'results': results,
+            'stats': {stage.name: dict(stage.stats) for stage in self.stages},
+            'elapsed': elapsed
+        }
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+Utils Package - Cấu trúc dữ liệu dùng chung, không phụ thuộc database hay network
+"""
+
+from utils.lru import LRUCache
+
+__all__ = ['LRUCache']
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+LRU Cache - Cache giới hạn số phần tử, dùng cho tag/đội (database) và kết quả parse (parser)
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Cache giới hạn số phần tử, bỏ phần tử lâu không dùng nhất (an toàn khi nhiều thread)"""
+    
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+    
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self):
+        return len(self._data)
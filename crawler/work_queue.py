@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Work Queue - Hàng đợi công việc bền vững (SQLite) để chạy tiếp sau khi crawler dừng giữa chừng
+
+Mỗi item (URL bài viết, ngày lịch thi đấu...) có trạng thái:
+pending → fetched → parsed → stored. Lần chạy sau chỉ lấy các item chưa
+stored; item lỗi được thử lại sau một khoảng backoff, lỗi quá max_attempts
+lần thì chuyển sang dead và không thử nữa.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from config import WORK_QUEUE
+from network import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+FETCHED = 'fetched'
+PARSED = 'parsed'
+STORED = 'stored'
+FAILED = 'failed'
+DEAD = 'dead'
+
+# Trạng thái không bao giờ xử lý lại
+FINAL_STATES = (STORED, DEAD)
+
+
+class WorkQueue:
+    """
+    Hàng đợi các item cần crawl, chia theo tên queue (vd. 'news:vnexpress')
+
+    Args:
+        path: Đường dẫn file SQLite
+        max_attempts: Số lần lỗi tối đa của một item trước khi bỏ (dead)
+        backoff_base: Số giây chờ sau lần lỗi đầu, nhân đôi sau mỗi lần lỗi
+        backoff_max: Số giây chờ tối đa giữa hai lần thử
+    """
+
+    def __init__(self, path, max_attempts=5, backoff_base=60.0, backoff_max=6 * 3600.0):
+        self.path = path
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff = RetryPolicy(backoff_base=backoff_base, backoff_max=backoff_max, jitter=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS items (
+                queue TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (queue, key)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_state ON items (queue, state)")
+        self._conn.commit()
+
+    def add(self, queue, items):
+        """
+        Thêm item mới (bỏ qua key đã có, kể cả đã stored)
+
+        Args:
+            queue: Tên queue
+            items: Iterable (key, payload), payload là dict/list JSON được
+
+        Returns:
+            Số item mới được thêm
+        """
+        now = time.time()
+        rows = [
+            (queue, key, json.dumps(payload, ensure_ascii=False, default=str), PENDING, now)
+            for key, payload in items
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("""
+                INSERT OR IGNORE INTO items (queue, key, payload, state, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def due(self, queue, limit=None):
+        """
+        Các item cần xử lý: chưa stored/dead và đã hết thời gian chờ retry
+
+        Item đang ở fetched/parsed là của lần chạy trước bị dừng giữa chừng,
+        cũng được trả về để xử lý lại.
+
+        Returns:
+            List (key, payload) theo thứ tự thêm vào
+        """
+        sql = f"""
+            SELECT key, payload FROM items
+            WHERE queue = ? AND state NOT IN ({', '.join('?' * len(FINAL_STATES))}) AND next_attempt_at <= ?
+            ORDER BY rowid
+        """
+        params = [queue, *FINAL_STATES, time.time()]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [(key, json.loads(payload) if payload else None) for key, payload in rows]
+
+    def mark(self, queue, keys, state):
+        """Chuyển các item sang state (pending/fetched/parsed/stored)"""
+        if isinstance(keys, str):
+            keys = [keys]
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE items SET state = ?, updated_at = ? WHERE queue = ? AND key = ?",
+                [(state, now, queue, key) for key in keys]
+            )
+            self._conn.commit()
+
+    def fail(self, queue, key, error=None):
+        """
+        Ghi nhận một lần xử lý lỗi: hẹn thử lại sau backoff, hoặc dead nếu đã lỗi quá nhiều
+
+        Returns:
+            Trạng thái mới (failed/dead)
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts FROM items WHERE queue = ? AND key = ?", (queue, key)
+            ).fetchone()
+            if not row:
+                return None
+            attempts = row[0] + 1
+            if attempts >= self.max_attempts:
+                state, next_attempt_at = DEAD, now
+                logger.warning(f"⚠ Bỏ qua hẳn sau {attempts} lần lỗi: {key}")
+            else:
+                state, next_attempt_at = FAILED, now + self.backoff.backoff(attempts - 1)
+            self._conn.execute("""
+                UPDATE items SET state = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?
+                WHERE queue = ? AND key = ?
+            """, (state, attempts, next_attempt_at, str(error)[:500] if error else None, now, queue, key))
+            self._conn.commit()
+        return state
+
+    def counts(self, queue):
+        """Số item theo trạng thái"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM items WHERE queue = ? GROUP BY state", (queue,)
+            ).fetchall()
+        return dict(rows)
+
+    def remove(self, queue, keys):
+        """Xóa các item theo key"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM items WHERE queue = ? AND key = ?", [(queue, key) for key in keys])
+            self._conn.commit()
+
+    def clear(self, queue, states=None, older_than=None):
+        """
+        Xóa các item của queue
+
+        Args:
+            states: Chỉ xóa item ở các trạng thái này
+            older_than: Chỉ xóa item không thay đổi trong older_than giây gần đây
+        """
+        sql = "DELETE FROM items WHERE queue = ?"
+        params = [queue]
+        if states:
+            sql += f" AND state IN ({', '.join('?' * len(states))})"
+            params.extend(states)
+        if older_than is not None:
+            sql += " AND updated_at < ?"
+            params.append(time.time() - older_than)
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_work_queue = None
+_work_queue_lock = threading.Lock()
+
+
+def get_work_queue():
+    """Work queue dùng chung cho mọi crawler (None nếu WORK_QUEUE tắt)"""
+    global _work_queue
+    if not WORK_QUEUE.get('enabled', False):
+        return None
+    with _work_queue_lock:
+        if _work_queue is None:
+            WORK_QUEUE['path'].parent.mkdir(parents=True, exist_ok=True)
+            _work_queue = WorkQueue(
+                WORK_QUEUE['path'],
+                max_attempts=WORK_QUEUE['max_attempts'],
+                backoff_base=WORK_QUEUE['backoff_base'],
+                backoff_max=WORK_QUEUE['backoff_max']
+            )
+        return _work_queue